@@ -0,0 +1,256 @@
+# Cobras controladas pelo servidor (para completar partidas e testes de resistência).
+#
+# As decisões saem como inputs comuns ({ pid: direção }) que o loop do tick
+# aplica junto com os dos jogadores, então o lockstep e as gravações as
+# reproduzem sem rodar a IA de novo.
+#
+# Todas as cobras da IA compartilham um campo de distâncias: a distância de
+# cada célula livre até a fruta mais próxima (BFS com várias origens). Cada
+# cobra só desce o gradiente, então o custo não cresce com o número de bots.
+# O campo é reaproveitado entre ticks:
+# - caudas que andaram liberam células, e só a vizinhança delas é corrigida;
+# - quando uma fruta muda, alguém morre ou o campo fica velho, uma BFS nova
+#   começa e avança um pouco por tick, dentro do orçamento; até ela
+#   terminar vale o campo anterior.
+# Antes de seguir o campo, um flood fill limitado ao tamanho da cobra
+# confere se ela não vai se fechar num espaço menor que o próprio corpo.
+#
+# Orçamento: cada tick tem `budget` segundos de CPU para a IA. Os bots são
+# atendidos em rodízio; quando o orçamento acaba, os restantes usam uma
+# heurística barata (célula segura mais perto da fruta em linha reta), em
+# vez de esticar o tick.
+import time
+from collections import deque
+from game_state import DIRECTION_NAMES
+import metrics
+
+AI_PID_BASE = 1_000_000   # pids dos bots (longe dos pids de conexões)
+REBUILD_TICKS = 10        # Ticks até o campo ser refeito mesmo sem mudanças
+FIELD_SHARE = 0.5         # Fração do orçamento que a BFS do campo pode usar
+MAX_FLOOD = 256           # Limite de células visitadas pelo flood fill
+UNREACHED = 1 << 30
+
+MOVES = (("UP", 0, -1), ("DOWN", 0, 1), ("LEFT", -1, 0), ("RIGHT", 1, 0))
+
+
+def roster(count):
+    # { pid: nome } dos bots de uma partida
+    return {AI_PID_BASE + i: f"Bot {i + 1}" for i in range(count)}
+
+
+class DistanceField:
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.size = cols * rows
+        self.dist = None          # Campo pronto (lista por célula) ou None
+        self.building = None      # Campo em construção
+        self.frontier = None      # Fila da BFS em construção
+        self.built_at = None      # Tick em que a construção atual começou
+
+    def rebuild(self, game):
+        # Começa uma BFS nova a partir das frutas atuais
+        dist = [UNREACHED] * self.size
+        frontier = deque()
+        for fruit in game.fruits:
+            cell = game.cell_index(fruit)
+            dist[cell] = 0
+            frontier.append(cell)
+        self.building = dist
+        self.frontier = frontier
+        self.built_at = game.tick
+
+    def advance(self, game, deadline):
+        # Continua a BFS até terminar ou até o deadline; True se terminou.
+        # A grade muda entre ticks, então o campo é aproximado; o flood fill
+        # e a checagem de célula livre na hora de decidir cobrem a diferença.
+        if self.building is None:
+            return True
+        dist, frontier, blocked = self.building, self.frontier, game.blocked
+        cols, size = self.cols, self.size
+        steps = 0
+        while frontier:
+            cell = frontier.popleft()
+            d = dist[cell] + 1
+            x = cell % cols
+            for n in (cell - 1 if x > 0 else -1, cell + 1 if x < cols - 1 else -1,
+                      cell - cols, cell + cols):
+                if 0 <= n < size and dist[n] > d and not blocked[n]:
+                    dist[n] = d
+                    frontier.append(n)
+            steps += 1
+            if steps & 255 == 0 and time.perf_counter() > deadline:
+                return False
+        self.dist = dist
+        self.building = self.frontier = None
+        return True
+
+    def relax(self, cells, blocked, deadline):
+        # Células que ficaram livres (caudas) podem encurtar caminhos: corrige
+        # a distância delas pelos vizinhos e propaga só as melhorias. Uma
+        # célula que abre uma região inteira pode propagar muito; passado o
+        # deadline o resto fica para a próxima reconstrução.
+        dist = self.dist
+        if dist is None:
+            return
+        queue = deque()
+        for cell in cells:
+            if blocked[cell]:
+                continue
+            best = min((dist[n] for n in self._neighbors(cell)), default=UNREACHED) + 1
+            if best < dist[cell]:
+                dist[cell] = best
+                queue.append(cell)
+        steps = 0
+        while queue:
+            cell = queue.popleft()
+            d = dist[cell] + 1
+            for n in self._neighbors(cell):
+                if dist[n] > d and not blocked[n]:
+                    dist[n] = d
+                    queue.append(n)
+            steps += 1
+            if steps & 255 == 0 and time.perf_counter() > deadline:
+                return
+
+    def _neighbors(self, cell):
+        cols = self.cols
+        x = cell % cols
+        if x > 0:
+            yield cell - 1
+        if x < cols - 1:
+            yield cell + 1
+        if cell >= cols:
+            yield cell - cols
+        if cell + cols < self.size:
+            yield cell + cols
+
+
+class AIController:
+    def __init__(self, pids, budget=0.005):
+        self.pids = list(pids)
+        self.budget = budget      # Segundos de CPU por tick para toda a IA
+        self.field = None
+        self.tails = {}           # { pid: célula da cauda no tick anterior } (todas as cobras)
+        self.turn = 0             # Primeiro bot a ter a decisão completa no rodízio
+
+    def decide(self, game):
+        # Devolve { pid: direção } dos bots vivos para o próximo tick
+        started = time.perf_counter()
+        deadline = started + self.budget
+        if self.field is None:
+            self.field = DistanceField(game.cols, game.rows)
+        self.update_field(game, started + self.budget * FIELD_SHARE)
+
+        records = game.records
+        alive = [pid for pid in self.pids if pid in records and records[pid].alive]
+        danger = self.danger_cells(game)
+        choices = {}
+        smart = 0
+        count = len(alive)
+        for i in range(count):
+            pid = alive[(self.turn + i) % count]
+            if time.perf_counter() < deadline:
+                direction = self.choose(game, pid, danger, True)
+                smart += 1
+            else:
+                direction = self.choose(game, pid, danger, False)
+            if direction:
+                choices[pid] = direction
+        if count:
+            self.turn = (self.turn + smart) % count
+
+        metrics.AI_TIME.observe(time.perf_counter() - started)
+        if smart:
+            metrics.AI_DECISIONS.inc(smart, tier="path")
+        if count - smart:
+            metrics.AI_DECISIONS.inc(count - smart, tier="greedy")
+        return choices
+
+    def update_field(self, game, deadline):
+        field = self.field
+        delta = game.get_delta() or {}
+        # Caudas que andaram desde o tick anterior liberaram células
+        freed = []
+        for pid, player in game.records.items():
+            tail = player.body.tail
+            old = self.tails.get(pid)
+            if old is not None and tail != old:
+                freed.append(old)
+            self.tails[pid] = tail
+        stale = field.built_at is None or game.tick - field.built_at >= REBUILD_TICKS
+        if "fruit" in delta or delta.get("dead") or stale:
+            if field.building is None or "fruit" in delta:
+                field.rebuild(game)
+        field.relax(freed, game.blocked, deadline)
+        field.advance(game, deadline)
+
+    def danger_cells(self, game):
+        # { célula: quantas cabeças podem entrar nela no próximo tick }. A
+        # própria cabeça conta 1 nas suas saídas; acima disso é risco de
+        # colisão cabeça com cabeça.
+        danger = {}
+        cols, rows = game.cols, game.rows
+        for player in game.records.values():
+            if not player.alive:
+                continue
+            head = player.body.head
+            x, y = head % cols, head // cols
+            for _, dx, dy in MOVES:
+                if 0 <= x + dx < cols and 0 <= y + dy < rows:
+                    cell = head + dy * cols + dx
+                    danger[cell] = danger.get(cell, 0) + 1
+        return danger
+
+    def choose(self, game, pid, danger, smart):
+        player = game.records[pid]
+        body = player.body
+        cols, rows, blocked = game.cols, game.rows, game.blocked
+        head = body.head
+        hx, hy = head % cols, head // cols
+        current = DIRECTION_NAMES[player.direction]
+        candidates = []
+        for name, dx, dy in MOVES:
+            x, y = hx + dx, hy + dy
+            if 0 <= x < cols and 0 <= y < rows and not blocked[y * cols + x]:
+                candidates.append((name, y * cols + x))
+        if not candidates:
+            return None  # Sem saída: tanto faz
+
+        dist = self.field.dist if smart else None
+        if dist is None:
+            # Heurística barata: célula segura mais perto da fruta em linha reta
+            fruits = [game.cell_index(fruit) for fruit in game.fruits] or [head]
+            target = min(fruits, key=lambda f: abs(f % cols - hx) + abs(f // cols - hy))
+            fx, fy = target % cols, target // cols
+
+            def key(item):
+                name, cell = item
+                return (danger.get(cell, 0) > 1,
+                        abs(cell % cols - fx) + abs(cell // cols - fy), name != current)
+            return min(candidates, key=key)[0]
+
+        # Desce o gradiente do campo, mas antes de tudo evita se fechar num
+        # espaço menor que o próprio corpo
+        limit = min(len(body), MAX_FLOOD)
+
+        def key(item):
+            name, cell = item
+            area = self.flood(game, cell, limit) if len(candidates) > 1 else limit
+            return (-area, danger.get(cell, 0) > 1, dist[cell], name != current)
+        return min(candidates, key=key)[0]
+
+    @staticmethod
+    def flood(game, start, limit):
+        # Quantas células livres dá para alcançar a partir de start (até limit)
+        cols, size, blocked = game.cols, len(game.blocked), game.blocked
+        seen = {start}
+        queue = deque([start])
+        while queue and len(seen) < limit:
+            cell = queue.popleft()
+            x = cell % cols
+            for n in (cell - 1 if x > 0 else -1, cell + 1 if x < cols - 1 else -1,
+                      cell - cols, cell + cols):
+                if 0 <= n < size and n not in seen and not blocked[n]:
+                    seen.add(n)
+                    queue.append(n)
+        return min(len(seen), limit)
@@ -0,0 +1,16 @@
+# Recursos de renderização do cliente, carregados só quando usados.
+# Fica fora do settings.py para que o servidor não precise do pygame.
+import pygame
+from settings import FONT_NAME, FONT_SIZE
+
+_fonts = {}  # { (nome, tamanho): pygame.font.Font }
+
+
+# Retorna a fonte pedida, inicializando o módulo de fontes na primeira vez
+def get_font(size=FONT_SIZE, name=FONT_NAME):
+    key = (name, size)
+    if key not in _fonts:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        _fonts[key] = pygame.font.SysFont(name, size)
+    return _fonts[key]
@@ -0,0 +1,463 @@
+# Servidor alternativo baseado em asyncio.
+#
+# Em vez de uma thread por conexão (ThreadPoolExecutor), cada cliente é
+# atendido por uma corrotina com StreamReader/StreamWriter, e o lobby e o
+# loop do jogo rodam como tarefas no mesmo event loop. Como tudo roda em uma
+# única thread, os dicionários compartilhados não precisam de locks.
+#
+# As mensagens são as mesmas do server.py, então o client.py atual funciona
+# sem mudanças. Quem chega entra na fila de partidas (ver matchmaking.py) e,
+# enquanto espera, assiste à partida em andamento como espectador.
+#
+# Com --udp-port, clientes que pedirem recebem o estado dos ticks e mandam
+# inputs por UDP (ver udp_transport.py); o resto continua no TCP.
+#
+# Com --view-cols/--view-rows cada cliente recebe só a janela em volta da
+# própria cabeça (área de interesse), para arenas grandes com muitas cobras.
+# Com --lockstep vão só os inputs de cada tick (ver lockstep.py), pelo TCP.
+import asyncio
+import random
+import struct
+import time
+from game_state import GameState
+import server
+from scheduler import TickScheduler
+from lockstep import LockstepHost
+from replay import Recorder
+from ai import AIController, roster
+from matchmaking import PUSH_INTERVAL
+from storage import clean_name
+from input_buffer import InputBuffer
+import protocol
+import metrics
+import udp_transport
+
+_LENGTH = struct.Struct(">I")
+MAX_WRITE_BUFFER = 1 << 20  # Cliente com mais de 1 MiB pendente é desconectado
+
+
+class ClientConnection:
+    def __init__(self, pid, reader, writer):
+        self.pid = pid
+        self.reader = reader
+        self.writer = writer
+        self.version = None  # Versão binária negociada (None = pickle)
+        self.udp_token = None  # Token do canal UDP (None = só TCP)
+        self.udp_addr = None   # Endereço UDP visto no último datagrama do cliente
+        self.udp_ack = 0       # Último tick que o cliente confirmou por UDP
+        self.input_seq = 0     # Último input recebido por UDP
+
+    def send(self, msg):
+        # Escreve sem bloquear; o transporte do asyncio bufferiza o envio
+        self.send_payload(protocol.encode(msg, self.version))
+
+    def send_payload(self, payload):
+        if self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            # Cliente lento demais: não deixa o buffer crescer sem limite
+            metrics.DROPS.inc(reason="slow_client")
+            self.writer.close()
+            return
+        self.writer.write(_LENGTH.pack(len(payload)) + payload)
+        metrics.BYTES_OUT.inc(_LENGTH.size + len(payload), client=self.pid)
+
+    async def recv(self):
+        try:
+            header = await self.reader.readexactly(_LENGTH.size)
+            (size,) = _LENGTH.unpack(header)
+            payload = await self.reader.readexactly(size)
+            metrics.BYTES_IN.inc(_LENGTH.size + size, client=self.pid)
+            # Pickle só de clientes antigos e com --allow-pickle (ver server.accepts_pickle)
+            return protocol.decode(payload, server.accepts_pickle(self.version))
+        except Exception:
+            return None
+
+
+class AsyncServer:
+    def __init__(self, host=None, port=None, max_players=None):
+        # Sem argumentos, usa a configuração do server.py (settings/CLI)
+        self.host = host or server.HOST
+        self.port = port or server.PORT
+        self.max_players = max_players or server.MAX_PLAYERS
+        self.clients = {}        # { pid: ClientConnection }
+        self.player_names = {}   # { pid: nome } (só quem está jogando)
+        self.nicknames = {}      # { pid: apelido mandado no hello } (quem tem entra no ranking)
+        self.input_buffer = InputBuffer()  # Curvas numeradas de cada jogador
+        self.resync_requests = set()
+        self.next_pid = 0
+        self.in_game = False
+        self.lobby = server.new_lobby(self.max_players)  # Fila de quem espera partida
+        self.queue_changed = asyncio.Event()  # Acorda o matchmaking (ver wait_for_match)
+        self.lobby_push_pending = False   # Envio das posições já agendado
+        self.lobby_pushed_at = 0.0        # Horário (monotônico) do último envio
+        self.results = None      # ResultStore (None = não guarda, ver storage.py)
+        self.leaderboard_sent = {}  # { pid: versão do ranking já enviada }
+        self.udp_port = server.UDP_PORT
+        self.udp = None          # Transporte UDP (None = desligado)
+        self.udp_tokens = {}     # { token: pid }
+        self.epoch = 0           # Número da partida, para descartar datagramas velhos
+        self.history = udp_transport.TickHistory()
+        self.lockstep = None     # LockstepHost da partida atual (None = envia o estado)
+        self.recorder = None     # Recorder da partida atual (None = não grava)
+        self.ai = None           # AIController das cobras da IA (None = sem IA)
+
+    def broadcast(self, msg, skip_udp=False):
+        # Codifica uma vez por formato (pickle/binário) e reaproveita os bytes.
+        # skip_udp: não manda pelo TCP a quem recebe os ticks por UDP
+        encoded = {}
+        encode_time = 0.0
+        for conn in list(self.clients.values()):
+            if skip_udp and conn.udp_addr is not None:
+                continue
+            if conn.version not in encoded:
+                started = time.perf_counter()
+                encoded[conn.version] = protocol.encode(msg, conn.version)
+                encode_time += time.perf_counter() - started
+            conn.send_payload(encoded[conn.version])
+        if encoded:
+            metrics.SERIALIZE_TIME.observe(encode_time)
+
+    async def handle_client(self, reader, writer):
+        pid = self.next_pid
+        self.next_pid += 1
+        conn = ClientConnection(pid, reader, writer)
+        self.clients[pid] = conn
+        metrics.CONNECTIONS.inc()
+        print(f"[+] Conexão de {writer.get_extra_info('peername')}")
+        self.lobby.join(pid)
+        self.lobby_update()
+        try:
+            while True:
+                data = await conn.recv()
+                if data is None:
+                    print(f"[x] {self.player_names.get(pid, 'Jogador')} desconectou.")
+                    break
+                self.on_message(conn, data)
+        finally:
+            self.clients.pop(pid, None)
+            self.udp_tokens.pop(conn.udp_token, None)
+            self.lobby.leave(pid)
+            self.lobby_update()
+            self.nicknames.pop(pid, None)
+            self.leaderboard_sent.pop(pid, None)
+            self.on_disconnect(pid)
+            writer.close()
+            metrics.DISCONNECTS.inc()
+            metrics.BYTES_IN.remove(client=pid)
+            metrics.BYTES_OUT.remove(client=pid)
+
+    def on_message(self, conn, data):
+        # Trata uma mensagem recebida de um cliente
+        pid = conn.pid
+        kind = data.get("type")
+        if kind == "hello":
+            version = protocol.negotiate(data.get("versions"))
+            if version is not None:
+                conn.version = version
+                conn.send({"type": "hello", "versions": [version]})
+            name = clean_name(data.get("name"))
+            if name:
+                self.nicknames[pid] = name
+
+        elif kind == "udp" and self.udp is not None and conn.udp_token is None:
+            token = random.getrandbits(32) or 1
+            while token in self.udp_tokens:
+                token = random.getrandbits(32) or 1
+            conn.udp_token = token
+            self.udp_tokens[token] = pid
+            self.send_udp_info(conn)
+
+        elif kind == "start_game" and pid in self.lobby:
+            # Com uma partida em andamento, a próxima começa logo que ela acabar
+            print(f"[SERVER] Jogador {pid} pediu o início da partida")
+            self.lobby.request_start()
+            self.lobby_update()
+
+        elif kind == "input":
+            self.queue_input(pid, data.get("direction"), data.get("seq"), data.get("tick", 0))
+
+        elif kind == "resync" and self.in_game:
+            self.resync_requests.add(pid)
+
+    def queue_input(self, pid, direction, seq=None, tick=0):
+        # Curva de um jogador (TCP ou UDP): entra na fila dele e o tick
+        # consome uma por vez (ver input_buffer.py)
+        if self.in_game and pid in self.player_names:
+            if self.input_buffer.push(pid, direction, seq, tick):
+                metrics.INPUTS.inc()
+
+    def on_disconnect(self, pid):
+        # Gancho para subclasses liberarem recursos do jogador
+        self.input_buffer.remove(pid)
+
+    # ---------- Canal UDP ----------
+
+    def send_udp_info(self, conn):
+        conn.send({
+            "type": "udp", "port": self.udp_port,
+            "token": conn.udp_token, "epoch": self.epoch
+        })
+
+    def on_datagram(self, data, addr):
+        try:
+            token, epoch, ack, inputs = udp_transport.unpack_input(data)
+        except udp_transport.DatagramError:
+            return
+        conn = self.clients.get(self.udp_tokens.get(token))
+        if conn is None:
+            return
+        metrics.BYTES_IN.inc(len(data), client=conn.pid)
+        conn.udp_addr = addr  # A partir daqui os ticks vão por UDP
+        if epoch == self.epoch:
+            conn.udp_ack = max(conn.udp_ack, ack)
+        # Inputs vêm repetidos até o ack: a fila descarta as seqs já vistas.
+        # O tick confirmado no datagrama é o último estado que o cliente viu.
+        for seq, direction in sorted(inputs):
+            if seq > conn.input_seq:
+                conn.input_seq = seq
+                self.queue_input(conn.pid, direction, seq, ack if epoch == self.epoch else 0)
+
+    def send_udp_tick(self, game, msg, keyframe):
+        # Manda o tick aos clientes UDP: os deltas desde o último tick que cada
+        # um confirmou ou, se ele estiver muito atrás, um snapshot completo
+        self.history.add(game.tick, msg, keyframe)
+        snapshots = {}
+        for conn in list(self.clients.values()):
+            if conn.udp_addr is None:
+                continue
+            payloads = self.history.payloads(conn.udp_ack, game.tick, conn.version)
+            if payloads is None or sum(map(len, payloads)) > udp_transport.MAX_DATAGRAM:
+                if conn.version not in snapshots:
+                    snapshots[conn.version] = protocol.encode({
+                        "type": "update", "data": game.get_state(), "sent_at": msg["sent_at"],
+                        "acks": self.input_buffer.acks()
+                    }, conn.version)
+                payloads = [snapshots[conn.version]]
+            datagram = udp_transport.pack_state(self.epoch, game.tick, conn.input_seq, payloads)
+            self.udp.sendto(datagram, conn.udp_addr)
+            metrics.BYTES_OUT.inc(len(datagram), client=conn.pid)
+
+    def send_views(self, game, acks=None):
+        # Área de interesse: uma mensagem "view" por cliente com a sua janela.
+        # Clientes UDP recebem a view num datagrama se ela couber; ela já é um
+        # estado completo, então não há deltas para repetir.
+        sent_at = time.time()
+        encode_time = 0.0
+        for conn in list(self.clients.values()):
+            msg = server.view_message(game, conn.pid, sent_at, acks)
+            started = time.perf_counter()
+            payload = protocol.encode(msg, conn.version)
+            encode_time += time.perf_counter() - started
+            if conn.udp_addr is not None and len(payload) <= udp_transport.MAX_DATAGRAM:
+                datagram = udp_transport.pack_state(self.epoch, game.tick, conn.input_seq, [payload])
+                self.udp.sendto(datagram, conn.udp_addr)
+                metrics.BYTES_OUT.inc(len(datagram), client=conn.pid)
+            else:
+                conn.send_payload(payload)
+        if self.clients:
+            metrics.SERIALIZE_TIME.observe(encode_time)
+
+    # ---------- Fila de partidas ----------
+
+    def lobby_update(self):
+        # A fila mudou: acorda o matchmaking e agenda um envio das posições,
+        # no máximo um a cada PUSH_INTERVAL (uma rajada de entradas vira uma
+        # mensagem por cliente, não uma por entrada)
+        self.queue_changed.set()
+        if not self.lobby_push_pending:
+            self.lobby_push_pending = True
+            delay = self.lobby_pushed_at + PUSH_INTERVAL - time.monotonic()
+            asyncio.get_running_loop().call_later(max(0.0, delay), self.push_lobby)
+
+    def push_lobby(self):
+        # Posições na fila e, a quem ainda não viu a versão atual, o ranking
+        self.lobby_push_pending = False
+        self.lobby_pushed_at = time.monotonic()
+        messages = self.lobby.lobby_messages()
+        if self.results:
+            messages += self.results.pending(list(self.lobby.waiting), self.leaderboard_sent)
+        for pid, msg in messages:
+            conn = self.clients.get(pid)
+            if conn:
+                conn.send(msg)
+
+    async def wait_for_match(self):
+        # Dorme até a fila mudar ou o prazo dela vencer; devolve os pids de
+        # quem vai jogar (os primeiros da fila)
+        while not self.lobby.due():
+            self.queue_changed.clear()
+            try:
+                await asyncio.wait_for(self.queue_changed.wait(), self.lobby.time_left())
+            except asyncio.TimeoutError:
+                pass
+        playing = self.lobby.pop_match()
+        self.lobby_update()  # Quem ficou na fila anda para a frente
+        return playing
+
+    def open_results(self):
+        # O ranking muda na thread do banco; o envio volta para o event loop
+        loop = asyncio.get_running_loop()
+        self.results = server.open_results(lambda: loop.call_soon_threadsafe(self.lobby_update))
+
+    def record_result(self, scores, names, ranked, ticks, seed):
+        # Só enfileira: a gravação fica com a thread do banco
+        if self.results:
+            self.results.record(scores, names, ranked, ticks, seed)
+
+    def requeue(self, pids):
+        # Quem jogou e continua conectado volta para o fim da fila
+        for pid in pids:
+            if pid in self.clients:
+                self.lobby.join(pid)
+        self.lobby_update()
+
+    async def game_loop(self):
+        seed = random.getrandbits(32)
+        self.lockstep = LockstepHost(seed) if server.LOCKSTEP else None
+        bots = roster(server.AI_PLAYERS)
+        names = {**self.player_names, **bots}
+        ranked = [pid for pid in self.player_names if pid in self.nicknames]
+        game = GameState(
+            dict.fromkeys(names), names,
+            width=server.BOARD_WIDTH, height=server.BOARD_HEIGHT, seed=seed, ai_players=bots
+        )
+        self.ai = AIController(bots, server.AI_BUDGET_MS / 1000) if bots else None
+        self.recorder = Recorder.start(server.RECORD_DIR, game, seed) if server.RECORD_DIR else None
+
+        # Nova época: datagramas da partida anterior passam a ser ignorados
+        self.epoch += 1
+        self.history.clear()
+        for conn in list(self.clients.values()):
+            conn.udp_ack = 0
+            if conn.udp_token is not None:
+                self.send_udp_info(conn)
+
+        state = None if server.views_enabled() or self.lockstep else game.get_state()
+        for pid, conn in list(self.clients.items()):
+            conn.send({
+                "type": "start",
+                "player_id": pid,
+                "players": names,
+                "board": (game.width, game.height),
+                "data": state
+            })
+        if server.views_enabled():
+            self.send_views(game)
+        if self.lockstep:
+            self.broadcast(self.lockstep.start_message(game))
+
+        scheduler = TickScheduler(server.TICK_RATE, server.TICK_POLICY)
+        scheduler.start(delay=0.5)
+
+        while not game.is_game_over():
+            due = await scheduler.wait_async()
+            metrics.TICK_LATENESS.observe(scheduler.lateness)
+            ran = 0
+            for _ in range(due):
+                self.run_tick(game)
+                ran += 1
+                if game.is_game_over():
+                    break
+            scheduler.done(ran)
+
+        print(f"[*] Ticks: {scheduler.stats.summary()}")
+        if self.recorder:
+            self.recorder.finish(game)
+            print(f"[*] Partida gravada em {self.recorder.path}")
+        final_scores = game.get_state()["scores"]
+        adjusted_scores = {pid: score - 3 for pid, score in final_scores.items()}
+        self.broadcast({"type": "game_over", "scores": adjusted_scores})
+        self.record_result(adjusted_scores, names, ranked, game.tick, seed)
+        await asyncio.sleep(1)
+
+    def run_tick(self, game):
+        applied = self.input_buffer.take(game)  # No máximo uma curva por jogador
+        if self.ai:
+            # As decisões da IA viram inputs comuns (ver server.run_tick)
+            applied.update(self.ai.decide(game))
+        for pid, direction in applied.items():
+            game.set_input(pid, direction)
+
+        with metrics.UPDATE_TIME.time():
+            game.update()
+        if self.recorder:
+            self.recorder.tick(game.tick, applied)
+        acks = self.input_buffer.take_acks()  # Seqs processadas neste tick
+
+        with metrics.BROADCAST_TIME.time():
+            if self.lockstep:
+                # Só os inputs; quem dessincronizou recebe o GameState inteiro
+                msg = self.lockstep.tick_message(game, applied)
+                msg["acks"] = acks
+                self.broadcast(msg)
+                for pid in list(self.resync_requests):
+                    self.resync_requests.discard(pid)
+                    conn = self.clients.get(pid)
+                    if conn:
+                        conn.send(self.lockstep.sync_message(game))
+                return
+            if server.views_enabled():
+                self.resync_requests.clear()  # Toda view já é um estado completo
+                self.send_views(game, self.input_buffer.acks())
+                return
+            keyframe = game.tick % server.KEYFRAME_INTERVAL == 0
+            if keyframe:
+                self.resync_requests.clear()
+                msg = {"type": "update", "data": game.get_state(), "sent_at": time.time(),
+                       "acks": self.input_buffer.acks()}
+            else:
+                msg = {"type": "delta", "data": game.get_delta(), "sent_at": time.time(),
+                       "acks": acks}
+            self.broadcast(msg, skip_udp=self.udp is not None)
+            if self.udp is not None:
+                self.send_udp_tick(game, msg, keyframe)
+            if not keyframe:
+                for pid in list(self.resync_requests):
+                    self.resync_requests.discard(pid)
+                    conn = self.clients.get(pid)
+                    if conn:
+                        conn.send({"type": "update", "data": game.get_state(),
+                                   "acks": self.input_buffer.acks()})
+
+    async def run(self):
+        print("[*] Servidor asyncio iniciando...")
+        server.start_instrumentation()
+        self.open_results()
+        listener = await asyncio.start_server(
+            self.handle_client, self.host, self.port, backlog=1024
+        )
+        loop = asyncio.get_running_loop()
+        if self.udp_port:
+            self.udp, _ = await loop.create_datagram_endpoint(
+                lambda: udp_transport.UdpEndpoint(self.on_datagram), local_addr=(self.host, self.udp_port)
+            )
+            print(f"[*] Canal UDP na porta {self.udp_port}")
+
+        async with listener:
+            while True:
+                self.input_buffer.clear()
+                self.resync_requests.clear()
+                self.in_game = False
+
+                # Os primeiros da fila (até MAX_PLAYERS) jogam; o resto assiste
+                playing = await self.wait_for_match()
+                self.player_names = server.match_names(playing, self.nicknames)
+
+                print(f"[*] Iniciando partida com {len(playing)} jogadores "
+                      f"({len(self.lobby)} na fila, assistindo)")
+                self.in_game = True
+                started = time.monotonic()
+                await self.game_loop()
+                self.requeue(self.player_names)
+                print(f"[*] Partida encerrada em {time.monotonic() - started:.1f}s. "
+                      "Retornando ao lobby...")
+
+
+def main():
+    server.configure(server.parse_args())
+    asyncio.run(AsyncServer().run())
+
+
+if __name__ == "__main__":
+    main()
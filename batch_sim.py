@@ -0,0 +1,223 @@
+# Simulador em lote: N tabuleiros avançando juntos com NumPy.
+#
+# Usado offline (treino de bots, testes de balanceamento). Reproduz as mesmas
+# regras do GameState, tick a tick: com a mesma seed, o tabuleiro i do lote
+# evolui exatamente como GameState(..., seed=seeds[i]) com os mesmos inputs.
+#
+# Para isso o lote guarda as mesmas estruturas do GameState, só que como
+# arrays com uma linha por tabuleiro: grade de colisão (blocked), ocupação
+# e índice de células livres (free_cells/free_index, com remoção por troca),
+# corpos em buffers circulares de células, direções como inteiros pequenos.
+# Os jogadores são processados em sequência (como no GameState) e cada passo
+# é vetorizado sobre todos os tabuleiros; só eventos raros (comer fruta,
+# morrer) caem em laços Python sobre os tabuleiros afetados.
+#
+# Requer numpy (pip install numpy); o jogo em si não depende dele.
+import random
+import numpy as np
+from game_state import start_positions, check_board
+from settings import WIDTH, HEIGHT, BLOCK_SIZE, FRUIT_COUNT
+
+# Mesmos códigos de protocol.DIRECTION_CODES
+UP, DOWN, LEFT, RIGHT = 0, 1, 2, 3
+DIRECTION_CODES = {"UP": UP, "DOWN": DOWN, "LEFT": LEFT, "RIGHT": RIGHT}
+DX = np.array([0, 0, -1, 1], dtype=np.int32)
+DY = np.array([-1, 1, 0, 0], dtype=np.int32)
+OPPOSITE = np.array([DOWN, UP, RIGHT, LEFT], dtype=np.int8)
+
+
+class BatchGameState:
+    def __init__(self, seeds, players, fruit_count=FRUIT_COUNT, width=WIDTH, height=HEIGHT):
+        self.n = n = len(seeds)
+        self.players = players
+        self.cols = cols = width // BLOCK_SIZE
+        self.rows = rows = height // BLOCK_SIZE
+        check_board(cols, rows)
+        self.cells = cells = cols * rows
+        self.fruit_count = fruit_count
+        self.rngs = [random.Random(seed) for seed in seeds]
+        self.tick = 0
+        self.boards = np.arange(n)
+
+        self.blocked = np.zeros((n, cells), dtype=np.int16)
+        self.occupancy = np.zeros((n, cells), dtype=np.int16)
+        self.free_cells = np.tile(np.arange(cells, dtype=np.int32), (n, 1))
+        self.free_index = np.tile(np.arange(cells, dtype=np.int32), (n, 1))
+        self.free_len = np.full(n, cells, dtype=np.int32)
+
+        # Corpos: buffer circular de células; a cabeça fica em head_ptr
+        self.bodies = np.zeros((n, players, cells), dtype=np.int32)
+        self.head_ptr = np.zeros((n, players), dtype=np.int32)
+        self.length = np.zeros((n, players), dtype=np.int32)
+        self.head_x = np.zeros((n, players), dtype=np.int32)
+        self.head_y = np.zeros((n, players), dtype=np.int32)
+        self.directions = np.full((n, players), RIGHT, dtype=np.int8)
+        self.alive = np.ones((n, players), dtype=bool)
+        self.scores = np.full((n, players), 3, dtype=np.int32)
+
+        self.fruits = np.full((n, max(fruit_count, 1)), -1, dtype=np.int32)
+        self.n_fruits = np.zeros(n, dtype=np.int32)
+
+        # Mesma inicialização do GameState: 3 blocos para a direita da posição inicial
+        positions = start_positions(cols * BLOCK_SIZE, rows * BLOCK_SIZE, players)
+        everyone = self.boards
+        for p in range(players):
+            sx, sy = positions[p % len(positions)]
+            sx //= BLOCK_SIZE
+            sy //= BLOCK_SIZE
+            segments = [sy * cols + sx - k for k in range(3)]
+            self.bodies[:, p, :3] = segments
+            self.length[:, p] = 3
+            self.head_x[:, p] = sx
+            self.head_y[:, p] = sy
+            for segment in segments[1:]:
+                self.blocked[:, segment] += 1
+            for segment in segments:
+                self._occupy(everyone, np.full(n, segment, dtype=np.int32))
+
+        for b in range(n):
+            self._refill(b)
+
+    # ---------- Índice de células livres (vetorizado por tabuleiro) ----------
+
+    def _occupy(self, boards, cells):
+        # Cada tabuleiro aparece no máximo uma vez em boards
+        self.occupancy[boards, cells] += 1
+        newly = self.occupancy[boards, cells] == 1
+        b, c = boards[newly], cells[newly]
+        i = self.free_index[b, c]
+        last_pos = self.free_len[b] - 1
+        last = self.free_cells[b, last_pos]
+        self.free_cells[b, i] = last
+        self.free_index[b, last] = i
+        self.free_index[b, c] = -1
+        self.free_len[b] -= 1
+
+    def _release(self, boards, cells):
+        self.occupancy[boards, cells] -= 1
+        freed = self.occupancy[boards, cells] == 0
+        b, c = boards[freed], cells[freed]
+        self.free_index[b, c] = self.free_len[b]
+        self.free_cells[b, self.free_len[b]] = c
+        self.free_len[b] += 1
+
+    def _spawn(self, b, slot=None):
+        # Mesma lógica de GameState.spawn_fruit, para um tabuleiro
+        count = self.free_len[b]
+        if count == 0:
+            if slot is not None:
+                n = self.n_fruits[b]
+                self.fruits[b, slot:n - 1] = self.fruits[b, slot + 1:n].copy()
+                self.fruits[b, n - 1] = -1
+                self.n_fruits[b] -= 1
+            return
+        cell = int(self.free_cells[b, self.rngs[b].randrange(count)])
+        self._occupy(np.array([b]), np.array([cell], dtype=np.int32))
+        if slot is None:
+            slot = self.n_fruits[b]
+            self.n_fruits[b] += 1
+        self.fruits[b, slot] = cell
+
+    def _refill(self, b):
+        while self.n_fruits[b] < self.fruit_count and self.free_len[b] > 0:
+            self._spawn(b)
+
+    # ---------- Simulação ----------
+
+    def set_inputs(self, actions):
+        # actions: array (N, players) com códigos de direção, -1 = sem input
+        actions = np.asarray(actions, dtype=np.int8)
+        ok = (actions >= 0) & self.alive
+        ok &= actions != OPPOSITE[self.directions]
+        self.directions[ok] = actions[ok]
+
+    def step(self, actions=None):
+        if actions is not None:
+            self.set_inputs(actions)
+        self.tick += 1
+        cols, rows, cells = self.cols, self.rows, self.cells
+        L = cells
+
+        alive = self.alive.copy()
+        nx = self.head_x + DX[self.directions]
+        ny = self.head_y + DY[self.directions]
+        inside = (nx >= 0) & (nx < cols) & (ny >= 0) & (ny < rows)
+        new_cell = np.where(inside, ny * cols + nx, 0)
+
+        # Colisão cabeça com cabeça: outra cobra viva indo para a mesma célula
+        same = (new_cell[:, :, None] == new_cell[:, None, :]) & inside[:, :, None] & inside[:, None, :]
+        same &= alive[:, :, None] & alive[:, None, :]
+        head_hit = same.sum(axis=2) > 1
+
+        # Decide as mortes olhando a grade antes de qualquer movimento
+        hit_body = np.take_along_axis(self.blocked, new_cell, axis=1) > 0
+        dead = alive & (~inside | hit_body | head_hit)
+
+        for p in range(self.players):
+            dying = np.nonzero(dead[:, p])[0]
+            if dying.size:
+                self.alive[dying, p] = False
+                # Corpo de cobra morta deixa de ser obstáculo
+                lengths = self.length[dying, p]
+                b = np.repeat(dying, lengths - 1)
+                k = np.concatenate([np.arange(1, n) for n in lengths])
+                ptr = (np.repeat(self.head_ptr[dying, p], lengths - 1) + k) % L
+                np.subtract.at(self.blocked, (b, self.bodies[b, p, ptr]), 1)
+
+            moving = np.nonzero(alive[:, p] & ~dead[:, p])[0]
+            if not moving.size:
+                continue
+            old_head = self.bodies[moving, p, self.head_ptr[moving, p]]
+            self.blocked[moving, old_head] += 1  # Cabeça antiga vira corpo
+            ptr = (self.head_ptr[moving, p] - 1) % L
+            self.head_ptr[moving, p] = ptr
+            cell = new_cell[moving, p]
+            self.bodies[moving, p, ptr] = cell
+            self.length[moving, p] += 1
+            self.head_x[moving, p] = nx[moving, p]
+            self.head_y[moving, p] = ny[moving, p]
+            self._occupy(moving, cell)
+
+            ate = (self.fruits[moving] == cell[:, None]).any(axis=1)
+            for b, c in zip(moving[ate], cell[ate]):
+                self.scores[b, p] += 1
+                slot = int(np.nonzero(self.fruits[b] == c)[0][0])
+                self._release(np.array([b]), np.array([c], dtype=np.int32))
+                self._spawn(b, slot)
+
+            grow_not = moving[~ate]
+            if grow_not.size:
+                tail_ptr = (self.head_ptr[grow_not, p] + self.length[grow_not, p] - 1) % L
+                tail = self.bodies[grow_not, p, tail_ptr]
+                self.length[grow_not, p] -= 1
+                self.blocked[grow_not, tail] -= 1
+                self._release(grow_not, tail)
+
+        for b in np.nonzero((self.n_fruits < self.fruit_count) & (self.free_len > 0))[0]:
+            self._refill(b)
+
+    def is_game_over(self):
+        # Um booleano por tabuleiro
+        return ~self.alive.any(axis=1)
+
+    def get_state(self, b):
+        # Estado do tabuleiro b no mesmo formato de GameState.get_state()
+        cols = self.cols
+
+        def pos(cell):
+            return (int(cell) % cols * BLOCK_SIZE, int(cell) // cols * BLOCK_SIZE)
+
+        snakes = {}
+        for p in range(self.players):
+            idx = (self.head_ptr[b, p] + np.arange(self.length[b, p])) % self.cells
+            snakes[p] = [pos(c) for c in self.bodies[b, p, idx]]
+        fruits = [pos(c) for c in self.fruits[b, :self.n_fruits[b]]]
+        return {
+            "snakes": snakes,
+            "fruit": fruits[0] if fruits else None,
+            "fruits": fruits,
+            "alive": {p: bool(self.alive[b, p]) for p in range(self.players)},
+            "scores": {p: int(self.scores[b, p]) for p in range(self.players)},
+            "names": {},
+            "tick": self.tick,
+        }
@@ -0,0 +1,113 @@
+# Compara o simulador em lote (batch_sim.py) com o GameState escalar.
+#
+# Uso: python benchmarks/bench_batch.py [--boards N] [--ticks T] [--players P]
+#      python benchmarks/bench_batch.py --verify
+#
+# Mede passos de tabuleiro por segundo (tabuleiros x ticks / tempo). Com
+# --verify, compara o estado dos dois motores tick a tick, com as mesmas seeds
+# e os mesmos inputs, e falha na primeira divergência.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from batch_sim import BatchGameState  # noqa: E402
+from game_state import GameState  # noqa: E402
+
+NAMES = ["UP", "DOWN", "LEFT", "RIGHT"]
+
+
+def make_actions(rng, boards, players, ticks, turn_chance):
+    actions = rng.integers(0, 4, size=(ticks, boards, players), dtype=np.int8)
+    actions[rng.random(actions.shape) >= turn_chance] = -1
+    return actions
+
+
+def run_scalar(seeds, players, actions, args):
+    games = [
+        GameState({p: None for p in range(players)}, {}, seed=seed,
+                  fruit_count=args.fruits, width=args.width, height=args.height)
+        for seed in seeds
+    ]
+    started = time.perf_counter()
+    for tick_actions in actions:
+        for game, row in zip(games, tick_actions):
+            for p, code in enumerate(row):
+                if code >= 0:
+                    game.set_input(p, NAMES[code])
+            game.update()
+    return time.perf_counter() - started, games
+
+
+def run_batch(seeds, players, actions, args):
+    batch = BatchGameState(seeds, players, fruit_count=args.fruits,
+                           width=args.width, height=args.height)
+    started = time.perf_counter()
+    for tick_actions in actions:
+        batch.step(tick_actions)
+    return time.perf_counter() - started, batch
+
+
+def verify(args):
+    seeds = list(range(args.boards))
+    rng = np.random.default_rng(args.seed)
+    actions = make_actions(rng, args.boards, args.players, args.ticks, args.turn_chance)
+    batch = BatchGameState(seeds, args.players, fruit_count=args.fruits,
+                           width=args.width, height=args.height)
+    games = [
+        GameState({p: None for p in range(args.players)}, {}, seed=seed,
+                  fruit_count=args.fruits, width=args.width, height=args.height)
+        for seed in seeds
+    ]
+    for tick, tick_actions in enumerate(actions):
+        batch.step(tick_actions)
+        for b, (game, row) in enumerate(zip(games, tick_actions)):
+            for p, code in enumerate(row):
+                if code >= 0:
+                    game.set_input(p, NAMES[code])
+            game.update()
+            state = game.get_state()
+            state["names"] = {}
+            if state != batch.get_state(b):
+                sys.exit(f"Divergência no tabuleiro {b}, tick {tick + 1}")
+    print(f"OK: {args.boards} tabuleiros idênticos por {args.ticks} ticks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do simulador em lote")
+    parser.add_argument("--boards", type=int, default=1000)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--fruits", type=int, default=1)
+    parser.add_argument("--width", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=800)
+    parser.add_argument("--turn-chance", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verify", action="store_true",
+                        help="Compara com o GameState tick a tick em vez de medir")
+    args = parser.parse_args()
+
+    if args.verify:
+        verify(args)
+        return
+
+    seeds = list(range(args.boards))
+    rng = np.random.default_rng(args.seed)
+    actions = make_actions(rng, args.boards, args.players, args.ticks, args.turn_chance)
+
+    scalar_time, games = run_scalar(seeds, args.players, actions, args)
+    batch_time, batch = run_batch(seeds, args.players, actions, args)
+    steps = args.boards * args.ticks
+    alive = sum(not g.is_game_over() for g in games)
+    print(f"{args.boards} tabuleiros x {args.ticks} ticks, {args.players} jogadores "
+          f"({alive} tabuleiros ainda em jogo no fim)")
+    print(f"  GameState:      {steps / scalar_time:12.0f} passos/s")
+    print(f"  BatchGameState: {steps / batch_time:12.0f} passos/s "
+          f"({scalar_time / batch_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
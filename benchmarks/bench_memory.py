@@ -0,0 +1,84 @@
+# Memória de uma sala (GameState) e alocações por tick.
+#
+# Uso: python benchmarks/bench_memory.py [--ticks N]
+#
+# Para cada cenário (mesmos tabuleiros, jogadores e tamanhos de cobra do
+# bench_suite.py) mede com tracemalloc:
+# - bytes retidos pelo GameState montado (o que cada sala custa no host);
+# - tamanho do "sync" do lockstep (GameState.sync_state no codec binário);
+# - pico de memória alocada durante um tick (delta, cabeças novas...).
+# A tabela de posições (game_state.cell_positions) é uma por tamanho de
+# tabuleiro no processo, compartilhada pelas salas; aparece à parte.
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_suite import BOARDS, PLAYERS, LENGTHS, make_game, turns  # noqa: E402
+from game_state import cell_positions  # noqa: E402
+import protocol  # noqa: E402
+
+
+def table_bytes(cols, rows):
+    gc.collect()
+    tracemalloc.start()
+    cell_positions(cols, rows)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def room_bytes(board, players, length):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    game = make_game(board, players, length)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return game, size
+
+
+def tick_allocations(game, ticks):
+    # Média por tick do pico de memória alocada durante set_input + update
+    peaks = 0
+    tracemalloc.start()
+    for tick in range(ticks):
+        inputs = turns(game, tick)
+        gc.collect()
+        start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for pid, direction in inputs.items():
+            game.set_input(pid, direction)
+        game.update()
+        peaks += tracemalloc.get_traced_memory()[1] - start
+    tracemalloc.stop()
+    return peaks / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória por sala e alocações por tick")
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    for board, (cols, rows) in BOARDS.items():
+        print(f"tabela de posições {board} ({cols}x{rows}): "
+              f"{table_bytes(cols, rows) / 1024:.1f} KB por processo")
+    print(f"{'cenário':24s} {'sala':>10s} {'sync':>10s} {'pico/tick':>10s}")
+    for board in BOARDS:
+        for players in PLAYERS:
+            for length in LENGTHS:
+                game, size = room_bytes(board, players, length)
+                sync = {"type": "sync", "state": game.sync_state(), "inputs": {}}
+                synced = len(protocol.encode(sync, protocol.VERSION))
+                peak = tick_allocations(game, args.ticks)
+                print(f"{board}-{players}j-{length}b".ljust(24)
+                      + f" {size / 1024:8.1f} KB {synced / 1024:7.1f} KB {peak / 1024:7.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
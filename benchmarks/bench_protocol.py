@@ -0,0 +1,102 @@
+# Benchmark do codec binário (protocol.py) contra o caminho pickle atual.
+#
+# Uso: python benchmarks/bench_protocol.py [--repeat N]
+#
+# Mede bytes por mensagem e tempo de encode/decode para um estado típico de
+# 4 jogadores e para um tabuleiro grande com muitas cobras compridas.
+import argparse
+import os
+import pickle
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import protocol  # noqa: E402
+
+BLOCK = protocol.DEFAULT_CODEC.block_size
+
+
+def make_state(players, length, cols, rows):
+    # Gera cobras em "zigue-zague" dentro de faixas horizontais do tabuleiro
+    snakes, alive, scores, names = {}, {}, {}, {}
+    band = max(1, rows // players)
+    for pid in range(players):
+        body = []
+        y0 = pid * band
+        x, y, step = 0, y0, 1
+        while len(body) < length:
+            body.append((x * BLOCK, y * BLOCK))
+            nx = x + step
+            if 0 <= nx < cols:
+                x = nx
+            else:
+                step = -step
+                y = y0 + (y - y0 + 1) % band
+        snakes[pid] = body
+        alive[pid] = pid % 3 != 2
+        scores[pid] = length
+        names[pid] = f"Jogador {pid + 1}"
+    return {
+        "snakes": snakes,
+        "fruit": (cols // 2 * BLOCK, rows // 2 * BLOCK),
+        "fruits": [(cols // 2 * BLOCK, rows // 2 * BLOCK)],
+        "alive": alive,
+        "scores": scores,
+        "names": names,
+        "tick": 1234,
+    }
+
+
+def make_delta(state):
+    heads = {pid: body[0] for pid, body in state["snakes"].items() if state["alive"][pid]}
+    return {
+        "tick": state["tick"] + 1,
+        "heads": heads,
+        "tails": list(heads)[1:],
+        "dead": [],
+        "scores": {0: state["scores"][0] + 1},
+        "fruit": state["fruit"],
+        "fruits": state["fruits"],
+    }
+
+
+CASES = [
+    ("4 jogadores, 50x40, corpo 30", 4, 30, 50, 40),
+    ("4 jogadores, 50x40, corpo 300", 4, 300, 50, 40),
+    ("32 jogadores, 500x500, corpo 500", 32, 500, 500, 500),
+]
+
+
+def bench(label, msg, repeat):
+    binary = protocol.encode(msg, protocol.VERSION)
+    pickled = pickle.dumps(msg)
+    assert protocol.decode(binary) == protocol.decode(pickled), label
+
+    def timed(stmt):
+        return min(timeit.repeat(stmt, number=repeat, repeat=3)) / repeat * 1e6
+
+    p_enc = timed(lambda: pickle.dumps(msg))
+    b_enc = timed(lambda: protocol.encode(msg, protocol.VERSION))
+    p_dec = timed(lambda: protocol.decode(pickled))
+    b_dec = timed(lambda: protocol.decode(binary))
+    print(f"  {label:<10} bytes: pickle {len(pickled):>8}  binário {len(binary):>8}"
+          f"  ({len(binary) / len(pickled):.0%})")
+    print(f"  {'':<10} encode µs: pickle {p_enc:>8.1f}  binário {b_enc:>8.1f}"
+          f" | decode µs: pickle {p_dec:>8.1f}  binário {b_dec:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, players, length, cols, rows in CASES:
+        state = make_state(players, length, cols, rows)
+        print(name)
+        bench("snapshot", {"type": "update", "data": state}, args.repeat)
+        bench("delta", {"type": "delta", "data": make_delta(state)}, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
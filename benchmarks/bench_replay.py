@@ -0,0 +1,64 @@
+# Usa partidas gravadas (--record, ver replay.py) como carga para medir o
+# GameState.update com inputs de jogadores de verdade.
+#
+# Uso: python benchmarks/bench_replay.py partidas/ [mais logs ou pastas] [--repeat N]
+#
+# Cada log é reproduzido N vezes sem interface; vale o melhor tempo. O
+# resultado é o custo médio de um tick (set_input + update) por log e no total.
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from replay import Replay, ReplayLog  # noqa: E402
+
+
+def find_logs(paths):
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            logs.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith(".snkr")
+            ))
+        else:
+            logs.append(path)
+    return logs
+
+
+def bench(log, repeat):
+    best, ticks = float("inf"), 0
+    for _ in range(repeat):
+        replay = Replay(log)
+        started = time.perf_counter()
+        game = replay.run()
+        best = min(best, time.perf_counter() - started)
+        ticks = game.tick
+    return ticks, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GameState.update com partidas gravadas")
+    parser.add_argument("paths", nargs="+", help="Arquivos .snkr ou pastas com eles")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = find_logs(args.paths)
+    if not paths:
+        sys.exit("Nenhum log .snkr encontrado")
+    total_ticks, total_time = 0, 0.0
+    for path in paths:
+        log = ReplayLog.load(path)
+        ticks, elapsed = bench(log, args.repeat)
+        total_ticks += ticks
+        total_time += elapsed
+        print(f"{os.path.basename(path):40s} {len(log.names):4d} jogadores "
+              f"{ticks:6d} ticks  {elapsed / max(ticks, 1) * 1e6:8.1f} µs/tick")
+    print(f"{'total':40s} {len(paths):4d} logs      {total_ticks:6d} ticks  "
+          f"{total_time / max(total_ticks, 1) * 1e6:8.1f} µs/tick")
+
+
+if __name__ == "__main__":
+    main()
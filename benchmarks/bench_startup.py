@@ -0,0 +1,51 @@
+# Mede o tempo de cold start dos módulos do servidor.
+#
+# Uso: python benchmarks/bench_startup.py [--repeat N]
+#
+# Cada medição roda um interpretador novo, então inclui o custo de importar
+# tudo do zero. Também informa se o pygame acabou sendo carregado (não deve:
+# o servidor e o GameState não dependem dele).
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ("interpretador vazio", "pass"),
+    ("import game_state", "import game_state"),
+    ("GameState()", "from game_state import GameState; GameState({0: 0, 1: 0}, {})"),
+    ("import server", "import server"),
+]
+
+PROBE = "import sys, time; t = time.perf_counter(); {code}; " \
+        "print(time.perf_counter() - t, 'pygame' in sys.modules)"
+
+
+def measure(code, repeat):
+    times, pygame_loaded = [], False
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(code=code)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.split()
+        times.append(float(out[0]))
+        pygame_loaded = out[1] == "True"
+    return statistics.median(times), pygame_loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start do servidor")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    for label, code in CASES:
+        median, pygame_loaded = measure(code, args.repeat)
+        extra = " (carregou pygame!)" if pygame_loaded else ""
+        print(f"{label:<22} {median * 1000:8.2f} ms{extra}")
+
+
+if __name__ == "__main__":
+    main()
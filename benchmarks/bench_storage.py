@@ -0,0 +1,123 @@
+# Gravação de resultados e consulta do ranking (storage.py) com milhões de partidas.
+#
+# Uso: python benchmarks/bench_storage.py [--matches N] [--players N] [--names N]
+#                                         [--chunk N] [--db ARQUIVO]
+#
+# Gera partidas sintéticas (placares aleatórios, nomes sorteados de um grupo
+# de --names apelidos, mais um bot por partida fora do ranking) e as grava
+# pelo ResultStore, do mesmo jeito que o servidor: record() no "tick" e a
+# thread do banco gravando em lotes. As partidas entram em blocos de --chunk
+# seguidos de um flush(), para a fila não guardar milhões de tuplas na
+# memória. Relata:
+# - partidas/s e linhas/s gravadas (de ponta a ponta, até o flush);
+# - quanto cada record() segura quem chama (é o que o tick paga);
+# - o ranking: da memória (o que o lobby usa), pelo índice em SQL e, para
+#   comparar, calculado do histórico inteiro (GROUP BY, sem a tabela players);
+# - busca de um jogador pela chave e o tamanho final do banco.
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import storage  # noqa: E402
+
+# Ranking sem a tabela agregada: varre todos os resultados a cada consulta
+# (só para comparar o custo; aqui empates no 1º lugar contam como vitória)
+SCAN_QUERY = """
+SELECT player, sum(place = 1) AS wins, max(score) AS best, count(*) AS matches
+FROM results WHERE ranked GROUP BY player ORDER BY wins DESC, best DESC LIMIT ?
+"""
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(p / 100 * (len(values) - 1)))] if values else 0.0
+
+
+def timed(fn, repeat):
+    # Melhor tempo de `repeat` chamadas, em segundos
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def synthetic_matches(count, players, names, seed=1):
+    # (scores, names, ranked, ticks, seed) de cada partida, gerados sob demanda
+    rng = random.Random(seed)
+    pool = [f"jogador{i}" for i in range(names)]
+    bot = players  # O último pid é um bot, fora do ranking
+    for _ in range(count):
+        picked = rng.sample(pool, players)
+        match_names = dict(enumerate(picked))
+        match_names[bot] = "Bot 1"
+        scores = {pid: rng.randrange(60) for pid in match_names}
+        yield scores, match_names, range(players), rng.randrange(200, 2000), rng.getrandbits(32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gravação e consulta de resultados em SQLite")
+    parser.add_argument("--matches", type=int, default=1_000_000)
+    parser.add_argument("--players", type=int, default=4, help="Pessoas por partida (mais um bot)")
+    parser.add_argument("--names", type=int, default=10_000, help="Apelidos diferentes")
+    parser.add_argument("--chunk", type=int, default=50_000, help="Partidas entre dois flush()")
+    parser.add_argument("--db", default=None, help="Arquivo do banco (padrão: temporário)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench_results.db")
+    store = storage.ResultStore(path)
+    start_count = store.written
+
+    # ---------- Gravação ----------
+    samples = []            # Duração de uma amostra dos record() (1 em 100)
+    worst = 0.0
+    started = time.perf_counter()
+    for i, match in enumerate(synthetic_matches(args.matches, args.players, args.names)):
+        before = time.perf_counter()
+        store.record(*match)
+        elapsed = time.perf_counter() - before
+        worst = max(worst, elapsed)
+        if i % 100 == 0:
+            samples.append(elapsed)
+        if (i + 1) % args.chunk == 0:
+            store.flush()
+    store.flush()
+    total = time.perf_counter() - started
+    written = store.written - start_count
+    rows = written * (args.players + 2)  # matches + results (pessoas e bot)
+    print(f"{written} partidas gravadas em {total:.1f} s: "
+          f"{written / total:,.0f} partidas/s, {rows / total:,.0f} linhas/s")
+    print(f"record() no tick: p50 {percentile(samples, 50) * 1e6:.1f} µs, "
+          f"p99 {percentile(samples, 99) * 1e6:.1f} µs, máx {worst * 1e6:.0f} µs")
+
+    # ---------- Consultas ----------
+    db = sqlite3.connect(path)
+    n = storage.LEADERBOARD_SIZE
+    name = store.leaderboard(1)[0][0] if store.leaderboard(1) else "jogador0"
+    cached = timed(lambda: store.leaderboard_message(), 1000)
+    indexed = timed(lambda: db.execute(storage.TOP_QUERY, (n,)).fetchall(), 100)
+    lookup = timed(lambda: db.execute("SELECT * FROM players WHERE name = ?", (name,)).fetchone(), 1000)
+    scan = timed(lambda: db.execute(SCAN_QUERY, (n,)).fetchall(), 1)
+    plan = db.execute("EXPLAIN QUERY PLAN " + storage.TOP_QUERY, (n,)).fetchall()
+    print(f"ranking (top {n}): memória {cached * 1e6:.1f} µs, "
+          f"índice {indexed * 1e6:.1f} µs, varrendo o histórico {scan * 1e3:.0f} ms")
+    print(f"plano do ranking: {'; '.join(row[-1] for row in plan)}")
+    print(f"jogador pela chave: {lookup * 1e6:.1f} µs")
+    db.close()
+    store.close()
+
+    size = sum(os.path.getsize(path + suffix) for suffix in ("", "-wal")
+               if os.path.exists(path + suffix))
+    print(f"banco: {size / 1e6:.1f} MB em {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+# Micro-benchmarks dos caminhos quentes da simulação e da rede, com baseline.
+#
+# Uso: python benchmarks/bench_suite.py                # Mede e compara com a baseline
+#      python benchmarks/bench_suite.py --save         # Grava as medidas como baseline
+#      python benchmarks/bench_suite.py -k update -k draw --threshold 0.2
+#      python benchmarks/bench_suite.py --min-delta-us 2
+#
+# Casos (parametrizados por tabuleiro, número de jogadores e tamanho das cobras):
+# - update:    GameState.update por tick (partida deterministica, seed fixa)
+# - spawn:     GameState.random_position num tabuleiro quase cheio
+# - get_state: GameState.get_state (o snapshot dos keyframes, do resync e do UDP)
+# - roundtrip: get_state + send_data + recv_data por um socketpair (pickle e binário)
+# - draw:      BoardRenderer.draw (incremental) com o driver de vídeo "dummy"
+#              do SDL; pulado se o pygame não estiver instalado
+#
+# Cada caso roda em lotes de ~0,1 s e vale o melhor de --repeat lotes, em µs
+# por operação. As medidas vão para um JSON (--save); nas rodadas seguintes,
+# um caso mais lento que a baseline além de --threshold (fração, padrão 0.25)
+# e também de --min-delta-us (µs, padrão 1) faz o script sair com código 1:
+# nos casos de ~1 µs (spawn) o ruído entre rodadas já passa de 25%. A
+# baseline depende da máquina e fica fora do git (.gitignore), então cada
+# um grava a sua com --save antes de mexer no código (e de novo ao trocar
+# de máquina ou de Python). Sem baseline a comparação sai com código 1 em
+# vez de passar sem ter comparado nada.
+import argparse
+import json
+import os
+import pickle
+import platform
+import socket
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Janela sem tela (antes do pygame)
+
+from game_state import GameState  # noqa: E402
+from settings import BLOCK_SIZE  # noqa: E402
+from utils import send_data, recv_data  # noqa: E402
+import protocol  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+BOARDS = {"pequeno": (50, 40), "grande": (200, 150)}  # Em células
+PLAYERS = (4, 32)
+LENGTHS = (3, 40)
+UPDATE_TICKS = 20      # Ticks de cada partida medida no caso update
+FREE_CELLS = 10        # Células livres no caso spawn
+TARGET_TIME = 0.1      # Duração aproximada de cada lote
+
+
+class Skip(Exception):
+    pass
+
+
+# ---------- Montagem dos cenários ----------
+
+def grow(game, pid, length):
+    # Estica a cobra pela cauda até `length` blocos, andando por células
+    # livres (prefere seguir reto), com a mesma contabilidade do update()
+    player = game.records[pid]
+    body = player.body
+    cols, rows = game.cols, game.rows
+    heading = (-1, 0)
+    while len(body) < length:
+        tail_x, tail_y = body.tail % cols, body.tail // cols
+        for dx, dy in (heading, (0, -1), (0, 1), (1, 0), (-1, 0)):
+            x, y = tail_x + dx, tail_y + dy
+            if 0 <= x < cols and 0 <= y < rows and not game.occupancy[y * cols + x]:
+                break
+        else:
+            return  # Encurralada: fica do tamanho que deu
+        heading = (dx, dy)
+        cell = y * cols + x
+        body.append(cell, game.cell_position(cell))
+        game.blocked[cell] += 1
+        game.occupy(cell)
+        game.snake_grid.add_cell(cell, pid)
+        player.score += 1
+
+
+def make_game(board, players, length, seed=1):
+    cols, rows = BOARDS[board]
+    names = {pid: f"Jogador {pid + 1}" for pid in range(players)}
+    game = GameState(dict.fromkeys(names), names, seed=seed,
+                     width=cols * BLOCK_SIZE, height=rows * BLOCK_SIZE)
+    for pid in game.players:
+        grow(game, pid, length)
+    return game
+
+
+def turns(game, tick):
+    # Inputs deterministicos: cada cobra vira a cada poucos ticks
+    order = ("UP", "RIGHT", "DOWN", "RIGHT")
+    return {pid: order[(tick // 4 + pid) % 4] for pid in game.players}
+
+
+# ---------- Casos ----------
+
+def bench_update(board, players, length):
+    snapshot = pickle.dumps(make_game(board, players, length))
+    state = {"game": None, "tick": UPDATE_TICKS}
+
+    def op():
+        # Uma partida nova a cada UPDATE_TICKS ticks; só o tick entra na medida
+        if state["tick"] == UPDATE_TICKS:
+            state["game"], state["tick"] = pickle.loads(snapshot), 0
+        game = state["game"]
+        started = time.perf_counter()
+        for pid, direction in turns(game, state["tick"]).items():
+            game.set_input(pid, direction)
+        game.update()
+        elapsed = time.perf_counter() - started
+        state["tick"] += 1
+        return elapsed
+    return op
+
+
+def bench_spawn(board, players, length):
+    game = make_game(board, players, length)
+    # Ocupa tudo menos FREE_CELLS células, pelo mesmo índice que as frutas usam
+    rng = game.rng
+    while len(game.free_cells) > FREE_CELLS:
+        game.occupy(game.free_cells[rng.randrange(len(game.free_cells))])
+
+    def op():
+        game.random_position()
+    return op
+
+
+def bench_get_state(board, players, length):
+    game = make_game(board, players, length)
+
+    def op():
+        game.get_state()
+    return op
+
+
+def bench_roundtrip(board, players, length, version):
+    game = make_game(board, players, length)
+    left, right = socket.socketpair()
+    for sock in (left, right):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 22)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+
+    def op():
+        send_data(left, {"type": "update", "data": game.get_state()}, version)
+        if recv_data(right) is None:
+            raise RuntimeError("recv_data falhou")
+    op.close = lambda: (left.close(), right.close())
+    return op
+
+
+def bench_draw(board, players, length):
+    try:
+        import pygame
+    except ImportError:
+        raise Skip("pygame não instalado")
+    from renderer import BoardRenderer
+    from assets import get_font
+
+    game = make_game(board, players, length)
+    states = []
+    for tick in range(UPDATE_TICKS):
+        for pid, direction in turns(game, tick).items():
+            game.set_input(pid, direction)
+        game.update()
+        states.append(pickle.loads(pickle.dumps(game.get_state())))
+    pygame.display.init()
+    screen = pygame.display.set_mode((game.width, game.height))
+    renderer = BoardRenderer(screen, get_font(), {pid: (0, 200, 0) for pid in game.players})
+    index = [0]
+
+    def op():
+        state = states[index[0] % len(states)]
+        index[0] += 1
+        renderer.draw(state, f"Tick {state['tick']}", (255, 255, 255))
+    op.close = pygame.display.quit
+    return op
+
+
+def cases():
+    # [(nome, fábrica)]; a fábrica monta o cenário e devolve a operação medida
+    out = []
+    for board in BOARDS:
+        for players in PLAYERS:
+            for length in LENGTHS:
+                params = (board, players, length)
+                suffix = f"{board}-{players}j-{length}b"
+                out.append((f"update/{suffix}", lambda p=params: bench_update(*p)))
+                out.append((f"get_state/{suffix}", lambda p=params: bench_get_state(*p)))
+                out.append((f"roundtrip-pickle/{suffix}",
+                            lambda p=params: bench_roundtrip(*p, None)))
+                out.append((f"roundtrip-binario/{suffix}",
+                            lambda p=params: bench_roundtrip(*p, protocol.VERSION)))
+                out.append((f"draw/{suffix}", lambda p=params: bench_draw(*p)))
+        out.append((f"spawn/{board}-{FREE_CELLS}livres",
+                    lambda b=board: bench_spawn(b, 4, 3)))
+    return out
+
+
+# ---------- Medição ----------
+
+def batch(op, number):
+    # Tempo de `number` operações. Uma operação que devolve um número mediu a
+    # si mesma (ex.: update, que deixa a preparação da partida fora da medida)
+    total = 0.0
+    started = time.perf_counter()
+    for _ in range(number):
+        elapsed = op()
+        if elapsed is not None:
+            total += elapsed
+    return total or time.perf_counter() - started
+
+
+def measure(op, repeat):
+    # Calibra o lote para ~TARGET_TIME e devolve o melhor tempo por operação
+    number = 1
+    while True:
+        elapsed = batch(op, number)
+        if elapsed >= TARGET_TIME / 4 or number >= 1 << 20:
+            break
+        number *= 4
+    number = max(1, int(number * TARGET_TIME / max(elapsed, 1e-9)))
+    best = min(batch(op, number) for _ in range(repeat))
+    return best / number * 1e6
+
+
+def run(selected, repeat):
+    results = {}
+    for name, factory in selected:
+        try:
+            op = factory()
+        except Skip as exc:
+            print(f"{name:40s} pulado ({exc})")
+            continue
+        try:
+            results[name] = measure(op, repeat)
+        finally:
+            if hasattr(op, "close"):
+                op.close()
+        print(f"{name:40s} {results[name]:10.1f} µs")
+    return results
+
+
+def compare(results, baseline, threshold, min_delta):
+    # Devolve os casos que pioraram além do limite relativo (threshold) e do
+    # absoluto (min_delta, em µs: piso de ruído dos casos muito rápidos)
+    regressions = []
+    for name, value in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        change = value / old - 1
+        flag = ""
+        if change > threshold and value - old > min_delta:
+            regressions.append(name)
+            flag = "  <-- REGRESSÃO"
+        print(f"{name:40s} {old:10.1f} → {value:10.1f} µs ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks com baseline em JSON")
+    parser.add_argument("-k", dest="filters", action="append", default=[],
+                        help="Só os casos cujo nome contém este texto (pode repetir)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Arquivo JSON da baseline")
+    parser.add_argument("--save", action="store_true", help="Grava as medidas como baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Piora tolerada em fração da baseline (0.25 = 25%%)")
+    parser.add_argument("--min-delta-us", type=float, default=1.0,
+                        help="Piora mínima em µs para contar como regressão (ruído dos casos rápidos)")
+    parser.add_argument("--list", action="store_true", help="Só lista os casos")
+    args = parser.parse_args()
+
+    selected = [(name, factory) for name, factory in cases()
+                if not args.filters or any(f in name for f in args.filters)]
+    if args.list:
+        print("\n".join(name for name, _ in selected))
+        return
+    results = run(selected, args.repeat)
+
+    if args.save:
+        data = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                data = json.load(f)
+        data.setdefault("results", {}).update(results)  # Mantém os casos não rodados
+        data["machine"] = {"python": platform.python_version(), "platform": platform.platform()}
+        with open(args.baseline, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        print(f"Baseline gravada em {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        sys.exit(f"FALHOU: sem baseline em {args.baseline}; grave uma com "
+                 f"python benchmarks/bench_suite.py --save (no código de referência)")
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    print()
+    regressions = compare(results, baseline, args.threshold, args.min_delta_us)
+    if regressions:
+        print(f"{len(regressions)} caso(s) acima de +{args.threshold:.0%} "
+              f"(e +{args.min_delta_us:g} µs): {', '.join(regressions)}")
+        sys.exit(1)
+    print("Nenhuma regressão acima do limite")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Compara TCP e UDP sob perda de pacotes simulada.
+#
+# Uso: python benchmarks/bench_transport.py [--bots N] [--duration S]
+#                                          [--latency S] [--losses 0,0.01,0.03,0.05]
+#
+# Para cada taxa de perda sobe um async_server.py com canal UDP e conecta
+# bots que recebem os ticks pelo TCP ou pelo UDP, com a rede simulada pelo
+# próprio bot (ver NetworkSimulator em udp_transport.py). Mostra a latência
+# servidor → cliente dos updates aplicados: no TCP uma perda atrasa todos os
+# updates seguintes até a retransmissão; no UDP o datagrama seguinte já traz
+# os deltas que faltavam. A última coluna é o p99 de input → efeito (do envio
+# da curva até o estado com o ack dela). No TCP a simulação só atrasa o que
+# chega ao bot; no UDP atrasa também o datagrama com a curva, então sem perda
+# o UDP costuma perder um tick a mais.
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bot_client import run_bots  # noqa: E402
+from load_test import percentile, wait_for_port  # noqa: E402
+
+
+def run(transport, loss, args, port):
+    cmd = [sys.executable, os.path.join(ROOT, "async_server.py"),
+           "--port", str(port), "--udp-port", str(port + 1),
+           "--tick-rate", str(args.tick_rate), "--max-players", str(args.bots)]
+    process = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port("localhost", port)
+        bots = asyncio.run(run_bots(
+            args.bots, args.duration, starters=1, host="localhost", port=port,
+            udp=transport == "udp", loss=loss, latency=args.latency, jitter=args.jitter
+        ))
+    finally:
+        process.terminate()
+        process.wait()
+    latencies = [lat for bot in bots for lat in bot.stats.latencies]
+    updates = sum(bot.stats.updates for bot in bots) / len(bots)
+    inputs = [lat for bot in bots for lat in bot.stats.inputs.samples]
+    return latencies, updates, inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TCP x UDP com perda simulada")
+    parser.add_argument("--bots", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=8.0)
+    parser.add_argument("--tick-rate", type=float, default=20.0)
+    parser.add_argument("--latency", type=float, default=0.03, help="Latência simulada (s)")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--losses", default="0,0.01,0.03,0.05")
+    parser.add_argument("--port", type=int, default=5700)
+    args = parser.parse_args()
+
+    print(f"{args.bots} bots, {args.tick_rate:g} ticks/s, latência {args.latency * 1000:.0f} ms")
+    print(f"{'perda':>6} {'transporte':>10} {'updates':>8} {'p50 ms':>8} "
+          f"{'p99 ms':>8} {'máx ms':>8} {'input p99':>10}")
+    port = args.port
+    for loss in (float(x) for x in args.losses.split(",")):
+        for transport in ("tcp", "udp"):
+            latencies, updates, inputs = run(transport, loss, args, port)
+            port += 2
+            print(f"{loss:>6.0%} {transport:>10} {updates:>8.0f} "
+                  f"{percentile(latencies, 50) * 1000:>8.1f} "
+                  f"{percentile(latencies, 99) * 1000:>8.1f} "
+                  f"{max(latencies, default=0) * 1000:>8.1f} "
+                  f"{percentile(inputs, 99) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
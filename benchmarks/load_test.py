@@ -0,0 +1,266 @@
+# Teste de carga: sobe um servidor local e conecta centenas de bots.
+#
+# Uso: python benchmarks/load_test.py [--server async|threads|rooms|none]
+#                                     [--bots N] [--duration S]
+#                                     [--width PX --height PX]
+#                                     [--view-cols N --view-rows N] [--lockstep]
+#                                     [--ai N --ai-budget MS]
+#                                     [--auto-start N --start-timeout S]
+#                                     [--results DB]
+#
+# Relata a estabilidade da taxa de ticks (intervalo entre updates recebidos),
+# percentis de latência servidor → cliente (pelo sent_at das mensagens) e
+# de input → efeito (pelos acks das seqs dos inputs), bytes/s por cliente,
+# a espera na fila até cada partida (com --results, os bots entram com
+# apelido e contam os rankings recebidos) e quantas conexões caíram ou
+# ficaram travadas (sem mensagens durante uma partida). Com --results,
+# confere também o banco no fim: toda linha de bot tem que estar marcada
+# como identificada e os totais do ranking têm que bater com o histórico.
+# Sai com código 1 se algum limite (--max-p99-ms, --max-dropped,
+# --max-stuck) for ultrapassado ou o ranking não bater, para servir de
+# portão de regressão do código de rede.
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bot_client import run_bots  # noqa: E402
+
+SERVERS = {
+    "async": "async_server.py",
+    "threads": "server.py",
+    "rooms": "rooms.py",
+}
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def wait_for_port(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Servidor não respondeu em {host}:{port}")
+
+
+def start_server(args):
+    if args.server == "none":
+        return None
+    cmd = [
+        sys.executable, os.path.join(ROOT, SERVERS[args.server]),
+        "--host", args.host, "--port", str(args.port),
+        "--tick-rate", str(args.tick_rate), "--max-players", str(args.max_players),
+    ]
+    # Arena grande / área de interesse: só repassa o que foi pedido
+    for option in ("width", "height", "view_cols", "view_rows", "record", "ai", "ai_budget",
+                   "auto_start", "start_timeout", "results"):
+        value = getattr(args, option)
+        if value is not None:
+            cmd += ["--" + option.replace("_", "-"), str(value)]
+    if args.lockstep:
+        cmd.append("--lockstep")
+    if args.pickle:
+        cmd.append("--allow-pickle")  # Bots sem codec binário falam pickle
+    process = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    wait_for_port(args.host, args.port)
+    return process
+
+
+def check_results(path):
+    # Confere o banco do --results: os bots entram todos com apelido, então
+    # toda linha deles vale para o ranking, e partidas e recorde de cada
+    # nome em players são os das linhas identificadas do histórico
+    db = sqlite3.connect(path)
+    try:
+        matches = db.execute("SELECT count(*) FROM matches").fetchone()[0]
+        unranked = db.execute(
+            "SELECT count(*) FROM results WHERE player LIKE 'bot %' AND NOT ranked"
+        ).fetchone()[0]
+        mismatched = db.execute("""
+            SELECT count(*) FROM players p
+            LEFT JOIN (SELECT player, count(*) AS n, max(score) AS best
+                       FROM results WHERE ranked GROUP BY player) r ON r.player = p.name
+            WHERE r.n IS NULL OR r.n != p.matches OR r.best != p.best_score
+        """).fetchone()[0]
+        missing = db.execute(
+            "SELECT count(DISTINCT player) FROM results WHERE ranked "
+            "AND player NOT IN (SELECT name FROM players)"
+        ).fetchone()[0]
+        ranked = db.execute("SELECT count(*) FROM players").fetchone()[0]
+    finally:
+        db.close()
+    return {"matches": matches, "ranked_players": ranked,
+            "unranked_bot_rows": unranked, "mismatched_players": mismatched + missing}
+
+
+def report(bots, args):
+    interval = 1.0 / args.tick_rate
+    gaps, latencies, rates, waits, inputs = [], [], [], [], []
+    for bot in bots:
+        s = bot.stats
+        latencies.extend(s.latencies)
+        inputs.extend(s.inputs.samples)
+        waits.extend(s.match_waits)
+        # Intervalos entre updates da mesma partida (ignora a pausa do lobby)
+        gaps.extend(
+            b - a for a, b in zip(s.arrivals, s.arrivals[1:]) if b - a < 5 * interval
+        )
+        rates.append(s.bytes_in / args.duration)
+
+    dropped = sum(bot.stats.dropped for bot in bots)
+    stuck = sum(
+        not bot.stats.dropped and bot.stats.max_gap > args.stuck_after for bot in bots
+    )
+    result = {
+        "bots": len(bots),
+        "updates": sum(bot.stats.updates for bot in bots),
+        "tick_interval_ms": {
+            "expected": interval * 1000,
+            "mean": statistics.fmean(gaps) * 1000 if gaps else 0.0,
+            "stdev": statistics.pstdev(gaps) * 1000 if gaps else 0.0,
+            "p99": percentile(gaps, 99) * 1000,
+        },
+        "latency_ms": {
+            f"p{p}": percentile(latencies, p) * 1000 for p in (50, 90, 99)
+        } | {"max": max(latencies, default=0.0) * 1000},
+        # Do envio do input até o estado com o ack dele (inclui a espera do tick)
+        "input_latency_ms": {
+            "inputs": len(inputs),
+            "p50": percentile(inputs, 50) * 1000,
+            "p99": percentile(inputs, 99) * 1000,
+            "max": max(inputs, default=0.0) * 1000,
+        },
+        "bytes_per_sec_per_client": {
+            "mean": statistics.fmean(rates) if rates else 0.0,
+            "max": max(rates, default=0.0),
+        },
+        "match_wait_s": {
+            "matches": len(waits),
+            "p50": percentile(waits, 50),
+            "p99": percentile(waits, 99),
+            "max": max(waits, default=0.0),
+        },
+        "dropped": dropped,
+        "stuck": stuck,
+        "desyncs": sum(bot.stats.desyncs for bot in bots),
+        "leaderboards": sum(bot.stats.leaderboards for bot in bots),
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do servidor Snake")
+    parser.add_argument("--server", choices=list(SERVERS) + ["none"], default="async",
+                        help="Servidor a iniciar (none = usar um já rodando)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5600)
+    parser.add_argument("--bots", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--tick-rate", type=float, default=20 / 3)
+    parser.add_argument("--max-players", type=int, default=4)
+    parser.add_argument("--width", type=int, default=None, help="Largura do tabuleiro em pixels")
+    parser.add_argument("--height", type=int, default=None, help="Altura do tabuleiro em pixels")
+    parser.add_argument("--view-cols", type=int, default=None,
+                        help="Área de interesse de cada bot em células (0 = tabuleiro inteiro)")
+    parser.add_argument("--view-rows", type=int, default=None)
+    parser.add_argument("--record", metavar="DIR", default=None,
+                        help="Servidor grava as partidas em DIR (ver replay.py)")
+    parser.add_argument("--lockstep", action="store_true",
+                        help="Servidor manda só os inputs; os bots simulam a partida")
+    parser.add_argument("--ai", type=int, default=None,
+                        help="Cobras da IA do servidor em cada partida (ver ai.py)")
+    parser.add_argument("--ai-budget", type=float, default=None,
+                        help="Milissegundos de CPU por tick para a IA do servidor")
+    parser.add_argument("--auto-start", type=int, default=None,
+                        help="Servidor inicia a partida quando a fila chega a N jogadores")
+    parser.add_argument("--start-timeout", type=float, default=None,
+                        help="Servidor inicia a partida quando o primeiro da fila espera S segundos")
+    parser.add_argument("--results", metavar="DB", default=None,
+                        help="Servidor guarda os resultados em DB; os bots entram com apelido")
+    parser.add_argument("--starters", type=int, default=1,
+                        help="Quantos bots apertam Iniciar Jogo (no rooms, um por sala)")
+    parser.add_argument("--pickle", action="store_true", help="Bots sem codec binário")
+    parser.add_argument("--stuck-after", type=float, default=3.0,
+                        help="Segundos sem mensagens numa partida para considerar a conexão travada")
+    parser.add_argument("--max-p99-ms", type=float, default=None)
+    parser.add_argument("--max-dropped", type=int, default=None)
+    parser.add_argument("--max-stuck", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="Imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    process = start_server(args)
+    try:
+        bots = asyncio.run(run_bots(
+            args.bots, args.duration, starters=args.starters, host=args.host,
+            port=args.port, binary=not args.pickle, named=args.results is not None
+        ))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    result = report(bots, args)
+    if args.results:
+        result["results_db"] = check_results(args.results)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        t, lat, bw = result["tick_interval_ms"], result["latency_ms"], \
+            result["bytes_per_sec_per_client"]
+        print(f"{result['bots']} bots, {result['updates']} updates recebidos")
+        print(f"  intervalo entre ticks: esperado {t['expected']:.1f} ms, "
+              f"média {t['mean']:.1f} ms, desvio {t['stdev']:.1f} ms, p99 {t['p99']:.1f} ms")
+        print(f"  latência: p50 {lat['p50']:.1f} ms, p90 {lat['p90']:.1f} ms, "
+              f"p99 {lat['p99']:.1f} ms, máx {lat['max']:.1f} ms")
+        inp = result["input_latency_ms"]
+        print(f"  input → efeito: {inp['inputs']} inputs, p50 {inp['p50']:.1f} ms, "
+              f"p99 {inp['p99']:.1f} ms, máx {inp['max']:.1f} ms")
+        print(f"  bytes/s por cliente: média {bw['mean']:.0f}, máx {bw['max']:.0f}")
+        wait = result["match_wait_s"]
+        print(f"  espera na fila: {wait['matches']} entradas em partidas, p50 {wait['p50']:.1f} s, "
+              f"p99 {wait['p99']:.1f} s, máx {wait['max']:.1f} s")
+        print(f"  conexões caídas: {result['dropped']}, travadas: {result['stuck']}")
+        if args.lockstep:
+            print(f"  dessincronias do lockstep: {result['desyncs']}")
+        if args.results:
+            db = result["results_db"]
+            print(f"  rankings recebidos: {result['leaderboards']}")
+            print(f"  banco: {db['matches']} partidas, {db['ranked_players']} jogadores no ranking, "
+                  f"{db['unranked_bot_rows']} linhas de bot fora do ranking, "
+                  f"{db['mismatched_players']} totais que não batem com o histórico")
+
+    failures = []
+    if args.max_p99_ms is not None and result["latency_ms"]["p99"] > args.max_p99_ms:
+        failures.append("latência p99")
+    if args.max_dropped is not None and result["dropped"] > args.max_dropped:
+        failures.append("conexões caídas")
+    if args.max_stuck is not None and result["stuck"] > args.max_stuck:
+        failures.append("conexões travadas")
+    db = result.get("results_db")
+    if db and (db["unranked_bot_rows"] or db["mismatched_players"]):
+        failures.append("ranking do --results")
+    if failures:
+        sys.exit("FALHOU: " + ", ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+# Cliente sem interface gráfica (bot) para testes de carga.
+#
+# Fala o mesmo protocolo do client.py (hello, lobby, start, update/delta com
+# resync, input, game_over), mas joga sozinho com inputs aleatórios ou com
+# uma sequência fixa de direções. Roda em asyncio para que um único processo
+# consiga manter centenas de bots conectados (ver benchmarks/load_test.py).
+#
+# Contra um servidor com --lockstep o bot simula a partida com os inputs
+# recebidos e pede resync se o resumo do estado não bater.
+#
+# Com --udp os ticks vêm pelo canal UDP (se o servidor oferecer). --loss,
+# --latency e --jitter simulam a rede: no UDP cada datagrama é descartado ou
+# atrasado; no TCP uma perda atrasa a mensagem e todas as seguintes pelo
+# tempo de uma retransmissão (head-of-line blocking).
+#
+# Uso: python bot_client.py [--bots N] [--policy random|script] [--start] [--udp]
+import argparse
+import asyncio
+import random
+import struct
+import time
+from game_state import apply_delta
+from input_buffer import LatencyTracker
+from lockstep import LockstepClient
+import protocol
+import settings
+import udp_transport
+from udp_transport import UdpEndpoint
+
+_LENGTH = struct.Struct(">I")
+DIRECTIONS = ["UP", "DOWN", "LEFT", "RIGHT"]
+MIN_RTO = 0.2           # Retransmissão mínima do TCP no Linux (segundos)
+UDP_KEEPALIVE = 0.25    # Intervalo do datagrama de ack/inputs sem novidades
+
+
+class BotStats:
+    def __init__(self):
+        self.connected_at = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.messages = 0
+        self.updates = 0           # Mensagens update/delta/view recebidas
+        self.latencies = []        # Segundos entre sent_at e o recebimento
+        self.arrivals = []         # Horário (monotônico) de cada update/delta
+        self.games = 0
+        self.resyncs = 0
+        self.desyncs = 0           # Ticks de lockstep com resumo diferente do servidor
+        self.stale = 0             # Datagramas descartados por serem velhos
+        self.last_message = None
+        self.max_gap = 0.0         # Maior intervalo sem receber nada numa partida (detecta "travados")
+        self.match_waits = []      # Segundos na fila até cada partida em que jogou
+        self.waiting_since = None  # Horário (monotônico) em que entrou na fila
+        self.leaderboards = 0      # Mensagens de ranking recebidas (servidor com --results)
+        self.inputs = LatencyTracker()  # Input → efeito, pelos acks do servidor
+        self.dropped = False       # Conexão encerrada pelo servidor
+
+
+class BotClient:
+    def __init__(self, host=settings.HOST, port=settings.PORT, policy="random",
+                 script=None, turn_chance=0.2, starter=False, binary=True, seed=None,
+                 udp=False, loss=0.0, latency=0.0, jitter=0.0, name=None):
+        self.host = host
+        self.port = port
+        self.policy = policy
+        self.script = script or ["RIGHT", "DOWN", "LEFT", "UP"]
+        self.turn_chance = turn_chance
+        self.starter = starter          # Este bot aperta "Iniciar Jogo"
+        self.binary = binary            # Oferece o codec binário no hello
+        self.name = name                # Apelido no ranking (None = "Jogador N")
+        self.rng = random.Random(seed)
+        # Binário desde o hello (o servidor recusa pickle, salvo com --allow-pickle)
+        self.version = protocol.VERSION if binary else None
+        self.negotiated = False         # Servidor confirmou o binário: pickle é recusado
+        self.writer = None
+        self.stats = BotStats()
+        self.client_id = None
+        self.state = None
+        self.in_game = False
+        self.awaiting_keyframe = False
+        self.script_pos = 0
+        self.closing = False
+        self.udp = udp
+        self.udp_transport = None
+        self.udp_token = None
+        self.receiver = udp_transport.StateReceiver()
+        self.window = udp_transport.InputWindow()
+        self.loss, self.latency, self.jitter = loss, latency, jitter
+        self.sim = None           # Simulador de rede (criado no run, precisa do loop)
+        self.tcp_clear_at = 0.0   # Até quando a fila TCP simulada está travada
+        self.lockstep = None      # Simulação local no modo lockstep
+        self.names = {}
+        self.board = (settings.WIDTH, settings.HEIGHT)
+        self.leaderboard = ()     # Último ranking recebido no lobby
+
+    def send(self, msg):
+        payload = protocol.encode(msg, self.version)
+        frame = _LENGTH.pack(len(payload)) + payload
+        self.stats.bytes_out += len(frame)
+        self.writer.write(frame)
+
+    async def recv(self, reader):
+        header = await reader.readexactly(_LENGTH.size)
+        (size,) = _LENGTH.unpack(header)
+        payload = await reader.readexactly(size)
+        self.stats.bytes_in += _LENGTH.size + size
+        return protocol.decode(payload, allow_pickle=not self.negotiated)
+
+    # ---------- Canal UDP ----------
+
+    def on_udp_info(self, msg):
+        self.udp_token = msg["token"]
+        self.receiver.reset(msg["epoch"])
+        if self.udp_transport is None:
+            asyncio.get_running_loop().create_task(self.open_udp(msg["port"]))
+        else:
+            self.send_datagram()
+
+    async def open_udp(self, port):
+        loop = asyncio.get_running_loop()
+        self.udp_transport, _ = await loop.create_datagram_endpoint(
+            lambda: UdpEndpoint(self.on_datagram), remote_addr=(self.host, port)
+        )
+        while not self.closing:
+            self.send_datagram()  # Liga o endereço no servidor e mantém o ack em dia
+            await asyncio.sleep(UDP_KEEPALIVE)
+        self.udp_transport.close()
+
+    def send_datagram(self):
+        if self.udp_transport is None or self.closing:
+            return
+        datagram = udp_transport.pack_input(
+            self.udp_token, self.receiver.epoch or 0, self.receiver.tick, self.window.pending
+        )
+        self.stats.bytes_out += len(datagram)
+        self.sim.deliver(self.udp_transport.sendto, datagram)
+
+    def on_datagram(self, data, addr=None):
+        if addr is not None and self.sim.active:
+            self.sim.deliver(self.on_datagram, data)  # Atravessa a "rede" simulada
+            return
+        if self.closing:
+            return
+        try:
+            epoch, tick, input_ack, payloads = udp_transport.unpack_state(data)
+        except udp_transport.DatagramError:
+            return
+        self.stats.bytes_in += len(data)
+        if not self.receiver.accept(epoch, tick):
+            self.stats.stale += 1
+            return
+        self.window.acked(input_ack)
+        try:
+            msgs = [protocol.decode(payload, allow_pickle=not self.negotiated)
+                    for payload in payloads]
+        except protocol.CodecError:
+            return
+        applied = False
+        for msg in msgs:
+            if msg["data"]["tick"] > self.receiver.tick:
+                applied = self.apply_state(msg, count=msg is msgs[-1]) or applied
+        if applied:
+            self.play()
+        self.send_datagram()  # Ack do tick (e os inputs ainda não confirmados)
+
+    def choose_direction(self):
+        # Decide o próximo input (ou None para manter a direção)
+        if self.policy == "script":
+            direction = self.script[self.script_pos % len(self.script)]
+            self.script_pos += 1
+            return direction
+        if self.rng.random() < self.turn_chance:
+            return self.rng.choice(DIRECTIONS)
+        return None
+
+    def deliver_tcp(self, msg):
+        # Sem simulação entrega na hora; com simulação, uma "perda" segura
+        # esta mensagem e as seguintes até a retransmissão (como no TCP)
+        if not self.sim.active:
+            self.handle(msg)
+            return
+        loop = asyncio.get_running_loop()
+        delay = self.latency + self.sim.rng.uniform(0, self.jitter)
+        if self.sim.rng.random() < self.loss:
+            delay += max(MIN_RTO, 2 * self.latency)
+        arrival = max(loop.time() + delay, self.tcp_clear_at + 1e-6)
+        self.tcp_clear_at = arrival
+        loop.call_at(arrival, self.handle, msg)
+
+    def apply_state(self, msg, count=True):
+        # Aplica um update/delta (vindo do TCP ou do UDP) na cópia local
+        stats = self.stats
+        kind = msg["type"]
+        if count:
+            stats.updates += 1
+            stats.arrivals.append(time.monotonic())
+            if "sent_at" in msg:
+                stats.latencies.append(time.time() - msg["sent_at"])
+        stats.inputs.ack(msg.get("acks"), self.client_id)
+        if kind in ("update", "view"):
+            self.state = msg["data"]
+            self.awaiting_keyframe = False
+        elif self.state is None or not apply_delta(self.state, msg["data"]):
+            if not self.awaiting_keyframe and self.udp_transport is None:
+                self.awaiting_keyframe = True
+                stats.resyncs += 1
+                self.send({"type": "resync"})
+            return False
+        self.receiver.tick = self.state.get("tick", 0)
+        return True
+
+    def apply_tick(self, msg):
+        # Lockstep: roda o tick localmente com os inputs do servidor
+        stats = self.stats
+        stats.updates += 1
+        stats.arrivals.append(time.monotonic())
+        if "sent_at" in msg:
+            stats.latencies.append(time.time() - msg["sent_at"])
+        stats.inputs.ack(msg.get("acks"), self.client_id)
+        tick = self.lockstep.game.tick
+        if not self.lockstep.apply(msg):
+            stats.desyncs += 1
+            stats.resyncs += 1
+            self.send({"type": "resync"})
+        elif self.lockstep.game.tick != tick:
+            self.state = self.lockstep.game.get_state()
+            self.play()
+
+    def handle(self, msg):
+        if self.closing:
+            return
+        stats = self.stats
+        now = time.monotonic()
+        stats.messages += 1
+        if self.in_game:
+            # No lobby o servidor só manda algo quando a fila muda: silêncio é normal
+            stats.max_gap = max(stats.max_gap, now - stats.last_message)
+        stats.last_message = now
+        kind = msg["type"]
+
+        if kind == "hello":
+            self.version = protocol.negotiate(msg.get("versions"))
+            self.negotiated = self.version is not None
+
+        elif kind == "udp":
+            self.on_udp_info(msg)
+
+        elif kind == "lobby":
+            if self.starter and not self.in_game:
+                self.send({"type": "start_game"})
+
+        elif kind == "leaderboard":
+            self.leaderboard = msg.get("top", ())
+            stats.leaderboards += 1
+
+        elif kind == "start":
+            self.client_id = msg["player_id"]
+            self.names = msg.get("players", {})
+            self.board = msg.get("board", (settings.WIDTH, settings.HEIGHT))
+            self.lockstep = None
+            self.state = msg.get("data")
+            self.in_game = True
+            if self.client_id in self.names and stats.waiting_since is not None:
+                stats.match_waits.append(now - stats.waiting_since)  # Jogando, não assistindo
+                stats.waiting_since = None
+            self.awaiting_keyframe = False
+            self.receiver.tick = 0
+            stats.games += 1
+
+        elif kind in ("update", "delta", "view"):
+            if self.apply_state(msg):
+                self.play()
+                self.send_datagram()
+
+        elif kind == "lockstep":
+            self.lockstep = LockstepClient(msg, self.names, self.board)
+            self.state = self.lockstep.game.get_state()
+
+        elif kind == "tick" and self.lockstep:
+            self.apply_tick(msg)
+
+        elif kind == "sync" and self.lockstep:
+            self.lockstep.sync(msg)
+            self.state = self.lockstep.game.get_state()
+
+        elif kind == "game_over":
+            self.in_game = False
+            stats.inputs.reset()
+            if stats.waiting_since is None:
+                stats.waiting_since = now  # Volta para a fila
+
+    def play(self):
+        # Decide o input deste tick; no UDP ele vai junto com o próximo ack
+        if not (self.state and self.state["alive"].get(self.client_id)):
+            return
+        direction = self.choose_direction()
+        if not direction:
+            return
+        inputs = self.stats.inputs
+        if self.udp_transport is not None:
+            inputs.stamp(self.window.add(direction))
+        else:
+            self.send({"type": "input", "direction": direction,
+                       "seq": inputs.stamp(), "tick": self.state.get("tick", 0)})
+
+    async def run(self, duration=None):
+        loop = asyncio.get_running_loop()
+        self.sim = udp_transport.NetworkSimulator(
+            self.loss, self.latency, self.jitter, seed=self.rng.random(),
+            call_later=loop.call_later
+        )
+        reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.stats.connected_at = time.monotonic()
+        self.stats.last_message = self.stats.connected_at
+        self.stats.waiting_since = self.stats.connected_at
+        if self.binary or self.name:
+            # Sem binário o hello vai só com o apelido (nenhuma versão em comum)
+            hello = {"type": "hello", "versions": list(protocol.SUPPORTED_VERSIONS) if self.binary else []}
+            if self.name:
+                hello["name"] = self.name
+            self.send(hello)
+        if self.udp:
+            self.send({"type": "udp"})
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while True:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                msg = await asyncio.wait_for(self.recv(reader), timeout)
+                if msg.get("type") == "full":
+                    self.stats.dropped = True
+                    break
+                self.deliver_tcp(msg)
+        except asyncio.TimeoutError:
+            pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            if not self.closing:
+                self.stats.dropped = True
+        finally:
+            self.closing = True
+            self.writer.close()
+
+
+async def run_bots(count, duration, starters=0, named=False, **kwargs):
+    # Os primeiros `starters` bots apertam "Iniciar Jogo" sempre que estão no lobby;
+    # named: cada bot entra com apelido ("bot 0", "bot 1"...) e conta no ranking
+    bots = [BotClient(starter=i < starters, seed=i, name=f"bot {i}" if named else None, **kwargs)
+            for i in range(count)]
+    await asyncio.gather(*(bot.run(duration) for bot in bots), return_exceptions=True)
+    return bots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bots sem interface para o Snake")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--bots", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Segundos até desconectar (padrão: até o servidor fechar)")
+    parser.add_argument("--policy", choices=("random", "script"), default="random")
+    parser.add_argument("--start", action="store_true",
+                        help="O primeiro bot inicia a partida sempre que estiver no lobby")
+    parser.add_argument("--pickle", action="store_true", help="Não negocia o codec binário")
+    parser.add_argument("--udp", action="store_true", help="Pede o canal UDP para os ticks")
+    parser.add_argument("--named", action="store_true",
+                        help="Os bots entram com apelido e contam no ranking do servidor")
+    parser.add_argument("--loss", type=float, default=0.0, help="Perda simulada (0 a 1)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência simulada (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação simulada (s)")
+    args = parser.parse_args()
+
+    bots = asyncio.run(run_bots(
+        args.bots, args.duration, host=args.host, port=args.port,
+        policy=args.policy, binary=not args.pickle, starters=1 if args.start else 0,
+        named=args.named,
+        udp=args.udp, loss=args.loss, latency=args.latency, jitter=args.jitter
+    ))
+    for i, bot in enumerate(bots):
+        s = bot.stats
+        print(f"bot {i}: {s.games} partidas, {s.updates} updates, "
+              f"{s.bytes_in} bytes recebidos, {s.desyncs} dessincronias, "
+              f"{'caiu' if s.dropped else 'ok'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 import socket                          # Para conexão com o servidor via TCP
 import pygame                          # Para renderização gráfica
 import threading                       # Para rodar a escuta do servidor em paralelo
-import pickle                          # Para serializar objetos Python
-import struct                          # Para enviar o tamanho da mensagem como cabeçalho
-from settings import WIDTH, HEIGHT, FPS, WHITE, BLACK, BLOCK_SIZE
+import time
+from settings import WIDTH, HEIGHT, FPS, SMOOTH_RENDER, SMOOTH_FPS, USE_UDP, PLAYER_NAME, WHITE, BLACK
+from assets import get_font
+from renderer import BoardRenderer, SmoothRenderer, TextCache
+from interpolation import FrameBuffer, InputPredictor
+from udp_transport import UdpChannel
+from game_state import apply_delta
+from lockstep import LockstepClient
+from input_buffer import LatencyTracker
+from utils import send_data, FrameReader # Envio/recebimento com cabeçalho de tamanho
+import protocol                        # Codec binário das mensagens
 
 HOST = 'localhost'                    # IP do servidor (localhost para testes locais)
 PORT = 5555                           # Porta do servidor
@@ -16,59 +24,12 @@ PLAYER_COLORS_BASE = {
     3: (255, 255, 0),
 }
 PLAYER_COLORS = {}  # Este dicionário será preenchido com os jogadores atuais em cada partida
+LOBBY_RANKING = 5   # Linhas do ranking mostradas no lobby
 
-# Envia um dicionário serializado para o servidor com cabeçalho de tamanho
-def send_data(conn, data):
-    try:
-        serialized = pickle.dumps(data)                                # Serializa o objeto
-        conn.sendall(struct.pack(">I", len(serialized)) + serialized)  # Envia o tamanho + dados
-    except:
-        pass  # Em caso de desconexão ou erro, ignora
-
-# Recebe uma mensagem completa do servidor (respeitando o tamanho do cabeçalho)
-def recv_data(conn):
-    try:
-        raw_msglen = conn.recv(4)  # Recebe os 4 bytes iniciais que indicam o tamanho da mensagem
-        if not raw_msglen:
-            return None
-        msglen = struct.unpack(">I", raw_msglen)[0]
-        data = b""
-        while len(data) < msglen:  # Continua recebendo até ter todos os dados esperados
-            packet = conn.recv(msglen - len(data))
-            if not packet:
-                return None
-            data += packet
-        return pickle.loads(data)  # Desserializa os dados recebidos
-    except:
-        return None
-
-# Função para desenhar a tela do jogo em tempo real
-def draw_game(screen, state, client_id, font):
-    screen.fill(BLACK)  # Limpa a tela
-
-    # Desenha a fruta
-    fruit = state["fruit"]
-    pygame.draw.rect(screen, (255, 105, 180), (fruit[0], fruit[1], BLOCK_SIZE, BLOCK_SIZE))
-
-    # Desenha cada cobra
-    for pid, body in state["snakes"].items():
-        is_alive = state["alive"].get(pid, False)
-        color = PLAYER_COLORS.get(pid, (150, 150, 150)) if is_alive else (80, 80, 80)
-        for segment in body:
-            pygame.draw.rect(screen, color, (*segment, BLOCK_SIZE, BLOCK_SIZE))
-
-    # Desenha o nome do jogador local no canto superior esquerdo
-    name = state["names"].get(client_id, f"Jogador {client_id}")
-    color = PLAYER_COLORS.get(client_id, WHITE)
-    hud = font.render(name, True, color)
-    screen.blit(hud, (10, 10))
-
-    pygame.display.flip()  # Atualiza a tela
-
-# Mostra o placar final após o término da partida
-def draw_scoreboard(screen, scores, names, font):
+# Mostra o placar final após o término da partida (desenhado uma vez só)
+def draw_scoreboard(screen, scores, names, text):
     screen.fill(BLACK)
-    title = font.render("Placar Final", True, WHITE)
+    title = text.render("Placar Final", WHITE)
     screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 60))
 
     # Ordena os jogadores por pontuação e mostra
@@ -77,12 +38,45 @@ def draw_scoreboard(screen, scores, names, font):
     for i, (pid, score) in enumerate(sorted_scores):
         name = names.get(pid, f"Jogador {pid}")
         color = PLAYER_COLORS.get(pid, WHITE)
-        text = font.render(f"{name}: {score} pontos", True, color)
-        screen.blit(text, (WIDTH // 2 - text.get_width() // 2, y))
+        line = text.render(f"{name}: {score} pontos", color)
+        screen.blit(line, (WIDTH // 2 - line.get_width() // 2, y))
         y += 40
 
     pygame.display.flip()
 
+# Tela do lobby com botão "Iniciar Jogo" (redesenhada só quando muda).
+# queue: (na fila, tamanho da partida, nossa posição, segundos até o início automático)
+# leaderboard: topo do ranking do servidor ((nome, vitórias, recorde, partidas), ...)
+def draw_lobby(screen, queue, leaderboard, button_rect, button_hover, text):
+    waiting, maximum, position, countdown = queue
+    screen.fill(BLACK)
+    label = text.render(f"Jogadores na fila: {waiting}/{maximum}", WHITE)
+    screen.blit(label, (WIDTH // 2 - label.get_width() // 2, HEIGHT // 2 - 100))
+    if position:
+        info = f"Sua posição: {position}"
+        if countdown:
+            info += f" (início em {countdown}s)"
+        line = text.render(info, WHITE)
+        screen.blit(line, (WIDTH // 2 - line.get_width() // 2, HEIGHT // 2 - 60))
+
+    color = (180, 180, 180) if button_hover else (120, 120, 120)
+    pygame.draw.rect(screen, color, button_rect, border_radius=8)
+
+    button_text = text.render("Iniciar Jogo", BLACK)
+    screen.blit(button_text, button_text.get_rect(center=button_rect.center))
+
+    # Ranking (só em servidores que guardam os resultados)
+    y = button_rect.bottom + 40
+    if leaderboard:
+        title = text.render("Ranking", WHITE)
+        screen.blit(title, (WIDTH // 2 - title.get_width() // 2, y))
+    for i, (name, wins, best, matches) in enumerate(leaderboard[:LOBBY_RANKING], 1):
+        y += 36
+        line = text.render(f"{i}. {name}: {wins} vitórias, recorde {best} ({matches} partidas)", WHITE)
+        screen.blit(line, (WIDTH // 2 - line.get_width() // 2, y))
+
+    pygame.display.flip()
+
 def main():
     # Inicializa Pygame e configura a tela
     pygame.init()
@@ -94,47 +88,134 @@ def main():
     client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     client.connect((HOST, PORT))
 
+    # Fala binário desde o hello (o servidor recusa pickle, salvo com
+    # --allow-pickle); a resposta dele confirma a versão
+    codec_version = protocol.VERSION
+    hello = {"type": "hello", "versions": list(protocol.SUPPORTED_VERSIONS)}
+    if PLAYER_NAME:
+        hello["name"] = PLAYER_NAME  # Apelido no ranking (SNAKE_NAME)
+    send_data(client, hello, codec_version)
+    if USE_UDP:
+        send_data(client, {"type": "udp"}, codec_version)  # Servidor sem UDP ignora e segue tudo no TCP
+
     # Variáveis de estado do jogo
     client_id = None
     game_running = False
-    current_state = None
-    connected_players = 1
+    frames = FrameBuffer()      # Estados publicados pela thread de rede (buffer duplo)
+    predictor = InputPredictor()  # Curva prevista da cobra local (modo suave)
+    queue = (1, 4, 0)          # Fila do lobby: (na fila, tamanho da partida, nossa posição)
+    start_deadline = None      # Horário (monotônico) do início automático, se houver prazo
+    leaderboard = ()           # Topo do ranking, se o servidor guardar os resultados
     is_alive = True
     scores = None
     names = {}
     show_score = False
     score_timer = 0
+    awaiting_keyframe = False  # Já pedimos um snapshot completo ao servidor
+    current_state = None       # Cópia de trabalho das threads de rede (TCP e UDP)
+    state_lock = threading.Lock()  # As duas threads de rede aplicam updates nela
+    udp = None                 # Canal UDP dos ticks, se o servidor oferecer
+    board_size = (WIDTH, HEIGHT)  # Tamanho do tabuleiro informado pelo servidor
+    lockstep = None            # Simulação local da partida no modo lockstep
+    latency = LatencyTracker()  # Input → efeito, pelos acks do servidor
 
     # Elementos visuais
-    font = pygame.font.SysFont("arial", 28)
+    font = get_font(28)
+    text = TextCache(font)                 # Textos de lobby e placar em cache
+    # Só repinta as células que mudaram; no modo suave também interpola os ticks
+    renderer = (SmoothRenderer if SMOOTH_RENDER else BoardRenderer)(screen, font)
+    view = None                            # O que está desenhado na tela agora
     button_rect = pygame.Rect(WIDTH // 2 - 120, HEIGHT // 2 + 10, 240, 50)
     direction = "RIGHT"
 
+    # Aplica um update/delta na cópia de trabalho e publica para o desenho.
+    # Chamada pela thread TCP e pela thread UDP; retorna False se faltou um tick.
+    def apply_state(msg):
+        nonlocal current_state, is_alive, awaiting_keyframe, board_size
+        with state_lock:
+            if msg["type"] in ("update", "view"):
+                current_state = msg["data"]
+                awaiting_keyframe = False
+                if "view" in current_state:
+                    board_size = tuple(current_state["view"][2:])  # Janela do tamanho da view
+            elif current_state is None or not apply_delta(current_state, msg["data"]):
+                return False
+            frames.publish(current_state)
+            if udp:
+                udp.receiver.tick = current_state.get("tick", 0)
+            latency.ack(msg.get("acks"), client_id)
+            if not current_state["alive"].get(client_id, False):
+                is_alive = False  # O jogador morreu
+            return True
+
+    # Lockstep: publica o estado da simulação local depois de cada tick
+    def publish_lockstep():
+        nonlocal current_state, is_alive
+        with state_lock:
+            current_state = lockstep.game.get_state()
+            frames.publish(current_state)
+            if not current_state["alive"].get(client_id, False):
+                is_alive = False
+
+    def on_udp_messages(msgs):
+        for msg in msgs:
+            apply_state(msg)
+
     # Thread que escuta as mensagens vindas do servidor
     def receive_thread():
-        nonlocal client_id, game_running, current_state
-        nonlocal connected_players, is_alive, scores, names, show_score, score_timer
+        nonlocal client_id, game_running, current_state, udp
+        nonlocal queue, start_deadline, leaderboard, is_alive, scores, names, show_score, score_timer
+        nonlocal awaiting_keyframe, codec_version, board_size, lockstep
         global PLAYER_COLORS
 
+        reader = FrameReader(client)
+        negotiated = False  # Depois da resposta ao hello, pickle é recusado
         while True:
-            msg = recv_data(client)
+            msg = reader.recv_message(allow_pickle=not negotiated)
             if msg is None:
                 print("[CLIENTE] Conexão encerrada.")
                 break
 
-            # Atualiza número de jogadores no lobby
-            if msg["type"] == "lobby":
-                connected_players = msg.get("connected", 1)
+            # Servidor aceitou o protocolo binário
+            if msg["type"] == "hello":
+                codec_version = protocol.negotiate(msg.get("versions"))
+                negotiated = codec_version is not None
+
+            # Canal UDP aceito (repetido a cada partida, com a época nova)
+            elif msg["type"] == "udp":
+                if udp is None:
+                    udp = UdpChannel(HOST, on_udp_messages)
+                udp.open(msg["port"], msg["token"], msg["epoch"])
+
+            # Fila do lobby: só chega quando ela muda (alguém entrou ou saiu)
+            elif msg["type"] == "lobby":
+                queue = (msg.get("connected", 1), msg.get("max", 4), msg.get("position", 0))
+                starts_in = msg.get("starts_in", 0)
+                start_deadline = time.monotonic() + starts_in if starts_in else None
+
+            # Ranking: chega ao entrar na fila e quando muda
+            elif msg["type"] == "leaderboard":
+                leaderboard = tuple(tuple(row) for row in msg.get("top", ()))
 
             # Início da partida
             elif msg["type"] == "start":
                 print("[CLIENTE] Partida iniciada!")
+                frames.clear()  # Antes de game_running: nada da partida anterior na tela
                 client_id = msg["player_id"]
                 names = msg.get("players", {})
                 game_running = True
                 is_alive = True
                 scores = None
                 show_score = False
+                with state_lock:
+                    current_state = msg.get("data")
+                    if current_state:
+                        frames.publish(current_state)
+                    if udp:
+                        udp.receiver.tick = 0
+                awaiting_keyframe = False
+                lockstep = None
+                board_size = tuple(msg.get("board", board_size))
 
                 # Define as cores dos jogadores atuais
                 sorted_pids = sorted(names.keys())
@@ -143,15 +224,41 @@ def main():
                     for i, pid in enumerate(sorted_pids)
                 }
 
-            # Atualização do estado do jogo (posição das cobras, fruta, etc.)
-            elif msg["type"] == "update":
-                current_state = msg["data"]
-                if not current_state["alive"].get(client_id, False):
-                    is_alive = False  # O jogador morreu
+            # Estado completo (update), só as mudanças do último tick (delta)
+            # ou só a área em volta da nossa cabeça (view, arenas grandes)
+            elif msg["type"] in ("update", "delta", "view"):
+                if not apply_state(msg) and not awaiting_keyframe:
+                    # Perdemos a sequência: pede um snapshot completo
+                    awaiting_keyframe = True
+                    send_data(client, {"type": "resync"}, codec_version)
+
+            # Lockstep: a partida é simulada aqui a partir da seed e dos inputs
+            elif msg["type"] == "lockstep":
+                lockstep = LockstepClient(msg, names, board_size)
+                publish_lockstep()
+
+            elif msg["type"] == "tick" and lockstep:
+                tick = lockstep.game.tick
+                if not lockstep.apply(msg):
+                    # Estado diferente do servidor: pede o GameState inteiro
+                    print(f"[CLIENTE] Dessincronizado no tick {msg['tick']}, pedindo resync")
+                    send_data(client, {"type": "resync"}, codec_version)
+                elif lockstep.game.tick != tick:
+                    latency.ack(msg.get("acks"), client_id)
+                    publish_lockstep()
+
+            elif msg["type"] == "sync" and lockstep:
+                lockstep.sync(msg)
+                publish_lockstep()
 
             # Fim do jogo, mostra placar
             elif msg["type"] == "game_over":
                 print("[CLIENTE] Partida encerrada.")
+                summary = latency.summary()
+                if summary:
+                    print(f"[CLIENTE] Input → efeito: {summary}")
+                latency.reset()
+                latency.samples.clear()
                 game_running = False
                 scores = msg.get("scores")
                 show_score = True
@@ -162,34 +269,50 @@ def main():
 
     # Loop principal do cliente
     while True:
-        screen.fill(BLACK)
+        # O servidor pode usar outro tamanho de tabuleiro: ajusta a janela
+        if screen.get_size() != board_size:
+            screen = pygame.display.set_mode(board_size)
+            renderer.invalidate(screen)
+            view = None
 
         # Se a partida acabou, mostrar placar por 4 segundos
         if show_score:
-            draw_scoreboard(screen, scores, names, font)
+            if view != "score":
+                draw_scoreboard(screen, scores, names, text)
+                view = "score"
             if pygame.time.get_ticks() - score_timer > 4000:
                 show_score = False
 
         # Tela do lobby com botão "Iniciar Jogo"
         elif not game_running:
-            text = font.render(f"Jogadores conectados: {connected_players}/4", True, WHITE)
-            screen.blit(text, (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 - 60))
-
-            mouse_pos = pygame.mouse.get_pos()
-            button_hover = button_rect.collidepoint(mouse_pos)
-            color = (180, 180, 180) if button_hover else (120, 120, 120)
-            pygame.draw.rect(screen, color, button_rect, border_radius=8)
-
-            button_text = font.render("Iniciar Jogo", True, BLACK)
-            text_rect = button_text.get_rect(center=button_rect.center)
-            screen.blit(button_text, text_rect)
-
-            pygame.display.flip()
-
-        # Tela de jogo em execução
+            button_hover = button_rect.collidepoint(pygame.mouse.get_pos())
+            # A contagem até o início automático anda aqui, sem mensagens do servidor
+            countdown = 0
+            if start_deadline is not None:
+                countdown = max(0, int(start_deadline - time.monotonic() + 0.999))
+            lobby_view = ("lobby", *queue, countdown, leaderboard, button_hover)
+            if view != lobby_view:
+                draw_lobby(screen, (*queue, countdown), leaderboard, button_rect, button_hover, text)
+                view = lobby_view
+
+        # Tela de jogo em execução: só as células que mudaram desde o último quadro
         else:
-            if current_state:
-                draw_game(screen, current_state, client_id, font)
+            if view != "game":
+                renderer.colors = PLAYER_COLORS
+                renderer.invalidate()
+                predictor.reset()
+                view = "game"
+            previous, frame = frames.latest()
+            if frame:
+                state = frame.state
+                name = state["names"].get(client_id, f"Jogador {client_id}")
+                color = PLAYER_COLORS.get(client_id, WHITE)
+                if SMOOTH_RENDER:
+                    local_direction = predictor.direction(state, client_id) if is_alive else None
+                    renderer.draw_frame(previous, frame, frames.alpha(frame), client_id,
+                                        local_direction, name, color)
+                else:
+                    renderer.draw(state, name, color)
 
         # Captura eventos de teclado e clique
         for event in pygame.event.get():
@@ -198,11 +321,16 @@ def main():
                 pygame.quit()
                 return
 
+            # A janela foi coberta/restaurada: o próximo quadro redesenha tudo
+            elif event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
+                view = None
+
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 # Clicou no botão "Iniciar Jogo"
                 if not game_running and not show_score:
                     if button_rect.collidepoint(pygame.mouse.get_pos()):
-                        send_data(client, {"type": "start_game"})
+                        send_data(client, {"type": "start_game"}, codec_version)
 
             elif event.type == pygame.KEYDOWN:
                 # Envia direção ao servidor
@@ -215,9 +343,19 @@ def main():
                         direction = "LEFT"
                     elif event.key == pygame.K_RIGHT:
                         direction = "RIGHT"
-                    send_data(client, {"type": "input", "direction": direction})
-
-        clock.tick(FPS)
+                    # Cada input leva uma seq e o último tick que vimos; o
+                    # servidor aplica uma curva por tick e confirma a seq
+                    frame = frames.latest()[1]
+                    tick = frame.tick if frame else 0
+                    if udp:
+                        latency.stamp(udp.send_input(direction))  # Repetido até o servidor confirmar
+                    else:
+                        send_data(client, {"type": "input", "direction": direction,
+                                           "seq": latency.stamp(), "tick": tick}, codec_version)
+                    predictor.press(direction, tick)
+
+        # No modo suave o quadro acompanha a tela, não o tick do servidor
+        clock.tick(SMOOTH_FPS if SMOOTH_RENDER else FPS)
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,6 @@
 import pygame
-from settings import WIDTH, HEIGHT, BLOCK_SIZE, FONT, BLACK, WHITE
+from settings import WIDTH, HEIGHT, BLOCK_SIZE, BLACK, WHITE
+from assets import get_font
 
 # Dicionário de cores fixas para os jogadores por ID
 PLAYER_COLORS = {
@@ -14,8 +15,8 @@ def draw_game(screen, state, client_id):
     screen.fill(BLACK)  # Preenche o fundo da tela com preto
 
     # Desenha a fruta (rosa choque 💖)
-    fruit = state["fruit"]
-    pygame.draw.rect(screen, (255, 105, 180), (*fruit, BLOCK_SIZE, BLOCK_SIZE))
+    for fruit in state.get("fruits", [state["fruit"]] if state["fruit"] else []):
+        pygame.draw.rect(screen, (255, 105, 180), (*fruit, BLOCK_SIZE, BLOCK_SIZE))
 
     # Desenha todas as cobras (uma por jogador)
     for pid, body in state["snakes"].items():
@@ -27,7 +28,7 @@ def draw_game(screen, state, client_id):
             pygame.draw.rect(screen, color, (*segment, BLOCK_SIZE, BLOCK_SIZE))
 
     # Mostra uma HUD com o ID do jogador local no canto da tela
-    hud_text = FONT.render(f"Você é o Jogador {client_id}", True, WHITE)
+    hud_text = get_font().render(f"Você é o Jogador {client_id}", True, WHITE)
     screen.blit(hud_text, (10, 10))
 
     # Atualiza a tela com tudo que foi desenhado
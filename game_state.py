@@ -1,5 +1,11 @@
+import math
 import random
-from settings import WIDTH, HEIGHT, BLOCK_SIZE
+import zlib
+from array import array
+from collections import deque
+from collections.abc import Mapping, Sequence
+from operator import attrgetter
+from settings import WIDTH, HEIGHT, BLOCK_SIZE, FRUIT_COUNT
 
 # Direções possíveis baseadas no tamanho de um bloco
 DIRECTIONS = {
@@ -9,109 +15,690 @@ DIRECTIONS = {
     "RIGHT": (BLOCK_SIZE, 0),
 }
 
-# Posições iniciais para até 4 jogadores
-START_POSITIONS = [
-    (WIDTH // 2, HEIGHT // 4),
-    (3 * WIDTH // 4, HEIGHT // 2),
-    (WIDTH // 2, 3 * HEIGHT // 4),
-    (WIDTH // 4, HEIGHT // 2),
-]
+# Dentro do GameState as direções são códigos pequenos (os mesmos do
+# protocol.py); a oposta de cada uma é code ^ 1
+DIRECTION_NAMES = ("UP", "DOWN", "LEFT", "RIGHT")
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTION_NAMES)}
+UP, DOWN, LEFT, RIGHT = range(4)
+
+# Tipo dos arrays de índices de células: 2 bytes enquanto o tabuleiro
+# couber (até 65536 células), 4 bytes nas arenas maiores
+def cell_typecode(cells):
+    return "H" if cells <= 0x10000 else "I"
+
+_POSITIONS = {}  # { (cols, rows): tabela de posições } (ver cell_positions)
+
+# Tabela célula → (x, y) em pixels, uma por tamanho de tabuleiro no processo
+# e compartilhada por todas as salas (as tuplas são imutáveis). Converter o
+# corpo das cobras para o formato das mensagens vira uma indexação, sem
+# criar tuplas nem inteiros novos.
+def cell_positions(cols, rows):
+    table = _POSITIONS.get((cols, rows))
+    if table is None:
+        xs = [col * BLOCK_SIZE for col in range(cols)]
+        table = _POSITIONS[(cols, rows)] = [
+            (x, row * BLOCK_SIZE) for row in range(rows) for x in xs
+        ]
+    return table
+
+# Alinha uma coordenada em pixels à grade de blocos
+def snap(value):
+    return value // BLOCK_SIZE * BLOCK_SIZE
+
+# Posições iniciais (alinhadas à grade, senão a cobra nunca alcança a fruta e
+# não cabe na grade de ocupação). Até 4 jogadores usam as 4 posições de
+# sempre; com mais, as cobras são espalhadas numa grade proporcional ao
+# tabuleiro. Cada cobra nasce com 3 blocos para a esquerda da cabeça, então
+# cada posição precisa de 4 células de largura e 2 de altura (com a folga).
+# Se o tabuleiro não comporta count posições, devolve as que cabem e quem
+# chama reaproveita em ciclo (i % len).
+def start_positions(width, height, count=4):
+    if count <= 4:
+        return [
+            (snap(width // 2), snap(height // 4)),
+            (snap(3 * width // 4), snap(height // 2)),
+            (snap(width // 2), snap(3 * height // 4)),
+            (snap(width // 4), snap(height // 2)),
+        ]
+    cols, rows = width // BLOCK_SIZE, height // BLOCK_SIZE
+    grid_cols = min(max(1, cols // 4), math.ceil(math.sqrt(count * cols / rows)))
+    grid_rows = min(max(1, rows // 2), math.ceil(count / grid_cols))
+    step_x, step_y = cols / grid_cols, rows / grid_rows
+    positions = []
+    for j in range(grid_rows):
+        for i in range(grid_cols):
+            x = int(i * step_x + step_x / 2) + 1  # +1: a cauda fica dentro do espaço
+            y = int(j * step_y + step_y / 2)
+            positions.append((x * BLOCK_SIZE, y * BLOCK_SIZE))
+    return positions[:count]
+
+START_POSITIONS = start_positions(WIDTH, HEIGHT)
+
+# Menor tabuleiro (em células) em que as cobras iniciais cabem inteiras
+MIN_COLS = 8
+MIN_ROWS = 4
+
+def check_board(cols, rows):
+    if cols < MIN_COLS or rows < MIN_ROWS:
+        raise ValueError(
+            f"Tabuleiro pequeno demais: {cols}x{rows} células "
+            f"(mínimo {MIN_COLS}x{MIN_ROWS})"
+        )
+
+# Lado (em células) de cada balde do índice espacial
+BUCKET_CELLS = 16
+
+class SpatialGrid:
+    # Índice espacial por baldes: o tabuleiro é dividido em quadrados de
+    # BUCKET_CELLS células e cada balde conta quantas vezes cada chave (pid
+    # de uma cobra ou posição de uma fruta) aparece nele. Achar o que está
+    # dentro de um retângulo custa proporcional aos baldes que ele cobre, não
+    # ao tamanho do mundo nem ao número de cobras.
+    def __init__(self, cols, rows, bucket=BUCKET_CELLS):
+        self.size = bucket * BLOCK_SIZE          # Lado do balde em pixels
+        self.cols = (cols + bucket - 1) // bucket
+        self.rows = (rows + bucket - 1) // bucket
+        self.buckets = [{} for _ in range(self.cols * self.rows)]
+        self.board_cols = cols                   # Para converter índices de células
+        self.bucket = bucket
+
+    def _bucket(self, pos):
+        return self.buckets[(pos[1] // self.size) * self.cols + pos[0] // self.size]
+
+    def _cell_bucket(self, cell):
+        row, col = divmod(cell, self.board_cols)
+        return self.buckets[(row // self.bucket) * self.cols + col // self.bucket]
+
+    def add(self, pos, key):
+        bucket = self._bucket(pos)
+        bucket[key] = bucket.get(key, 0) + 1
+
+    def remove(self, pos, key):
+        self._discard(self._bucket(pos), key)
+
+    # Mesmas operações com o índice da célula (cobras, a cada tick)
+    def add_cell(self, cell, key):
+        bucket = self._cell_bucket(cell)
+        bucket[key] = bucket.get(key, 0) + 1
+
+    def remove_cell(self, cell, key):
+        self._discard(self._cell_bucket(cell), key)
+
+    @staticmethod
+    def _discard(bucket, key):
+        if bucket[key] == 1:
+            del bucket[key]
+        else:
+            bucket[key] -= 1
+
+    def query(self, rect):
+        # Chaves com algo nos baldes que o retângulo (x, y, w, h em pixels)
+        # toca; quem chama ainda filtra pela posição exata
+        x, y, width, height = rect
+        size = self.size
+        last_col = min((x + width - 1) // size, self.cols - 1)
+        last_row = min((y + height - 1) // size, self.rows - 1)
+        keys = set()
+        for row in range(max(0, y // size), last_row + 1):
+            first = row * self.cols
+            for col in range(max(0, x // size), last_col + 1):
+                keys.update(self.buckets[first + col])
+        return keys
+
+class SnakeBody:
+    # Corpo de uma cobra: índices das células num buffer circular (array), com
+    # a cabeça em start. appendleft/pop são O(1) e não criam objetos por
+    # segmento; quando a cobra passa da capacidade, o buffer dobra.
+    # trail acompanha o buffer com as posições em pixels (as tuplas da tabela
+    # de cell_positions, compartilhadas): o snapshot do get_state é uma cópia
+    # dele, sem converter célula por célula a cada keyframe.
+    __slots__ = ("cells", "start", "length", "trail")
+
+    def __init__(self, cells, table, typecode="H"):
+        capacity = 8
+        while capacity < len(cells):
+            capacity *= 2
+        self.cells = array(typecode, cells)
+        self.cells.extend([0] * (capacity - len(cells)))
+        self.start = 0
+        self.length = len(cells)
+        self.trail = deque(table[cell] for cell in cells)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        # Da cabeça para a cauda
+        return iter(self.cell_list())
+
+    def cell_list(self):
+        # As células numa lista, da cabeça para a cauda. Percorrer uma lista
+        # sai mais barato que ler o array célula por célula.
+        cells, start, end = self.cells, self.start, self.start + self.length
+        if end <= len(cells):
+            return cells[start:end].tolist()
+        return cells[start:].tolist() + cells[:end - len(cells)].tolist()
+
+    def positions(self):
+        # Lista das posições em pixels, da cabeça para a cauda
+        return list(self.trail)
+
+    @property
+    def head(self):
+        return self.cells[self.start]
+
+    @property
+    def tail(self):
+        return self.cells[(self.start + self.length - 1) & (len(self.cells) - 1)]
+
+    def appendleft(self, cell, pos):
+        # pos: posição da célula em pixels (da tabela de cell_positions)
+        if self.length == len(self.cells):
+            self._grow()
+        self.start = (self.start - 1) & (len(self.cells) - 1)
+        self.cells[self.start] = cell
+        self.length += 1
+        self.trail.appendleft(pos)
+
+    def append(self, cell, pos):
+        if self.length == len(self.cells):
+            self._grow()
+        self.cells[(self.start + self.length) & (len(self.cells) - 1)] = cell
+        self.length += 1
+        self.trail.append(pos)
+
+    def pop(self):
+        # Remove e devolve a cauda
+        self.length -= 1
+        self.trail.pop()
+        return self.cells[(self.start + self.length) & (len(self.cells) - 1)]
+
+    def _grow(self):
+        cells = array(self.cells.typecode, self)
+        cells.extend(cells)  # Dobra a capacidade (a segunda metade é lixo)
+        self.cells = cells
+        self.start = 0
+
+
+class Player:
+    # Tudo o que a simulação guarda de um jogador, sem __dict__ por instância
+    __slots__ = ("body", "direction", "alive", "score", "next_cell")
+
+    def __init__(self, body, direction=RIGHT):
+        self.body = body              # SnakeBody
+        self.direction = direction    # Código da direção (UP, DOWN, LEFT, RIGHT)
+        self.alive = True
+        self.score = len(body)        # Pontuação (tamanho da cobra)
+        self.next_cell = -1           # Rascunho do update(): próxima cabeça (-1 = morre)
+
+
+class RecordView(Mapping):
+    # Visão somente leitura { pid: valor } sobre os registros dos jogadores,
+    # para quem lê game.alive, game.scores... como os dicionários de antes.
+    # Nada é copiado: cada leitura consulta o registro atual.
+    __slots__ = ("records", "read")
+
+    def __init__(self, records, read):
+        self.records = records
+        self.read = read
+
+    def __getitem__(self, pid):
+        return self.read(self.records[pid])
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class BodyView(Sequence):
+    # Corpo de uma cobra como sequência de posições em pixels (cabeça
+    # primeiro), convertidas só quando lidas
+    __slots__ = ("body", "positions")
+
+    def __init__(self, body, positions):
+        self.body = body
+        self.positions = positions  # Tabela de cell_positions
+
+    def __len__(self):
+        return len(self.body)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        body = self.body
+        if i < 0:
+            i += body.length
+        if not 0 <= i < body.length:
+            raise IndexError(i)
+        return self.positions[body.cells[(body.start + i) & (len(body.cells) - 1)]]
+
+    def __iter__(self):
+        return map(self.positions.__getitem__, self.body)
+
 
 class GameState:
-    def __init__(self, clients, player_names):
-        self.snakes = {}          # Posição dos blocos de cada cobra
-        self.directions = {}      # Direção atual de cada jogador
-        self.alive = {}           # Indica se o jogador está vivo
-        self.scores = {}          # Pontuação (tamanho da cobra)
+    def __init__(self, clients, player_names, seed=None, fruit_count=FRUIT_COUNT,
+                 width=WIDTH, height=HEIGHT, ai_players=()):
+        self.width = snap(width)      # Tamanho do tabuleiro em pixels
+        self.height = snap(height)
+        self.cols = self.width // BLOCK_SIZE
+        self.rows = self.height // BLOCK_SIZE
+        check_board(self.cols, self.rows)
+        size = self.cols * self.rows
+        typecode = cell_typecode(size)
+        self.rng = random.Random(seed)  # Gerador próprio (reprodutível com seed)
+        # Grade de ocupação: quantos segmentos de corpo (sem a cabeça) de cobras
+        # vivas ocupam cada célula. É atualizada a cada cabeça/cauda, então a
+        # colisão é O(1) por cobra, independente do tamanho das cobras.
+        self.blocked = bytearray(size)
+        # Índice de células livres para sortear frutas em O(1): free_cells é
+        # um array com remoção por troca com o último, e free_index guarda a
+        # posição de cada célula nele (só vale para células livres). occupancy
+        # conta segmentos de qualquer cobra (viva ou morta) e frutas em cada
+        # célula. São arrays de inteiros de 2 ou 4 bytes: numa lista, cada
+        # índice acima de 256 seria um objeto int à parte.
+        self.occupancy = bytearray(size)
+        self.free_cells = array(typecode, range(size))
+        self.free_index = array(typecode, range(size))
+        # Índices espaciais para a área de interesse de cada cliente (ver
+        # get_view): cobras (vivas ou mortas, que continuam no tabuleiro) e frutas
+        self.snake_grid = SpatialGrid(self.cols, self.rows)
+        self.fruit_grid = SpatialGrid(self.cols, self.rows)
+        # Um Player por jogador (corpo como índices de células, direção como
+        # código). snakes, directions, alive e scores são visões de leitura
+        # sobre eles, no formato antigo (ver as propriedades abaixo).
+        self.records = {}
         self.names = player_names
         self.players = list(clients.keys())
+        self.ai_players = set(ai_players)  # pids controlados pelo servidor (ai.py)
+        self.tick = 0             # Número do tick atual (usado pelos deltas)
+        self.last_delta = None    # Mudanças produzidas pelo último update()
+        self.scoreboard = None    # (alive, scores) do get_state; None = remontar
 
         # Inicializa cada cobra com 3 blocos e direção inicial "RIGHT"
+        positions = start_positions(self.width, self.height, len(self.players))
         for i, pid in enumerate(self.players):
-            start = START_POSITIONS[i % len(START_POSITIONS)]
-            self.snakes[pid] = [
-                start,
-                (start[0] - BLOCK_SIZE, start[1]),
-                (start[0] - 2 * BLOCK_SIZE, start[1]),
-            ]
-            self.directions[pid] = "RIGHT"
-            self.alive[pid] = True
-            self.scores[pid] = 3
-
-        self.fruit = self.random_position()  # Gera a primeira fruta
+            head = self.cell_index(positions[i % len(positions)])
+            body = SnakeBody([head, head - 1, head - 2], self.positions, typecode)
+            for cell in (head - 1, head - 2):
+                self.blocked[cell] += 1
+            for cell in body:
+                self.occupy(cell)
+                self.snake_grid.add_cell(cell, pid)
+            self.records[pid] = Player(body)
+
+        self.fruit_count = fruit_count
+        self.fruits = []          # Posições das frutas (a primeira é "fruit")
+        self.fruit_slots = {}     # { célula: índice em fruits }
+        self.refill_fruits()      # Gera as primeiras frutas
+
+    @property
+    def fruit(self):
+        # Primeira fruta (compatível com o formato de uma fruta só)
+        return self.fruits[0] if self.fruits else None
+
+    # Visões { pid: ... } no formato dos antigos dicionários (somente leitura)
+    @property
+    def snakes(self):
+        positions = self.positions
+        return RecordView(self.records, lambda player: BodyView(player.body, positions))
+
+    @property
+    def directions(self):
+        return RecordView(self.records, lambda player: DIRECTION_NAMES[player.direction])
+
+    @property
+    def alive(self):
+        return RecordView(self.records, attrgetter("alive"))
+
+    @property
+    def scores(self):
+        return RecordView(self.records, attrgetter("score"))
+
+    @property
+    def positions(self):
+        # Fora do __dict__ de propósito: não vai junto no pickle do GameState
+        return cell_positions(self.cols, self.rows)
+
+    def cell_index(self, pos):
+        # Converte uma posição em pixels no índice da célula na grade
+        return (pos[1] // BLOCK_SIZE) * self.cols + pos[0] // BLOCK_SIZE
+
+    def cell_position(self, cell):
+        # Converte o índice da célula de volta em posição em pixels
+        return self.positions[cell]
+
+    def body_positions(self, pid):
+        # Corpo da cobra em pixels (cabeça primeiro), como vai nas mensagens
+        return self.records[pid].body.positions()
+
+    def occupy(self, cell):
+        self.occupancy[cell] += 1
+        if self.occupancy[cell] == 1:
+            # Remove a célula do array de livres trocando com a última
+            i = self.free_index[cell]
+            last = self.free_cells.pop()
+            if last != cell:
+                self.free_cells[i] = last
+                self.free_index[last] = i
+
+    def release(self, cell):
+        self.occupancy[cell] -= 1
+        if self.occupancy[cell] == 0:
+            self.free_index[cell] = len(self.free_cells)
+            self.free_cells.append(cell)
 
     def random_position(self):
-        # Gera uma posição aleatória válida (alinhada à grade e fora das cobras)
-        cols = WIDTH // BLOCK_SIZE
-        rows = HEIGHT // BLOCK_SIZE
-        while True:
-            x = random.randint(0, cols - 1) * BLOCK_SIZE
-            y = random.randint(0, rows - 1) * BLOCK_SIZE
-            pos = (x, y)
-            if all(pos not in body for body in self.snakes.values()):
-                return pos
+        # Sorteia uma célula livre (fora das cobras e frutas); None se não há
+        if not self.free_cells:
+            return None
+        cell = self.free_cells[self.rng.randrange(len(self.free_cells))]
+        return self.cell_position(cell)
+
+    def spawn_fruit(self, slot=None):
+        # Cria uma fruta numa célula livre; slot reaproveita a posição na lista
+        pos = self.random_position()
+        if pos is None:
+            if slot is not None:
+                # Tabuleiro cheio: a fruta some até liberar espaço
+                del self.fruits[slot]
+                self.fruit_slots = {self.cell_index(p): i for i, p in enumerate(self.fruits)}
+            return None
+        cell = self.cell_index(pos)
+        self.occupy(cell)
+        self.fruit_grid.add(pos, pos)
+        if slot is None:
+            slot = len(self.fruits)
+            self.fruits.append(pos)
+        else:
+            self.fruits[slot] = pos
+        self.fruit_slots[cell] = slot
+        return pos
+
+    def refill_fruits(self):
+        # Completa o número de frutas enquanto houver células livres
+        changed = False
+        while len(self.fruits) < self.fruit_count and self.free_cells:
+            self.spawn_fruit()
+            changed = True
+        return changed
 
     def set_input(self, pid, direction):
         # Atualiza a direção do jogador se ela não for oposta à atual
-        if pid in self.directions and self.alive.get(pid):
-            opposite = {
-                "UP": "DOWN", "DOWN": "UP",
-                "LEFT": "RIGHT", "RIGHT": "LEFT"
-            }
-            if direction != opposite.get(self.directions[pid]):
-                self.directions[pid] = direction
+        player = self.records.get(pid)
+        if player is not None and player.alive:
+            code = DIRECTION_CODES.get(direction)
+            if code is not None and code != player.direction ^ 1:
+                player.direction = code
+
+    def turns(self, pid, direction):
+        # True se set_input(pid, direction) mudaria a direção da cobra
+        player = self.records.get(pid)
+        if player is None or not player.alive:
+            return False
+        code = DIRECTION_CODES.get(direction)
+        return code is not None and code != player.direction and code != player.direction ^ 1
 
     def update(self):
-        new_heads = {}
+        self.tick += 1
 
-        # Calcula a nova cabeça de cada cobra viva
-        for pid in self.players:
-            if not self.alive.get(pid):
-                continue
-            dx, dy = DIRECTIONS[self.directions[pid]]
-            head_x, head_y = self.snakes[pid][0]
-            new_head = (head_x + dx, head_y + dy)
-            new_heads[pid] = new_head
-
-        # Coleta todos os corpos (exceto cabeças)
-        all_bodies = {
-            pid: set(self.snakes[pid][1:]) for pid in self.players if self.alive.get(pid)
+        # Registra apenas o que mudou neste tick (cabeças, caudas, mortes...)
+        delta = {
+            "tick": self.tick,
+            "heads": {},    # { pid: nova cabeça }
+            "tails": [],    # pids que removeram a cauda
+            "dead": [],     # pids que morreram neste tick
+            "scores": {},   # { pid: nova pontuação }
         }
 
-        for pid, new_head in new_heads.items():
-            # Verifica colisão com a parede
-            out_of_bounds = (
-                new_head[0] < 0 or new_head[0] >= WIDTH or
-                new_head[1] < 0 or new_head[1] >= HEIGHT
-            )
-
-            # Verifica colisão com corpos
-            hit_body = any(new_head in body for body in all_bodies.values())
+        # Calcula a célula da nova cabeça de cada cobra viva (-1 = parede) só
+        # com aritmética de índices, guardando no próprio registro (sem tuplas
+        # nem listas novas por cobra a cada tick)
+        cols, size = self.cols, len(self.blocked)
+        positions = self.positions
+        moving = [self.records[pid] for pid in self.players]
+        head_counts = {}    # Quantas cobras vão para cada célula (cabeça com cabeça)
+        for player in moving:
+            if not player.alive:
+                continue
+            head = player.body.head
+            direction = player.direction
+            if direction == UP:
+                cell = head - cols if head >= cols else -1
+            elif direction == DOWN:
+                cell = head + cols if head + cols < size else -1
+            elif direction == LEFT:
+                cell = head - 1 if head % cols else -1
+            else:
+                cell = head + 1 if (head + 1) % cols else -1
+            player.next_cell = cell
+            head_counts[cell] = head_counts.get(cell, 0) + 1
 
-            # Verifica se duas cobras bateram cabeça com cabeça
-            hit_head = list(new_heads.values()).count(new_head) > 1
+        # Primeiro decide quem morre olhando a grade antes de qualquer movimento
+        # (parede, corpos e cabeça com cabeça)
+        blocked = self.blocked
+        for player in moving:
+            cell = player.next_cell
+            if player.alive and cell >= 0 and (blocked[cell] or head_counts[cell] > 1):
+                player.next_cell = -1
 
-            if out_of_bounds or hit_body or hit_head:
-                self.alive[pid] = False  # Jogador morre
+        # Depois aplica os movimentos em ordem, mantendo a grade atualizada
+        fruits_changed = False
+        for pid, player in zip(self.players, moving):
+            if not player.alive:
+                continue
+            body = player.body
+            cell = player.next_cell
+            if cell < 0:
+                player.alive = False  # Jogador morre
+                delta["dead"].append(pid)
+                # Corpo de cobra morta deixa de ser obstáculo
+                segments = iter(body)
+                next(segments)  # A cabeça não conta na grade
+                for segment in segments:
+                    blocked[segment] -= 1
             else:
-                self.snakes[pid].insert(0, new_head)  # Move cabeça
+                blocked[body.head] += 1  # Cabeça antiga vira corpo
+                body.appendleft(cell, positions[cell])  # Move cabeça
+                self.occupy(cell)
+                self.snake_grid.add_cell(cell, pid)
+                delta["heads"][pid] = positions[cell]
 
-                if new_head == self.fruit:
-                    self.scores[pid] += 1
-                    self.fruit = self.random_position()  # Nova fruta
+                slot = self.fruit_slots.pop(cell, None)
+                if slot is not None:
+                    player.score += 1
+                    self.release(cell)  # A fruta sai da célula
+                    fruit = self.fruits[slot]
+                    self.fruit_grid.remove(fruit, fruit)
+                    self.spawn_fruit(slot)  # Nova fruta
+                    delta["scores"][pid] = player.score
+                    fruits_changed = True
                 else:
-                    self.snakes[pid].pop()  # Remove cauda (não cresceu)
+                    tail = body.pop()  # Remove cauda (não cresceu)
+                    blocked[tail] -= 1
+                    self.release(tail)
+                    self.snake_grid.remove_cell(tail, pid)
+                    delta["tails"].append(pid)
+
+        if self.refill_fruits() or fruits_changed:
+            delta["fruit"] = self.fruit
+            delta["fruits"] = list(self.fruits)
+
+        if delta["dead"] or delta["scores"]:
+            self.scoreboard = None
+        self.last_delta = delta
 
     def get_state(self):
-        # Retorna todas as informações necessárias para o client desenhar o jogo
+        # Retorna todas as informações necessárias para o client desenhar o jogo.
+        # Os corpos são cópias dos trails; alive e scores só mudam com mortes
+        # e frutas comidas, então são remontados só depois de um update() que
+        # os altere (dicionários novos: snapshots já entregues não mudam)
+        records = self.records
+        if self.scoreboard is None:
+            self.scoreboard = ({pid: player.alive for pid, player in records.items()},
+                               {pid: player.score for pid, player in records.items()})
+        alive, scores = self.scoreboard
         return {
-            "snakes": self.snakes,
+            "snakes": {pid: list(player.body.trail) for pid, player in records.items()},
             "fruit": self.fruit,
-            "alive": self.alive,
-            "scores": self.scores,
-            "names": self.names
+            "fruits": list(self.fruits),
+            "alive": alive,
+            "scores": scores,
+            "names": self.names,
+            "tick": self.tick
         }
 
+    def view_rect(self, pid, cols, rows):
+        # Janela de cols x rows células em volta da cabeça do jogador (ou do
+        # centro do tabuleiro, para espectadores), sem passar das bordas.
+        # Retorna (x, y, largura, altura) em pixels.
+        width = min(cols * BLOCK_SIZE, self.width)
+        height = min(rows * BLOCK_SIZE, self.height)
+        player = self.records.get(pid)
+        if player is not None:
+            center_x, center_y = self.cell_position(player.body.head)
+        else:
+            center_x, center_y = self.width // 2, self.height // 2
+        x = min(max(snap(center_x - width // 2), 0), self.width - width)
+        y = min(max(snap(center_y - height // 2), 0), self.height - height)
+        return (x, y, width, height)
+
+    def get_view(self, pid, rect):
+        # Estado só com o que está dentro de rect (a área de interesse do
+        # jogador): os segmentos visíveis de cada cobra, as frutas visíveis e
+        # vivo/pontuação/nome de quem aparece (e do próprio jogador, para o HUD)
+        left, top, width, height = rect
+        first_col, first_row = left // BLOCK_SIZE, top // BLOCK_SIZE
+        last_col, last_row = first_col + width // BLOCK_SIZE, first_row + height // BLOCK_SIZE
+        cols, records, positions = self.cols, self.records, self.positions
+        low, high = first_row * cols, last_row * cols  # Faixa de células das linhas visíveis
+        snakes = {}
+        for other in self.snake_grid.query(rect):
+            visible = [positions[cell] for cell in records[other].body.cell_list()
+                       if low <= cell < high and first_col <= cell % cols < last_col]
+            if visible:
+                snakes[other] = visible
+        right, bottom = left + width, top + height
+        fruits = sorted(pos for pos in self.fruit_grid.query(rect)
+                        if left <= pos[0] < right and top <= pos[1] < bottom)
+        interest = set(snakes)
+        if pid in records:
+            interest.add(pid)
+        return {
+            "snakes": snakes,
+            "fruit": fruits[0] if fruits else None,
+            "fruits": fruits,
+            "alive": {p: records[p].alive for p in interest},
+            "scores": {p: records[p].score for p in interest},
+            "names": {p: self.names[p] for p in interest if p in self.names},
+            "tick": self.tick,
+            "view": rect,
+        }
+
+    def state_hash(self):
+        # Resumo de tudo o que a simulação decide (ver lockstep.py): dois
+        # GameStates com o mesmo resumo estão no mesmo tick e com as mesmas
+        # cobras, frutas e pontuações. Mesmo formato de antes da troca para
+        # registros, então logs gravados antes continuam conferindo.
+        h = zlib.crc32(repr((self.tick, self.fruits)).encode())
+        for pid in self.players:
+            player = self.records[pid]
+            snake = (pid, player.alive, player.score, tuple(player.body.trail))
+            h = zlib.crc32(repr(snake).encode(), h)
+        return h
+
+    def sync_state(self):
+        # Tudo o que a simulação decide, em dados simples (o "sync" do
+        # lockstep, ver protocol.py): gerador aleatório, cobras (células,
+        # direção, vivo, pontuação), frutas e a ordem do array de células
+        # livres, que decide onde nasce a próxima fruta. Grades e índices
+        # derivados são remontados em restore().
+        players = []
+        for pid in self.players:
+            player = self.records[pid]
+            players.append((pid, player.direction, player.alive, player.score,
+                            player.body.cell_list()))
+        return {
+            "tick": self.tick,
+            "rng": self.rng.getstate(),
+            "players": players,
+            "fruits": list(self.fruits),
+            "free_cells": self.free_cells.tolist(),
+            "ai": sorted(self.ai_players),
+        }
+
+    def restore(self, state):
+        # Volta ao estado de sync_state(), no mesmo tabuleiro
+        size = self.cols * self.rows
+        typecode = cell_typecode(size)
+        self.tick = state["tick"]
+        self.rng.setstate(state["rng"])
+        self.blocked = bytearray(size)
+        self.occupancy = bytearray(size)
+        self.snake_grid = SpatialGrid(self.cols, self.rows)
+        self.fruit_grid = SpatialGrid(self.cols, self.rows)
+        self.records = {}
+        self.players = []
+        for pid, direction, alive, score, cells in state["players"]:
+            player = Player(SnakeBody(cells, self.positions, typecode), direction)
+            player.alive = alive
+            player.score = score
+            self.records[pid] = player
+            self.players.append(pid)
+            for cell in cells:
+                self.occupancy[cell] += 1
+                self.snake_grid.add_cell(cell, pid)
+            if alive:
+                for cell in cells[1:]:  # A cabeça não conta na grade
+                    self.blocked[cell] += 1
+        self.ai_players = set(state["ai"])
+        self.fruits = list(state["fruits"])
+        self.fruit_slots = {}
+        for i, pos in enumerate(self.fruits):
+            cell = self.cell_index(pos)
+            self.occupancy[cell] += 1
+            self.fruit_grid.add(pos, pos)
+            self.fruit_slots[cell] = i
+        self.scoreboard = None
+        self.free_cells = array(typecode, state["free_cells"])
+        self.free_index = array(typecode, bytes(size * self.free_cells.itemsize))
+        for i, cell in enumerate(self.free_cells):
+            self.free_index[cell] = i
+        self.last_delta = None
+
+    def get_delta(self):
+        # Retorna as mudanças do último tick (None antes do primeiro update)
+        return self.last_delta
+
     def is_game_over(self):
-        # Fim do jogo quando todos os jogadores estão mortos
-        return all(not self.alive.get(pid, False) for pid in self.players)
+        # Fim do jogo quando todos os jogadores estão mortos. Com cobras da IA,
+        # basta morrerem as das pessoas (se houver alguma na partida).
+        humans = [pid for pid in self.players if pid not in self.ai_players]
+        return all(not self.records[pid].alive for pid in humans or self.players)
+
+
+# Aplica um delta recebido do servidor sobre uma cópia local do estado.
+# Retorna False se o delta não for o próximo tick esperado (o cliente
+# deve então pedir um novo snapshot completo com "resync").
+def apply_delta(state, delta):
+    if delta["tick"] != state.get("tick", 0) + 1:
+        return False
+
+    snakes = state["snakes"]
+    for pid, head in delta["heads"].items():
+        snakes[pid].insert(0, head)
+    for pid in delta["tails"]:
+        snakes[pid].pop()
+    for pid in delta["dead"]:
+        state["alive"][pid] = False
+    if "fruit" in delta:
+        state["fruit"] = delta["fruit"]
+        state["fruits"] = delta.get("fruits", [delta["fruit"]])
+    state["scores"].update(delta["scores"])
+    state["tick"] = delta["tick"]
+    return True
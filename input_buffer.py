@@ -0,0 +1,143 @@
+# Inputs numerados, fila curta por jogador e medida de input → efeito.
+#
+# Cada input do cliente leva uma seq (crescente por conexão) e o último tick
+# que o cliente tinha visto. No servidor, InputBuffer guarda até `depth`
+# curvas por jogador e o tick consome no máximo uma de cada: duas teclas
+# apertadas dentro do mesmo tick viram duas curvas em ticks seguidos, em vez
+# de a segunda apagar a primeira. Curvas que não mudariam nada (mesma direção
+# ou a oposta) são descartadas na hora de consumir, sem gastar o tick.
+#
+# A última seq processada de cada jogador volta nas mensagens de estado
+# ("acks": { pid: seq }): o delta leva só as que mudaram no tick, o snapshot
+# leva todas. Com isso o cliente (LatencyTracker) mede quanto tempo passou do
+# envio até receber o estado em que o input já foi aplicado. No servidor:
+# - metrics.INPUT_WAIT: tempo de cada curva na fila até o tick que a aplicou;
+# - metrics.INPUT_DELAY: ticks entre o que o cliente via e o da curva.
+#
+# Clientes antigos mandam input sem seq: o servidor numera na chegada e a
+# fila funciona igual; só não há o que medir do lado deles.
+import threading
+import time
+from collections import deque
+import metrics
+
+INPUT_DEPTH = 3     # Curvas guardadas por jogador (além disso vale a mais nova)
+MAX_PENDING = 64    # Inputs sem ack guardados pelo cliente
+
+
+class InputBuffer:
+    def __init__(self, depth=INPUT_DEPTH, clock=time.monotonic):
+        self.depth = depth
+        self.clock = clock
+        self.queues = {}    # { pid: deque[(seq, direção, tick do cliente, chegada)] }
+        self.received = {}  # { pid: maior seq recebida } (descarta repetidas)
+        self.acked = {}     # { pid: última seq processada }
+        self.changed = {}   # Acks que mudaram desde o último take_acks()
+        # push vem das threads dos clientes no server.py; take, do tick
+        self.lock = threading.Lock()
+
+    def push(self, pid, direction, seq=None, tick=0):
+        # Enfileira uma curva; False se ela já tinha chegado (UDP repete os
+        # inputs até o ack) ou é mais velha que a última recebida
+        with self.lock:
+            last = self.received.get(pid, 0)
+            if seq is None:
+                seq = last + 1
+            elif seq <= last:
+                return False
+            self.received[pid] = seq
+            queue = self.queues.get(pid)
+            if queue is None:
+                queue = self.queues[pid] = deque()
+            elif len(queue) >= self.depth:
+                queue.pop()  # Fila cheia: a curva mais nova substitui a última
+                metrics.DROPS.inc(reason="input_overflow")
+            queue.append((seq, direction, tick, self.clock()))
+            return True
+
+    def take(self, game):
+        # { pid: direção } deste tick: a primeira curva de cada fila que muda
+        # a direção da cobra. As que não mudariam nada são só confirmadas.
+        applied = {}
+        now = self.clock()
+        effect = game.tick + 1  # O update() seguinte é o tick em que ela vale
+        with self.lock:
+            for pid, queue in self.queues.items():
+                while queue:
+                    seq, direction, tick, arrived = queue.popleft()
+                    self.acked[pid] = self.changed[pid] = seq
+                    if game.turns(pid, direction):
+                        applied[pid] = direction
+                        metrics.INPUT_WAIT.observe(now - arrived)
+                        if tick:
+                            metrics.INPUT_DELAY.observe(effect - tick)
+                        break
+        return applied
+
+    def take_acks(self):
+        # Acks que mudaram desde a última chamada (para o delta do tick)
+        with self.lock:
+            changed, self.changed = self.changed, {}
+        return changed
+
+    def acks(self):
+        # Todos os acks (snapshot completo)
+        with self.lock:
+            return dict(self.acked)
+
+    def remove(self, pid):
+        with self.lock:
+            for table in (self.queues, self.received, self.acked, self.changed):
+                table.pop(pid, None)
+
+    def clear(self):
+        # Entre partidas: esvazia as filas, mas continua descartando seqs já vistas
+        with self.lock:
+            self.queues.clear()
+            self.acked.clear()
+            self.changed.clear()
+
+
+class LatencyTracker:
+    # Lado do cliente: numera os inputs e mede input → efeito pelos acks.
+    # No client.py stamp roda no loop da tela e ack na thread de rede: só
+    # operações atômicas de dict (cópia das chaves, pop com padrão).
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.next_seq = 1
+        self.pending = {}   # { seq: horário de envio }, em ordem
+        self.samples = []   # Segundos do envio até o estado com o ack
+
+    def stamp(self, seq=None):
+        # Registra o envio de um input e devolve a seq dele (no UDP a seq
+        # vem da janela de inputs)
+        if seq is None:
+            seq = self.next_seq
+        self.next_seq = max(self.next_seq, seq + 1)
+        self.pending[seq] = self.clock()
+        if len(self.pending) > MAX_PENDING:
+            self.pending.pop(next(iter(self.pending)), None)  # Servidor sem acks
+        return seq
+
+    def ack(self, acks, pid):
+        # Aplica os acks de uma mensagem de estado ({ pid: seq })
+        seq = acks.get(pid) if acks else None
+        if seq is None or not self.pending:
+            return
+        now = self.clock()
+        for sent in [s for s in list(self.pending) if s <= seq]:
+            started = self.pending.pop(sent, None)
+            if started is not None:
+                self.samples.append(now - started)
+
+    def reset(self):
+        # Fim de partida: inputs ainda sem ack só seriam confirmados na
+        # próxima, com o tempo do lobby no meio
+        self.pending.clear()
+
+    def summary(self):
+        # "N inputs, média X ms, máx Y ms" (ou None sem medidas)
+        if not self.samples:
+            return None
+        avg = sum(self.samples) / len(self.samples) * 1000
+        return f"{len(self.samples)} inputs, média {avg:.0f} ms, máx {max(self.samples) * 1000:.0f} ms"
@@ -0,0 +1,112 @@
+# Suavização do lado do cliente: interpolação entre ticks e predição de input.
+#
+# O servidor manda um estado a cada tick (~150 ms); desenhar só isso deixa o
+# movimento "aos saltos". Aqui ficam as peças sem pygame do modo suave:
+#
+# - FrameBuffer: buffer duplo entre a thread de rede e o loop de desenho. A
+#   thread de rede aplica os deltas na sua cópia de trabalho e publica uma
+#   cópia congelada trocando uma única referência (o par anterior/atual);
+#   o loop de desenho lê esse par de uma vez, sem trava e sem ver estado
+#   pela metade.
+# - InputPredictor: mostra a curva da cobra local assim que a tecla é
+#   apertada e se reconcilia com a direção que o servidor de fato aplicou.
+import time
+from settings import TICK_RATE
+
+STEPS = {"UP": (0, -1), "DOWN": (0, 1), "LEFT": (-1, 0), "RIGHT": (1, 0)}
+OPPOSITE = {"UP": "DOWN", "DOWN": "UP", "LEFT": "RIGHT", "RIGHT": "LEFT"}
+PREDICTION_TICKS = 5  # Ticks sem confirmação até descartar um input previsto
+
+
+def snapshot(state):
+    # Copia o que apply_delta altera no lugar, para publicar ao loop de desenho
+    frozen = dict(state)
+    frozen["snakes"] = {pid: list(body) for pid, body in state["snakes"].items()}
+    frozen["alive"] = dict(state["alive"])
+    frozen["scores"] = dict(state["scores"])
+    if "fruits" in state:
+        frozen["fruits"] = list(state["fruits"])
+    return frozen
+
+
+def direction_of(body):
+    # Direção em que a cobra andou no último tick (cabeça menos pescoço)
+    if len(body) < 2:
+        return None
+    dx = body[0][0] - body[1][0]
+    dy = body[0][1] - body[1][1]
+    for name, (sx, sy) in STEPS.items():
+        if (dx > 0) - (dx < 0) == sx and (dy > 0) - (dy < 0) == sy:
+            return name
+    return None
+
+
+class Frame:
+    def __init__(self, state, received_at):
+        self.state = state
+        self.tick = state.get("tick", 0)
+        self.received_at = received_at
+
+
+class FrameBuffer:
+    def __init__(self, tick_interval=1.0 / TICK_RATE, clock=time.perf_counter):
+        self.frames = (None, None)          # (anterior, atual), trocados juntos
+        self.tick_interval = tick_interval  # Estimado pelos intervalos de chegada
+        self.clock = clock
+
+    def publish(self, state):
+        # Chamado pela thread de rede depois de aplicar update/delta
+        now = self.clock()
+        current = self.frames[1]
+        frame = Frame(snapshot(state), now)
+        if current is not None and current.tick == frame.tick - 1:
+            gap = now - current.received_at
+            if gap < 4 * self.tick_interval:
+                self.tick_interval += 0.1 * (gap - self.tick_interval)
+            previous = current
+        else:
+            previous = None  # Nova partida ou salto de ticks: nada a interpolar
+        self.frames = (previous, frame)
+
+    def clear(self):
+        self.frames = (None, None)
+
+    def latest(self):
+        return self.frames
+
+    def alpha(self, frame):
+        # Fração do tick atual já decorrida (0 = acabou de chegar, 1 = atrasado)
+        elapsed = (self.clock() - frame.received_at) / self.tick_interval
+        return min(1.0, max(0.0, elapsed))
+
+
+class InputPredictor:
+    # Usado só pelo loop principal (teclado e desenho), sem concorrência
+    def __init__(self):
+        self.pending = None
+        self.pressed_tick = 0
+
+    def reset(self):
+        self.pending = None
+
+    def press(self, direction, tick):
+        self.pending = direction
+        self.pressed_tick = tick
+
+    def direction(self, state, pid):
+        # Direção prevista da cobra local para o próximo tick
+        body = state["snakes"].get(pid)
+        if not body:
+            return None
+        server = direction_of(body) or "RIGHT"
+        pending = self.pending
+        if pending is None:
+            return server
+        tick = state.get("tick", 0)
+        if server == pending or tick > self.pressed_tick + PREDICTION_TICKS:
+            # Confirmado (ou perdido): daqui em diante vale o servidor
+            self.pending = None
+            return server
+        if pending == OPPOSITE[server]:
+            return server  # O servidor também ignora a direção oposta
+        return pending
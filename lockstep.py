@@ -0,0 +1,95 @@
+# Modo lockstep: o servidor manda inputs em vez do estado do mundo.
+#
+# O GameState é determinístico dado a seed, a ordem dos jogadores e os inputs
+# aplicados em cada tick. No início da partida o servidor manda "lockstep"
+# (seed, frutas e ordem dos jogadores) e, a cada tick, só "tick": os inputs
+# que mudaram desde o tick anterior. Cada cliente roda o próprio
+# GameState.update() com eles, então os bytes por tick dependem de quantos
+# jogadores mexeram, não do tamanho das cobras.
+#
+# A cada HASH_INTERVAL ticks o "tick" leva um resumo do estado do servidor
+# (GameState.state_hash). Se o do cliente for diferente, ele pede "resync" e
+# recebe "sync": o estado inteiro da simulação (GameState.sync_state, com o
+# gerador aleatório e a ordem das células livres, que também decidem onde
+# nascem as frutas), num registro binário com campos fixos como as demais
+# mensagens.
+import random
+import time
+from game_state import GameState
+
+HASH_INTERVAL = 20  # Ticks entre resumos do estado para detectar dessincronia
+
+
+def changed_inputs(sent, applied):
+    # Inputs de applied diferentes dos já enviados/gravados; atualiza sent.
+    # O servidor aplica cada curva uma vez só, e só curvas que mudam a direção
+    # (ver input_buffer.py); reaplicar a última a todo tick não muda nada,
+    # então quem guarda os inputs acumulados reproduz exatamente o mesmo jogo.
+    changed = {pid: d for pid, d in applied.items() if sent.get(pid) != d}
+    sent.update(changed)
+    return changed
+
+
+class LockstepHost:
+    # Lado do servidor: monta as mensagens de uma partida em lockstep
+    def __init__(self, seed=None):
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.sent = {}  # { pid: direção } já enviados (o cliente guarda igual)
+
+    def start_message(self, game):
+        return {
+            "type": "lockstep",
+            "seed": self.seed,
+            "fruits": game.fruit_count,
+            "players": list(game.players),
+        }
+
+    def tick_message(self, game, applied):
+        # applied: os inputs aplicados antes do update() deste tick
+        changed = changed_inputs(self.sent, applied)
+        msg = {"type": "tick", "tick": game.tick, "inputs": changed, "sent_at": time.time()}
+        if game.tick % HASH_INTERVAL == 0:
+            msg["hash"] = game.state_hash()
+        return msg
+
+    def sync_message(self, game):
+        return {"type": "sync", "state": game.sync_state(), "inputs": dict(self.sent)}
+
+
+class LockstepClient:
+    # Lado do cliente: simula a partida localmente com os inputs recebidos
+    def __init__(self, msg, names, board):
+        self.game = GameState(
+            {pid: None for pid in msg["players"]}, names, seed=msg["seed"],
+            fruit_count=msg["fruits"], width=board[0], height=board[1]
+        )
+        self.inputs = {}
+        self.awaiting_sync = False  # Pediu "resync" e ainda não chegou o "sync"
+        self.desyncs = 0
+
+    def apply(self, msg):
+        # Aplica um "tick"; retorna False se o cliente precisa pedir "resync"
+        # (resumo diferente ou tick fora de ordem). Enquanto espera o "sync",
+        # os ticks são ignorados.
+        game = self.game
+        if self.awaiting_sync or msg["tick"] <= game.tick:
+            return True
+        if msg["tick"] != game.tick + 1:
+            return self.lost_sync()
+        self.inputs.update(msg["inputs"])
+        for pid, direction in self.inputs.items():
+            game.set_input(pid, direction)
+        game.update()
+        if "hash" in msg and msg["hash"] != game.state_hash():
+            return self.lost_sync()
+        return True
+
+    def lost_sync(self):
+        self.desyncs += 1
+        self.awaiting_sync = True
+        return False
+
+    def sync(self, msg):
+        self.game.restore(msg["state"])
+        self.inputs = dict(msg["inputs"])
+        self.awaiting_sync = False
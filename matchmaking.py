@@ -0,0 +1,95 @@
+# Fila de espera e início das partidas (matchmaking).
+#
+# Quem não está jogando fica na fila, em ordem de chegada. Uma partida (ou
+# sala, no rooms.py) começa com os primeiros `room_size` da fila quando:
+# - alguém aperta "Iniciar Jogo" (request_start);
+# - a fila chega a `auto_start` jogadores (0 = desligado);
+# - o primeiro da fila espera `timeout` segundos (0 = desligado).
+# Sem nenhuma das opções vale só o botão, como antes.
+#
+# A fila não tem thread nem timer próprios: os servidores chamam join/leave
+# quando alguém entra ou sai, mandam as mensagens de lobby_messages() só
+# quando algo mudou e dormem até o próximo evento ou até time_left(). Com
+# ninguém entrando ou saindo, o lobby não acorda. Entre dois envios passam
+# pelo menos PUSH_INTERVAL segundos: uma rajada de conexões vira um envio só,
+# em vez de mandar a fila inteira a cada um que entra.
+#
+# Cada jogador que sai da fila para uma partida registra quanto esperou em
+# metrics.MATCH_WAIT.
+import time
+import metrics
+
+PUSH_INTERVAL = 0.25  # Intervalo mínimo entre envios das posições da fila
+
+
+class MatchQueue:
+    def __init__(self, room_size, auto_start=0, timeout=0.0, clock=time.monotonic):
+        self.room_size = room_size
+        self.auto_start = min(auto_start, room_size) if auto_start > 0 else 0
+        self.timeout = timeout
+        self.clock = clock
+        self.waiting = {}         # { pid: horário de entrada }, em ordem de chegada
+        self.start_requested = False
+        self.version = 0          # Muda a cada alteração da fila (ver lobby_messages)
+
+    def __len__(self):
+        return len(self.waiting)
+
+    def __contains__(self, pid):
+        return pid in self.waiting
+
+    def join(self, pid):
+        # Entra no fim da fila (quem já está nela não perde o lugar)
+        if pid not in self.waiting:
+            self.waiting[pid] = self.clock()
+            self.version += 1
+
+    def leave(self, pid):
+        if self.waiting.pop(pid, None) is not None:
+            self.version += 1
+            if not self.waiting:
+                self.start_requested = False
+
+    def request_start(self):
+        # "Iniciar Jogo": a próxima partida sai com quem estiver esperando
+        if self.waiting:
+            self.start_requested = True
+
+    def due(self):
+        # True se já dá para começar uma partida
+        count = len(self.waiting)
+        if not count:
+            return False
+        if self.start_requested or (self.auto_start and count >= self.auto_start):
+            return True
+        return self.timeout > 0 and self.clock() - next(iter(self.waiting.values())) >= self.timeout
+
+    def time_left(self):
+        # Segundos até o prazo da fila vencer (None = sem prazo: só um evento acorda)
+        if not self.timeout or not self.waiting:
+            return None
+        first = next(iter(self.waiting.values()))
+        return max(0.0, first + self.timeout - self.clock())
+
+    def pop_match(self):
+        # Tira os primeiros room_size da fila e devolve os pids, em ordem
+        now = self.clock()
+        playing = list(self.waiting)[:self.room_size]
+        for pid in playing:
+            metrics.MATCH_WAIT.observe(now - self.waiting.pop(pid))
+        self.start_requested = False
+        self.version += 1
+        return playing
+
+    def lobby_messages(self):
+        # [(pid, mensagem "lobby")] para cada um na fila: quantos esperam, o
+        # tamanho da partida, a posição (1 = primeiro) e os segundos até o
+        # início automático pelo prazo (0 = sem prazo)
+        left = self.time_left()
+        starts_in = 0 if left is None else max(1, round(left))
+        connected = len(self.waiting)
+        return [
+            (pid, {"type": "lobby", "connected": connected, "max": self.room_size,
+                   "position": position, "starts_in": starts_in})
+            for position, pid in enumerate(self.waiting, 1)
+        ]
@@ -0,0 +1,325 @@
+# Instrumentação do servidor: histogramas, contadores, endpoint HTTP e
+# profiler por amostragem.
+#
+# Tudo fica em memória e custa poucas operações por tick. As métricas são
+# expostas no formato texto do Prometheus em http://host:porta/metrics e
+# podem ser impressas periodicamente (start_dump). O profiler por amostragem
+# pode ser ligado e desligado com o servidor rodando:
+#     curl localhost:9100/profile/start
+#     curl localhost:9100/profile/stop     (imprime as funções mais vistas)
+# Assim dá para saber se um tick lento foi simulação (GameState.update),
+# serialização (protocol.encode) ou rede (sendall).
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+
+# Limites dos buckets em segundos (de 50 µs a 1 s)
+TIME_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Esperas na fila de partidas (de 100 ms a 10 min)
+WAIT_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+# Em ticks (atraso dos inputs, ver input_buffer.py)
+TICK_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=TIME_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Último = acima do maior limite
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)  # Primeiro limite >= value
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+            self.max = max(self.max, value)
+
+    def time(self):
+        # Uso: with HISTOGRAM.time(): trabalho()
+        return _Timer(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+    def summary(self):
+        avg = self.sum / self.count * 1000 if self.count else 0.0
+        return f"{self.count} amostras, média {avg:.2f} ms, máx {self.max * 1000:.2f} ms"
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Counter:
+    # Contador com rótulos opcionais: inc(n, client=3)
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def total(self):
+        return sum(self.values.values())
+
+    def remove(self, **labels):
+        # Esquece uma série (ex.: cliente que desconectou)
+        with self.lock:
+            self.values.pop(tuple(sorted(labels.items())), None)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    # Valor lido na hora da coleta: fn() devolve um número ou {rótulos: número}
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        value = self.fn()
+        if isinstance(value, dict):
+            for key, v in value.items():
+                lines.append(f"{self.name}{_labels(key)} {v}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Métricas do loop de ticks (usadas pelo server.py e pelo async_server.py)
+UPDATE_TIME = REGISTRY.register(Histogram(
+    "snake_update_seconds", "Tempo de GameState.update por tick"))
+SERIALIZE_TIME = REGISTRY.register(Histogram(
+    "snake_serialize_seconds", "Tempo para codificar as mensagens do tick"))
+BROADCAST_TIME = REGISTRY.register(Histogram(
+    "snake_broadcast_seconds", "Tempo para entregar o tick aos clientes (inclui codificação)"))
+TICK_LATENESS = REGISTRY.register(Histogram(
+    "snake_tick_lateness_seconds", "Atraso do wakeup em relação ao prazo do tick"))
+BYTES_IN = REGISTRY.register(Counter(
+    "snake_bytes_in_total", "Bytes recebidos por cliente"))
+BYTES_OUT = REGISTRY.register(Counter(
+    "snake_bytes_out_total", "Bytes enviados por cliente"))
+INPUTS = REGISTRY.register(Counter(
+    "snake_inputs_total", "Inputs de direção recebidos"))
+CONNECTIONS = REGISTRY.register(Counter(
+    "snake_connections_total", "Conexões aceitas"))
+DISCONNECTS = REGISTRY.register(Counter(
+    "snake_disconnects_total", "Conexões encerradas"))
+DROPS = REGISTRY.register(Counter(
+    "snake_drops_total", "Mensagens descartadas ou conexões recusadas, por motivo"))
+AI_TIME = REGISTRY.register(Histogram(
+    "snake_ai_seconds", "Tempo das decisões das cobras da IA por tick"))
+AI_DECISIONS = REGISTRY.register(Counter(
+    "snake_ai_decisions_total", "Decisões da IA por nível (path = campo + flood fill, greedy = barata)"))
+MATCH_WAIT = REGISTRY.register(Histogram(
+    "snake_match_wait_seconds", "Tempo de cada jogador na fila até entrar numa partida",
+    WAIT_BUCKETS))
+INPUT_WAIT = REGISTRY.register(Histogram(
+    "snake_input_wait_seconds", "Tempo de cada curva na fila do jogador até o tick que a aplicou"))
+INPUT_DELAY = REGISTRY.register(Histogram(
+    "snake_input_delay_ticks", "Ticks entre o último estado visto pelo cliente e o tick da curva",
+    TICK_BUCKETS))
+
+TICK_HISTOGRAMS = (
+    ("update", UPDATE_TIME), ("serialização", SERIALIZE_TIME),
+    ("broadcast", BROADCAST_TIME), ("atraso", TICK_LATENESS), ("ia", AI_TIME),
+)
+
+
+def summary():
+    # Resumo de uma linha por métrica, para o dump periódico
+    lines = [f"[metrics] {label}: {hist.summary()}" for label, hist in TICK_HISTOGRAMS]
+    lines.append(
+        f"[metrics] bytes in {BYTES_IN.total()}, out {BYTES_OUT.total()}, "
+        f"inputs {INPUTS.total()}, conexões {CONNECTIONS.total()}, "
+        f"desconexões {DISCONNECTS.total()}, descartes {DROPS.total()}"
+    )
+    if MATCH_WAIT.count:
+        lines.append(
+            f"[metrics] espera na fila: {MATCH_WAIT.count} jogadores, "
+            f"média {MATCH_WAIT.sum / MATCH_WAIT.count:.1f} s, máx {MATCH_WAIT.max:.1f} s"
+        )
+    if INPUT_WAIT.count:
+        line = f"[metrics] curvas na fila: {INPUT_WAIT.summary()}"
+        if INPUT_DELAY.count:
+            line += f", atraso médio {INPUT_DELAY.sum / INPUT_DELAY.count:.1f} ticks"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def start_dump(interval):
+    # Imprime o resumo a cada `interval` segundos (thread daemon)
+    def loop():
+        while True:
+            time.sleep(interval)
+            print(summary())
+    threading.Thread(target=loop, daemon=True).start()
+
+
+# ---------- Profiler por amostragem ----------
+
+class SamplingProfiler:
+    # Olha a pilha da thread do loop de ticks a cada `interval` segundos e
+    # conta as funções vistas. Custo zero quando desligado; ligado, roda numa
+    # thread à parte. Tempo ocioso aparece como scheduler.py:wait (sleep).
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id  # None = thread principal (onde roda o tick)
+        self.running = False
+        self.samples = 0
+        self.leaf = _Tally()      # Função no topo da pilha (onde o tempo é gasto)
+        self.inclusive = _Tally() # Função em qualquer ponto da pilha
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.samples = 0
+        self.leaf.clear()
+        self.inclusive.clear()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        return self.report()
+
+    def _run(self):
+        target = self.thread_id or threading.main_thread().ident
+        while self.running:
+            frame = sys._current_frames().get(target)
+            seen = set()
+            top = True
+            while frame is not None:
+                code = frame.f_code
+                name = f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}"
+                if top:
+                    self.leaf[name] += 1
+                    top = False
+                if name not in seen:
+                    seen.add(name)
+                    self.inclusive[name] += 1
+                frame = frame.f_back
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def report(self, top=20):
+        if not self.samples:
+            return "Nenhuma amostra coletada.\n"
+        lines = [f"{self.samples} amostras a cada {self.interval * 1000:.0f} ms", "",
+                 "Inclusivo (função ou quem ela chamou):"]
+        for name, count in self.inclusive.most_common(top):
+            lines.append(f"  {count:7d}  {name}")
+        lines += ["", "Topo da pilha:"]
+        for name, count in self.leaf.most_common(top):
+            lines.append(f"  {count:7d}  {name}")
+        return "\n".join(lines) + "\n"
+
+
+PROFILER = SamplingProfiler()
+
+
+def start_profiler():
+    PROFILER.start()
+    return "Profiler ligado.\n"
+
+
+ROUTES = {
+    "/metrics": REGISTRY.render,
+    "/profile": PROFILER.report,
+    "/profile/start": start_profiler,
+    "/profile/stop": PROFILER.stop,
+}
+
+
+def serve(port, host="127.0.0.1"):
+    # Sobe o endpoint HTTP numa thread daemon e devolve o servidor. O
+    # http.server só é importado aqui para não pesar no cold start.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            handler = ROUTES.get(self.path)
+            if handler is None:
+                self.send_error(404)
+                return
+            body = handler().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # Sem uma linha no terminal a cada scrape
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
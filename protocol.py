@@ -0,0 +1,684 @@
+# Codec binário compacto para as mensagens do jogo.
+#
+# Cada frame (já sem o cabeçalho de tamanho de 4 bytes) começa com um byte
+# de versão. Payloads em pickle começam sempre com 0x80 (opcode PROTO), então
+# o receptor sabe decodificar os dois formatos sem ambiguidade. Isso permite
+# negociar a versão com "hello" e continuar falando pickle com clientes antigos.
+#
+# Coordenadas vão como células da grade (uint16 x, uint16 y) em vez de tuplas
+# de pixels; a conversão usa o BLOCK_SIZE do codec.
+import pickle
+import struct
+import sys
+from array import array
+from settings import BLOCK_SIZE
+
+VERSION = 1                  # Versão atual do formato binário
+SUPPORTED_VERSIONS = (1,)    # Versões que este código sabe decodificar
+PICKLE_MARKER = 0x80         # Primeiro byte de um payload pickle
+
+# Códigos dos tipos de mensagem
+MSG_LOBBY = 1
+MSG_START = 2
+MSG_UPDATE = 3
+MSG_DELTA = 4
+MSG_INPUT = 5
+MSG_GAME_OVER = 6
+MSG_START_GAME = 7
+MSG_RESYNC = 8
+MSG_FULL = 9
+MSG_HELLO = 10
+MSG_UDP = 11      # Pedido (cliente) / dados (servidor) do canal UDP, ver udp_transport.py
+MSG_VIEW = 12     # Estado só da área de interesse do jogador (arenas grandes)
+MSG_LOCKSTEP = 13 # Seed e ordem dos jogadores do modo lockstep, ver lockstep.py
+MSG_TICK = 14     # Inputs de um tick do modo lockstep (e o resumo do estado)
+MSG_LEADERBOARD = 15  # Topo do ranking, mandado a quem está na fila (ver storage.py)
+MSG_SYNC = 16     # Estado inteiro da simulação, resposta ao resync do lockstep
+
+# Direções como inteiros pequenos
+DIRECTION_CODES = {"UP": 0, "DOWN": 1, "LEFT": 2, "RIGHT": 3}
+DIRECTION_NAMES = {code: name for name, code in DIRECTION_CODES.items()}
+
+NO_CELL = 0xFFFF  # Marca "sem fruta" no campo de coordenadas
+CELL_CACHE = 1 << 17  # Mínimo de células nos caches do codec (sobe com o tabuleiro)
+
+_HEADER = struct.Struct(">BB")    # versão, tipo
+_U8 = struct.Struct(">B")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+_I32 = struct.Struct(">i")
+_F64 = struct.Struct(">d")        # sent_at: horário de envio no servidor (0 = ausente)
+_CELL = struct.Struct(">HH")      # x, y em células
+_LOBBY = struct.Struct(">HH")     # conectados, máximo (ou largura, altura)
+_QUEUE = struct.Struct(">HH")     # posição na fila, segundos até o início automático
+_PLAYER = struct.Struct(">IBIH")  # pid, vivo, pontuação, tamanho do corpo
+_HEAD = struct.Struct(">IHH")     # pid, x, y
+_SCORE = struct.Struct(">Ii")     # pid, pontuação
+_UDP = struct.Struct(">HII")      # porta, token, época (zeros no pedido do cliente)
+_VIEW = struct.Struct(">HHHH")    # x, y, largura, altura da janela em células
+_LOCKSTEP = struct.Struct(">IHH") # seed, número de frutas, número de jogadores
+_TICK = struct.Struct(">IBIH")    # tick, tem resumo, resumo, número de inputs
+_INPUT = struct.Struct(">IB")     # pid, direção
+_RANK = struct.Struct(">IiI")     # vitórias, recorde, partidas (uma linha do ranking)
+_SEQ = struct.Struct(">II")       # seq do input, último tick visto pelo cliente
+_ACK = struct.Struct(">II")       # pid, última seq de input processada
+_SYNC = struct.Struct(">IBBdH")   # tick, versão do gerador, tem gauss, gauss, tamanho do estado
+_SYNC_PLAYER = struct.Struct(">IBBII")  # pid, direção, viva, pontuação, nº de células
+
+
+_SWAP = sys.byteorder == "little"  # array usa a ordem nativa; a rede é big-endian
+
+
+class CodecError(ValueError):
+    pass
+
+
+def _u32_bytes(values):
+    # Sequência de inteiros como uint32 big-endian, num passo só
+    out = array("I", values)
+    if _SWAP:
+        out.byteswap()
+    return out
+
+
+def _unpack_u32s(view, offset, count):
+    end = offset + 4 * count
+    if len(view) < end:
+        raise CodecError("Lista de uint32 truncada")
+    values = array("I")
+    values.frombytes(view[offset:end])
+    if _SWAP:
+        values.byteswap()
+    return values.tolist(), end
+
+
+# Os corpos das cobras vão como pares (x, y) de uint16 em células. Lido como
+# um uint32 big-endian, o par vira a chave x << 16 | y; os dois caches abaixo
+# convertem posição em pixels ↔ chave uma vez por célula, e o codec passa
+# todos os corpos de uma mensagem por um map() só, num array de uint32: nada
+# de contas em Python por segmento. No decode as tuplas saem do cache,
+# compartilhadas entre as mensagens. Cada cache guarda até uma entrada por
+# célula do tabuleiro (Codec.fit_board, chamado pelo "start" que leva o
+# tamanho dele); só passando disso, o que não acontece num tabuleiro só,
+# recomeça do zero.
+class _CellKeys(dict):
+    # { (x, y) em pixels: x << 16 | y em células }
+    def __init__(self, block_size):
+        super().__init__()
+        self.block_size = block_size
+        self.limit = CELL_CACHE
+
+    def __missing__(self, pos):
+        x, y = pos[0] // self.block_size, pos[1] // self.block_size
+        if not (0 <= x <= 0xFFFF and 0 <= y <= 0xFFFF):
+            raise CodecError(f"Posição fora da grade: {pos!r}")
+        if len(self) >= self.limit:
+            self.clear()
+        key = self[pos] = x << 16 | y
+        return key
+
+
+class _CellPositions(dict):
+    # { x << 16 | y em células: (x, y) em pixels }
+    def __init__(self, block_size):
+        super().__init__()
+        self.block_size = block_size
+        self.limit = CELL_CACHE
+
+    def __missing__(self, key):
+        if len(self) >= self.limit:
+            self.clear()  # Chaves vêm da rede: o cache não cresce sem limite
+        pos = self[key] = ((key >> 16) * self.block_size, (key & 0xFFFF) * self.block_size)
+        return pos
+
+
+class Codec:
+    def __init__(self, block_size=BLOCK_SIZE, version=VERSION):
+        self.block_size = block_size
+        self.version = version
+        self.cell_keys = _CellKeys(block_size)
+        self.cell_positions = _CellPositions(block_size)
+
+    def fit_board(self, width, height):
+        # Dimensiona os caches de células para um tabuleiro de width x height pixels
+        cells = (width // self.block_size) * (height // self.block_size)
+        self.cell_keys.limit = self.cell_positions.limit = max(CELL_CACHE, cells)
+
+    # ---------- Codificação ----------
+
+    def encode(self, msg):
+        # Converte um dicionário de mensagem em bytes (sem o cabeçalho de tamanho)
+        kind = msg["type"]
+        out = bytearray()
+
+        if kind == "lobby":
+            out += _HEADER.pack(self.version, MSG_LOBBY)
+            out += _LOBBY.pack(msg.get("connected", 0), msg.get("max", 0))
+            # No fim do frame: decodificadores antigos leem só os dois primeiros campos
+            out += _QUEUE.pack(msg.get("position", 0), min(msg.get("starts_in", 0), 0xFFFF))
+
+        elif kind == "start":
+            out += _HEADER.pack(self.version, MSG_START)
+            out += _U32.pack(msg["player_id"])
+            self._pack_names(out, msg.get("players", {}))
+            board = msg.get("board", (0, 0))  # 0x0 = não informado
+            out += _LOBBY.pack(*board)
+            if all(board):
+                self.fit_board(*board)
+            state = msg.get("data")
+            out += _U8.pack(state is not None)
+            if state is not None:
+                self._pack_state(out, state)
+
+        elif kind == "update":
+            out += _HEADER.pack(self.version, MSG_UPDATE)
+            out += _F64.pack(msg.get("sent_at", 0.0))
+            self._pack_state(out, msg["data"])
+            self._pack_acks(out, msg)
+
+        elif kind == "view":
+            out += _HEADER.pack(self.version, MSG_VIEW)
+            out += _F64.pack(msg.get("sent_at", 0.0))
+            state = msg["data"]
+            out += _VIEW.pack(*(v // self.block_size for v in state["view"]))
+            self._pack_state(out, state)
+            self._pack_acks(out, msg)
+
+        elif kind == "lockstep":
+            out += _HEADER.pack(self.version, MSG_LOCKSTEP)
+            players = msg["players"]
+            out += _LOCKSTEP.pack(msg["seed"], msg["fruits"], len(players))
+            for pid in players:
+                out += _U32.pack(pid)
+
+        elif kind == "tick":
+            out += _HEADER.pack(self.version, MSG_TICK)
+            out += _F64.pack(msg.get("sent_at", 0.0))
+            inputs = msg["inputs"]
+            out += _TICK.pack(msg["tick"], "hash" in msg, msg.get("hash", 0), len(inputs))
+            for pid, direction in inputs.items():
+                out += _INPUT.pack(pid, DIRECTION_CODES[direction])
+            self._pack_acks(out, msg)
+
+        elif kind == "delta":
+            out += _HEADER.pack(self.version, MSG_DELTA)
+            out += _F64.pack(msg.get("sent_at", 0.0))
+            self._pack_delta(out, msg["data"])
+            self._pack_acks(out, msg)
+
+        elif kind == "input":
+            out += _HEADER.pack(self.version, MSG_INPUT)
+            out += _U8.pack(DIRECTION_CODES[msg["direction"]])
+            if "seq" in msg:
+                out += _SEQ.pack(msg["seq"], msg.get("tick", 0))
+
+        elif kind == "game_over":
+            out += _HEADER.pack(self.version, MSG_GAME_OVER)
+            scores = msg.get("scores", {})
+            out += _U16.pack(len(scores))
+            for pid, score in scores.items():
+                out += _SCORE.pack(pid, score)
+
+        elif kind == "start_game":
+            out += _HEADER.pack(self.version, MSG_START_GAME)
+
+        elif kind == "resync":
+            out += _HEADER.pack(self.version, MSG_RESYNC)
+
+        elif kind == "full":
+            out += _HEADER.pack(self.version, MSG_FULL)
+
+        elif kind == "hello":
+            out += _HEADER.pack(self.version, MSG_HELLO)
+            versions = msg.get("versions", (msg.get("version", self.version),))
+            out += _U8.pack(len(versions))
+            for v in versions:
+                out += _U8.pack(v)
+            if msg.get("name"):
+                # Apelido opcional depois das versões (decoders antigos ignoram)
+                self._pack_text(out, msg["name"])
+
+        elif kind == "leaderboard":
+            out += _HEADER.pack(self.version, MSG_LEADERBOARD)
+            top = msg.get("top", ())
+            out += _U8.pack(len(top))
+            for name, wins, best, matches in top:
+                out += _RANK.pack(wins, best, matches)
+                self._pack_text(out, name)
+
+        elif kind == "udp":
+            out += _HEADER.pack(self.version, MSG_UDP)
+            out += _UDP.pack(msg.get("port", 0), msg.get("token", 0), msg.get("epoch", 0))
+
+        elif kind == "sync":
+            out += _HEADER.pack(self.version, MSG_SYNC)
+            self._pack_sync(out, msg["state"])
+            inputs = msg["inputs"]
+            out += _U16.pack(len(inputs))
+            for pid, direction in inputs.items():
+                out += _INPUT.pack(pid, DIRECTION_CODES[direction])
+
+        else:
+            raise CodecError(f"Tipo de mensagem sem codificação binária: {kind!r}")
+
+        return bytes(out)
+
+    def _pack_cell(self, out, pos):
+        if pos is None:
+            out += _CELL.pack(NO_CELL, NO_CELL)
+        else:
+            out += _CELL.pack(pos[0] // self.block_size, pos[1] // self.block_size)
+
+    @staticmethod
+    def _pack_acks(out, msg):
+        # Acks dos inputs no fim do frame (decodificadores antigos ignoram)
+        acks = msg.get("acks")
+        if acks:
+            out += _U16.pack(len(acks))
+            for pid, seq in acks.items():
+                out += _ACK.pack(pid, seq)
+
+    @staticmethod
+    def _pack_text(out, text):
+        # Texto curto: uint8 de tamanho + UTF-8 (até 255 bytes)
+        raw = text.encode("utf-8")[:255]
+        out += _U8.pack(len(raw))
+        out += raw
+
+    def _pack_names(self, out, names):
+        out += _U16.pack(len(names))
+        for pid, name in names.items():
+            out += _U32.pack(pid)
+            self._pack_text(out, name)
+
+    def _pack_fruits(self, out, fruits):
+        out += _U16.pack(len(fruits))
+        for pos in fruits:
+            self._pack_cell(out, pos)
+
+    def _pack_state(self, out, state):
+        out += _U32.pack(state.get("tick", 0))
+        self._pack_fruits(out, self._fruit_list(state))
+        snakes = state["snakes"]
+        alive = state["alive"]
+        scores = state["scores"]
+        out += _U16.pack(len(snakes))
+        # Todos os corpos num array só (um byteswap); cada jogador leva a sua fatia
+        keys = self.cell_keys.__getitem__
+        cells = array("I")
+        for body in snakes.values():
+            cells.extend(map(keys, body))
+        if _SWAP:
+            cells.byteswap()
+        data = memoryview(cells).cast("B")
+        start = 0
+        for pid, body in snakes.items():
+            out += _PLAYER.pack(pid, bool(alive.get(pid)), scores.get(pid, 0), len(body))
+            end = start + 4 * len(body)
+            out += data[start:end]
+            start = end
+        self._pack_names(out, state.get("names", {}))
+
+    def _pack_delta(self, out, delta):
+        out += _U32.pack(delta["tick"])
+        heads = delta["heads"]
+        out += _U16.pack(len(heads))
+        bs = self.block_size
+        for pid, (x, y) in heads.items():
+            out += _HEAD.pack(pid, x // bs, y // bs)
+        for pids in (delta["tails"], delta["dead"]):
+            out += _U16.pack(len(pids))
+            for pid in pids:
+                out += _U32.pack(pid)
+        scores = delta["scores"]
+        out += _U16.pack(len(scores))
+        for pid, score in scores.items():
+            out += _SCORE.pack(pid, score)
+        out += _U8.pack("fruit" in delta)
+        if "fruit" in delta:
+            self._pack_fruits(out, self._fruit_list(delta))
+
+    def _pack_sync(self, out, state):
+        # GameState.sync_state(): gerador, cobras em índices de células,
+        # frutas e a ordem das células livres (uint32, cabem as arenas grandes)
+        version, internal, gauss = state["rng"]
+        out += _SYNC.pack(state["tick"], version, gauss is not None, gauss or 0.0, len(internal))
+        out += _u32_bytes(internal)
+        players = state["players"]
+        out += _U16.pack(len(players))
+        for pid, direction, alive, score, cells in players:
+            out += _SYNC_PLAYER.pack(pid, direction, alive, score, len(cells))
+            out += _u32_bytes(cells)
+        self._pack_fruits(out, state["fruits"])
+        out += _U32.pack(len(state["free_cells"]))
+        out += _u32_bytes(state["free_cells"])
+        out += _U16.pack(len(state["ai"]))
+        out += _u32_bytes(state["ai"])
+
+    @staticmethod
+    def _fruit_list(data):
+        # Aceita tanto o formato novo ("fruits") quanto só "fruit"
+        if "fruits" in data:
+            return data["fruits"]
+        return [data["fruit"]] if data.get("fruit") is not None else []
+
+    # ---------- Decodificação ----------
+
+    def decode(self, payload):
+        # Converte os bytes de um frame binário de volta em dicionário
+        view = memoryview(payload)
+        version, kind = _HEADER.unpack_from(view, 0)
+        if version not in SUPPORTED_VERSIONS:
+            raise CodecError(f"Versão de protocolo não suportada: {version}")
+        offset = _HEADER.size
+
+        if kind == MSG_LOBBY:
+            connected, maximum = _LOBBY.unpack_from(view, offset)
+            msg = {"type": "lobby", "connected": connected, "max": maximum}
+            offset += _LOBBY.size
+            if len(view) >= offset + _QUEUE.size:
+                msg["position"], msg["starts_in"] = _QUEUE.unpack_from(view, offset)
+            return msg
+
+        if kind == MSG_START:
+            (player_id,) = _U32.unpack_from(view, offset)
+            names, offset = self._unpack_names(view, offset + _U32.size)
+            msg = {"type": "start", "player_id": player_id, "players": names}
+            width, height = _LOBBY.unpack_from(view, offset)
+            offset += _LOBBY.size
+            if width and height:
+                msg["board"] = (width, height)
+                self.fit_board(width, height)
+            (has_state,) = _U8.unpack_from(view, offset)
+            if has_state:
+                msg["data"], offset = self._unpack_state(view, offset + _U8.size)
+            return msg
+
+        if kind == MSG_UPDATE:
+            (sent_at,) = _F64.unpack_from(view, offset)
+            state, offset = self._unpack_state(view, offset + _F64.size)
+            msg = self._unpack_acks(view, offset, {"type": "update", "data": state})
+            return self._with_sent_at(msg, sent_at)
+
+        if kind == MSG_VIEW:
+            (sent_at,) = _F64.unpack_from(view, offset)
+            rect = tuple(v * self.block_size for v in _VIEW.unpack_from(view, offset + _F64.size))
+            state, offset = self._unpack_state(view, offset + _F64.size + _VIEW.size)
+            state["view"] = rect
+            msg = self._unpack_acks(view, offset, {"type": "view", "data": state})
+            return self._with_sent_at(msg, sent_at)
+
+        if kind == MSG_LOCKSTEP:
+            seed, fruits, count = _LOCKSTEP.unpack_from(view, offset)
+            players = list(struct.unpack_from(f">{count}I", view, offset + _LOCKSTEP.size))
+            return {"type": "lockstep", "seed": seed, "fruits": fruits, "players": players}
+
+        if kind == MSG_TICK:
+            (sent_at,) = _F64.unpack_from(view, offset)
+            tick, has_hash, state_hash, count = _TICK.unpack_from(view, offset + _F64.size)
+            offset += _F64.size + _TICK.size
+            inputs = {}
+            for _ in range(count):
+                pid, code = _INPUT.unpack_from(view, offset)
+                offset += _INPUT.size
+                inputs[pid] = DIRECTION_NAMES[code]
+            msg = self._unpack_acks(view, offset, {"type": "tick", "tick": tick, "inputs": inputs})
+            if has_hash:
+                msg["hash"] = state_hash
+            return self._with_sent_at(msg, sent_at)
+
+        if kind == MSG_DELTA:
+            (sent_at,) = _F64.unpack_from(view, offset)
+            delta, offset = self._unpack_delta(view, offset + _F64.size)
+            msg = self._unpack_acks(view, offset, {"type": "delta", "data": delta})
+            return self._with_sent_at(msg, sent_at)
+
+        if kind == MSG_INPUT:
+            (code,) = _U8.unpack_from(view, offset)
+            offset += _U8.size
+            msg = {"type": "input", "direction": DIRECTION_NAMES[code]}
+            if len(view) >= offset + _SEQ.size:
+                msg["seq"], msg["tick"] = _SEQ.unpack_from(view, offset)
+            return msg
+
+        if kind == MSG_GAME_OVER:
+            (count,) = _U16.unpack_from(view, offset)
+            offset += _U16.size
+            scores = {}
+            for _ in range(count):
+                pid, score = _SCORE.unpack_from(view, offset)
+                offset += _SCORE.size
+                scores[pid] = score
+            return {"type": "game_over", "scores": scores}
+
+        if kind == MSG_START_GAME:
+            return {"type": "start_game"}
+
+        if kind == MSG_RESYNC:
+            return {"type": "resync"}
+
+        if kind == MSG_FULL:
+            return {"type": "full"}
+
+        if kind == MSG_HELLO:
+            (count,) = _U8.unpack_from(view, offset)
+            offset += _U8.size
+            versions = list(view[offset:offset + count])
+            offset += count
+            msg = {"type": "hello", "versions": versions}
+            if len(view) > offset:
+                msg["name"], offset = self._unpack_text(view, offset)
+            return msg
+
+        if kind == MSG_LEADERBOARD:
+            (count,) = _U8.unpack_from(view, offset)
+            offset += _U8.size
+            top = []
+            for _ in range(count):
+                wins, best, matches = _RANK.unpack_from(view, offset)
+                name, offset = self._unpack_text(view, offset + _RANK.size)
+                top.append([name, wins, best, matches])
+            return {"type": "leaderboard", "top": top}
+
+        if kind == MSG_UDP:
+            port, token, epoch = _UDP.unpack_from(view, offset)
+            return {"type": "udp", "port": port, "token": token, "epoch": epoch}
+
+        if kind == MSG_SYNC:
+            state, offset = self._unpack_sync(view, offset)
+            (count,) = _U16.unpack_from(view, offset)
+            offset += _U16.size
+            inputs = {}
+            for _ in range(count):
+                pid, code = _INPUT.unpack_from(view, offset)
+                offset += _INPUT.size
+                inputs[pid] = DIRECTION_NAMES[code]
+            return {"type": "sync", "state": state, "inputs": inputs}
+
+        raise CodecError(f"Tipo de mensagem desconhecido: {kind}")
+
+    @staticmethod
+    def _with_sent_at(msg, sent_at):
+        if sent_at:
+            msg["sent_at"] = sent_at
+        return msg
+
+    def _unpack_cell(self, view, offset):
+        x, y = _CELL.unpack_from(view, offset)
+        if x == NO_CELL and y == NO_CELL:
+            return None, offset + _CELL.size
+        return (x * self.block_size, y * self.block_size), offset + _CELL.size
+
+    def _unpack_fruits(self, view, offset):
+        (count,) = _U16.unpack_from(view, offset)
+        offset += _U16.size
+        fruits = []
+        for _ in range(count):
+            pos, offset = self._unpack_cell(view, offset)
+            fruits.append(pos)
+        return fruits, offset
+
+    @staticmethod
+    def _unpack_acks(view, offset, msg):
+        if len(view) > offset:
+            (count,) = _U16.unpack_from(view, offset)
+            offset += _U16.size
+            acks = {}
+            for _ in range(count):
+                pid, seq = _ACK.unpack_from(view, offset)
+                offset += _ACK.size
+                acks[pid] = seq
+            msg["acks"] = acks
+        return msg
+
+    @staticmethod
+    def _unpack_text(view, offset):
+        (size,) = _U8.unpack_from(view, offset)
+        offset += _U8.size
+        return bytes(view[offset:offset + size]).decode("utf-8", "replace"), offset + size
+
+    def _unpack_names(self, view, offset):
+        (count,) = _U16.unpack_from(view, offset)
+        offset += _U16.size
+        names = {}
+        for _ in range(count):
+            (pid,) = _U32.unpack_from(view, offset)
+            names[pid], offset = self._unpack_text(view, offset + _U32.size)
+        return names, offset
+
+    def _unpack_state(self, view, offset):
+        (tick,) = _U32.unpack_from(view, offset)
+        fruits, offset = self._unpack_fruits(view, offset + _U32.size)
+        (count,) = _U16.unpack_from(view, offset)
+        offset += _U16.size
+        # Junta os corpos num array só, converte tudo com um map() e fatia
+        cells = array("I")
+        lengths = []
+        alive, scores = {}, {}
+        for _ in range(count):
+            pid, is_alive, score, length = _PLAYER.unpack_from(view, offset)
+            offset += _PLAYER.size
+            if len(view) < offset + 4 * length:
+                raise CodecError("Corpo da cobra truncado")
+            cells.frombytes(view[offset:offset + 4 * length])
+            offset += 4 * length
+            lengths.append((pid, length))
+            alive[pid] = bool(is_alive)
+            scores[pid] = score
+        if _SWAP:
+            cells.byteswap()
+        positions = list(map(self.cell_positions.__getitem__, cells))
+        snakes = {}
+        start = 0
+        for pid, length in lengths:
+            snakes[pid] = positions[start:start + length]
+            start += length
+        names, offset = self._unpack_names(view, offset)
+        state = {
+            "snakes": snakes,
+            "fruit": fruits[0] if fruits else None,
+            "fruits": fruits,
+            "alive": alive,
+            "scores": scores,
+            "names": names,
+            "tick": tick,
+        }
+        return state, offset
+
+    def _unpack_sync(self, view, offset):
+        tick, version, has_gauss, gauss, size = _SYNC.unpack_from(view, offset)
+        internal, offset = _unpack_u32s(view, offset + _SYNC.size, size)
+        (count,) = _U16.unpack_from(view, offset)
+        offset += _U16.size
+        players = []
+        for _ in range(count):
+            pid, direction, alive, score, length = _SYNC_PLAYER.unpack_from(view, offset)
+            cells, offset = _unpack_u32s(view, offset + _SYNC_PLAYER.size, length)
+            players.append((pid, direction, bool(alive), score, cells))
+        fruits, offset = self._unpack_fruits(view, offset)
+        (count,) = _U32.unpack_from(view, offset)
+        free_cells, offset = _unpack_u32s(view, offset + _U32.size, count)
+        (count,) = _U16.unpack_from(view, offset)
+        ai, offset = _unpack_u32s(view, offset + _U16.size, count)
+        state = {
+            "tick": tick,
+            "rng": (version, tuple(internal), gauss if has_gauss else None),
+            "players": players,
+            "fruits": fruits,
+            "free_cells": free_cells,
+            "ai": ai,
+        }
+        return state, offset
+
+    def _unpack_delta(self, view, offset):
+        (tick,) = _U32.unpack_from(view, offset)
+        offset += _U32.size
+        bs = self.block_size
+        (count,) = _U16.unpack_from(view, offset)
+        offset += _U16.size
+        heads = {}
+        for _ in range(count):
+            pid, x, y = _HEAD.unpack_from(view, offset)
+            offset += _HEAD.size
+            heads[pid] = (x * bs, y * bs)
+        lists = []
+        for _ in range(2):
+            (count,) = _U16.unpack_from(view, offset)
+            offset += _U16.size
+            lists.append(list(struct.unpack_from(f">{count}I", view, offset)))
+            offset += 4 * count
+        (count,) = _U16.unpack_from(view, offset)
+        offset += _U16.size
+        scores = {}
+        for _ in range(count):
+            pid, score = _SCORE.unpack_from(view, offset)
+            offset += _SCORE.size
+            scores[pid] = score
+        delta = {"tick": tick, "heads": heads, "tails": lists[0], "dead": lists[1], "scores": scores}
+        (has_fruit,) = _U8.unpack_from(view, offset)
+        offset += _U8.size
+        if has_fruit:
+            fruits, offset = self._unpack_fruits(view, offset)
+            delta["fruit"] = fruits[0] if fruits else None
+            delta["fruits"] = fruits
+        return delta, offset
+
+
+# Codec padrão compartilhado por servidor e cliente
+DEFAULT_CODEC = Codec()
+
+
+def encode(msg, version=None):
+    # version=None → pickle (só para quem não negociou o binário). Quem
+    # negociou nunca recebe pickle: mensagem sem codificação binária ou com
+    # campo fora da faixa é erro do codec e levanta CodecError
+    if version is None:
+        return pickle.dumps(msg)
+    try:
+        return DEFAULT_CODEC.encode(msg)
+    except (KeyError, struct.error) as exc:
+        raise CodecError(f"Mensagem {msg.get('type')!r} sem codificação binária: {exc!r}") from exc
+
+
+def encode_variants(msg):
+    # Codifica a mesma mensagem em todos os formatos ({versão: bytes}), para
+    # quem precisa repassar os bytes a clientes que negociaram formatos diferentes
+    variants = {None: pickle.dumps(msg)}
+    for version in SUPPORTED_VERSIONS:
+        variants[version] = encode(msg, version)
+    return variants
+
+
+def decode(payload, allow_pickle=True):
+    # Detecta o formato pelo primeiro byte do payload
+    if payload[0] == PICKLE_MARKER:
+        if not allow_pickle:
+            raise CodecError("Payload pickle recusado")
+        return pickle.loads(payload)
+    return DEFAULT_CODEC.decode(payload)
+
+
+def negotiate(versions):
+    # Escolhe a maior versão binária suportada pelos dois lados (ou None)
+    common = set(versions or ()) & set(SUPPORTED_VERSIONS)
+    return max(common) if common else None
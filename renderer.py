@@ -0,0 +1,203 @@
+# Renderização incremental do tabuleiro (dirty rectangles).
+#
+# Em vez de limpar a janela e redesenhar todas as cobras a cada quadro, o
+# renderer lembra a cor pintada em cada célula do tabuleiro. Quando chega um
+# estado novo ele monta o mapa de cores desejado, repinta só as células que
+# mudaram (cabeças novas, caudas removidas, frutas, cobras que morreram e
+# mudaram de cor) e envia só essas regiões com pygame.display.update(rects).
+# Se o estado não mudou desde o último quadro, nada é desenhado.
+#
+# Textos renderizados (HUD, lobby, placar) ficam em cache até mudarem.
+# SmoothRenderer acrescenta o modo suave (ver interpolation.py): cabeças e
+# caudas em movimento são desenhadas como blocos fora da grade.
+#
+# Com área de interesse (estado com "view"), a tela mostra só a janela do
+# jogador: tudo é desenhado relativo ao canto da janela (a câmera). Quando a
+# câmera anda, o quadro é redesenhado inteiro, mas ele tem o tamanho da
+# janela, não do mundo.
+import pygame
+from settings import BLOCK_SIZE, BLACK
+from interpolation import STEPS
+
+FRUIT_COLOR = (255, 105, 180)   # Rosa choque 💖
+DEAD_COLOR = (80, 80, 80)
+UNKNOWN_COLOR = (150, 150, 150)
+HUD_POSITION = (10, 10)
+MAX_CACHED_TEXTS = 256          # Limite simples para o cache não crescer sem fim
+
+
+class TextCache:
+    # Guarda as superfícies de texto já renderizadas por (texto, cor)
+    def __init__(self, font):
+        self.font = font
+        self.surfaces = {}
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if len(self.surfaces) >= MAX_CACHED_TEXTS:
+                self.surfaces.clear()
+            surface = self.surfaces[key] = self.font.render(text, True, color)
+        return surface
+
+
+class BoardRenderer:
+    def __init__(self, screen, font, colors=None):
+        self.screen = screen
+        self.text = TextCache(font)
+        self.colors = colors if colors is not None else {}  # { pid: cor }
+        self.cells = {}          # { (x, y): cor } do que está na tela agora
+        self.hud = None          # Superfície do HUD desenhada por último
+        self.sprites = []        # Blocos fora da grade desenhados por último
+        self.drawn_key = None    # Identifica o estado desenhado por último
+        self.camera = (0, 0)     # Canto da janela visível, em pixels do mundo
+        self.full = True         # Próximo quadro redesenha a tela inteira
+
+    def invalidate(self, screen=None):
+        # Força um redesenho completo (troca de tela, janela redimensionada...)
+        if screen is not None:
+            self.screen = screen
+        self.full = True
+
+    def cell_colors(self, state):
+        # Mapa de cores desejado, na mesma ordem de pintura do draw_game antigo:
+        # frutas primeiro, cobras por cima (a última cobra ganha na sobreposição)
+        wanted = {}
+        for fruit in state.get("fruits", [state["fruit"]] if state["fruit"] else []):
+            wanted[fruit] = FRUIT_COLOR
+        alive = state["alive"]
+        for pid, body in state["snakes"].items():
+            color = self.colors.get(pid, UNKNOWN_COLOR) if alive.get(pid, False) else DEAD_COLOR
+            for segment in body:
+                wanted[segment] = color
+        return wanted
+
+    def cells_under(self, rect):
+        # Células do tabuleiro cobertas (mesmo que parcialmente) por um retângulo
+        first_x = rect.left // BLOCK_SIZE * BLOCK_SIZE
+        first_y = rect.top // BLOCK_SIZE * BLOCK_SIZE
+        return [
+            (x, y)
+            for y in range(first_y, rect.bottom, BLOCK_SIZE)
+            for x in range(first_x, rect.right, BLOCK_SIZE)
+        ]
+
+    def draw(self, state, hud_text, hud_color, sprites=()):
+        # Desenha o estado e devolve os retângulos enviados à tela. sprites são
+        # blocos fora da grade [(x, y, cor)] desenhados por cima (modo suave).
+        hud = self.text.render(hud_text, hud_color)
+        key = (id(state), state.get("tick"))
+        camera = tuple(state["view"][:2]) if "view" in state else (0, 0)
+        if camera != self.camera:
+            self.camera = camera
+            self.full = True  # A câmera andou: a tela inteira se desloca
+        cam_x, cam_y = camera
+        sprites = [(round(x) - cam_x, round(y) - cam_y, color) for x, y, color in sprites]
+        if (not self.full and key == self.drawn_key and hud is self.hud
+                and sprites == self.sprites):
+            return []
+
+        screen = self.screen
+        if key != self.drawn_key or self.full:
+            wanted = self.cell_colors(state)
+            if camera != (0, 0):
+                wanted = {(x - cam_x, y - cam_y): color for (x, y), color in wanted.items()}
+        else:
+            wanted = self.cells
+        hud_rect = hud.get_rect(topleft=HUD_POSITION)
+
+        if self.full:
+            screen.fill(BLACK)
+            for pos, color in wanted.items():
+                screen.fill(color, (*pos, BLOCK_SIZE, BLOCK_SIZE))
+            for x, y, color in sprites:
+                screen.fill(color, (x, y, BLOCK_SIZE, BLOCK_SIZE))
+            screen.blit(hud, hud_rect)
+            dirty = [screen.get_rect()]
+        else:
+            old = self.cells
+            changed = {pos for pos, color in wanted.items() if old.get(pos) != color}
+            changed.update(pos for pos in old if pos not in wanted)
+
+            # Onde havia ou passa a haver um sprite, as células são repintadas
+            for x, y, _ in self.sprites + sprites:
+                changed.update(self.cells_under(pygame.Rect(x, y, BLOCK_SIZE, BLOCK_SIZE)))
+
+            # O HUD fica por cima do tabuleiro: se ele mudou ou alguma célula
+            # embaixo dele foi repintada, repinta a área toda e o HUD de novo
+            old_hud_rect = self.hud.get_rect(topleft=HUD_POSITION)
+            hud_area = hud_rect.union(old_hud_rect)
+            hud_cells = self.cells_under(hud_area)
+            redraw_hud = hud is not self.hud or any(pos in changed for pos in hud_cells)
+            if redraw_hud:
+                changed.update(hud_cells)
+
+            dirty = []
+            for pos in changed:
+                rect = pygame.Rect(*pos, BLOCK_SIZE, BLOCK_SIZE)
+                screen.fill(wanted.get(pos, BLACK), rect)
+                dirty.append(rect)
+            for x, y, color in sprites:
+                screen.fill(color, (x, y, BLOCK_SIZE, BLOCK_SIZE))
+            if redraw_hud:
+                screen.blit(hud, hud_rect)
+
+        self.cells = wanted
+        self.hud = hud
+        self.sprites = sprites
+        self.drawn_key = key
+        self.full = False
+        if dirty:
+            pygame.display.update(dirty)
+        return dirty
+
+
+def lerp(start, end, alpha):
+    return (start[0] + (end[0] - start[0]) * alpha, start[1] + (end[1] - start[1]) * alpha)
+
+
+class SmoothRenderer(BoardRenderer):
+    # Modo suave: as outras cobras são interpoladas entre os dois últimos
+    # ticks (mostradas um tick atrás) e a cobra local é extrapolada na
+    # direção prevista, para a curva aparecer assim que a tecla é apertada.
+    def __init__(self, screen, font, colors=None):
+        super().__init__(screen, font, colors)
+        self.moving = set()  # pids cuja cabeça é desenhada como sprite
+
+    def cell_colors(self, state):
+        wanted = super().cell_colors(state)
+        # A cabeça das cobras interpoladas ainda está a caminho da célula nova
+        for pid in self.moving:
+            body = state["snakes"][pid]
+            head = body[0]
+            if wanted.get(head) == self.colors.get(pid, UNKNOWN_COLOR) and head not in body[1:]:
+                del wanted[head]
+        return wanted
+
+    def draw_frame(self, previous, current, alpha, local_id, local_direction,
+                   hud_text, hud_color):
+        state = current.state
+        old_snakes = previous.state["snakes"] if previous else None
+        sprites = []
+        moving = set()
+        for pid, body in state["snakes"].items():
+            if not body or not state["alive"].get(pid, False):
+                continue
+            color = self.colors.get(pid, UNKNOWN_COLOR)
+            if pid == local_id:
+                if local_direction:
+                    dx, dy = STEPS[local_direction]
+                    x, y = body[0]
+                    sprites.append((x + dx * BLOCK_SIZE * alpha, y + dy * BLOCK_SIZE * alpha, color))
+            elif old_snakes is not None and len(body) > 1:
+                moving.add(pid)
+                sprites.append((*lerp(body[1], body[0], alpha), color))
+                # Sem crescer, a cauda antiga desliza até a cauda atual
+                old = old_snakes.get(pid)
+                if old and len(old) == len(body):
+                    sprites.append((*lerp(old[-1], body[-1], alpha), color))
+        if moving != self.moving:
+            self.moving = moving
+            self.drawn_key = None  # O mapa de células depende de quem está se movendo
+        return self.draw(state, hud_text, hud_color, sprites)
@@ -0,0 +1,266 @@
+# Gravação e reprodução de partidas.
+#
+# Com --record DIR o servidor grava cada partida num log binário compacto:
+# seed, tamanho do tabuleiro, lista de jogadores e, para cada tick em que
+# algum input mudou, só as mudanças (mesma ideia do lockstep.py). No fim vão
+# o último tick, as pontuações e o resumo do estado. A escrita no arquivo
+# acontece numa thread própria; o tick só empacota alguns bytes e enfileira.
+#
+# A reprodução refaz a partida pelo GameState, sem interface e o mais rápido
+# possível, e confere se o resultado bate com o gravado:
+#     python replay.py partidas/20250101-120000-1a2b3c4d.snkr
+#     python replay.py LOG --seek 300    # Estado no tick 300
+# Com snapshot_every, a Replay guarda cópias do GameState durante a
+# reprodução para voltar a qualquer tick sem refazer tudo desde o início.
+# Os logs também servem de carga realista para benchmarks/bench_replay.py.
+import argparse
+import os
+import pickle
+import queue
+import struct
+import sys
+import threading
+import time
+from game_state import GameState
+from lockstep import changed_inputs
+from protocol import DIRECTION_CODES, DIRECTION_NAMES
+
+MAGIC = b"SNKR"
+VERSION = 1
+END = 0xFFFFFFFF  # "Tick" que marca o registro final
+
+_HEADER = struct.Struct(">4sBIHHHH")  # magic, versão, seed, largura, altura, frutas, jogadores
+_PLAYER = struct.Struct(">IB")        # pid, tamanho do nome (nome em UTF-8 em seguida)
+_TICK = struct.Struct(">IH")          # tick, número de inputs
+_INPUT = struct.Struct(">IB")         # pid, direção
+_END = struct.Struct(">IIIH")         # END, último tick, resumo do estado, número de pontuações
+_SCORE = struct.Struct(">Ii")         # pid, pontuação
+
+
+class ReplayError(ValueError):
+    pass
+
+
+# ---------- Gravação ----------
+
+class Recorder:
+    # Grava uma partida. tick() e finish() rodam na thread do tick e só
+    # enfileiram bytes; uma thread daemon escreve no arquivo.
+    def __init__(self, path, game, seed):
+        self.path = path
+        self.sent = {}  # Inputs acumulados já gravados
+        self.queue = queue.SimpleQueue()
+        header = bytearray(_HEADER.pack(MAGIC, VERSION, seed, game.width, game.height,
+                                        game.fruit_count, len(game.players)))
+        for pid in game.players:
+            name = game.names.get(pid, "").encode("utf-8")[:255]
+            header += _PLAYER.pack(pid, len(name))
+            header += name
+        self.queue.put(bytes(header))
+        self.file = open(path, "wb")
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @classmethod
+    def start(cls, directory, game, seed, prefix=""):
+        # Cria o arquivo da partida em directory (nome com data e seed)
+        os.makedirs(directory, exist_ok=True)
+        name = f"{prefix}{time.strftime('%Y%m%d-%H%M%S')}-{seed:08x}.snkr"
+        return cls(os.path.join(directory, name), game, seed)
+
+    def tick(self, tick, applied):
+        # applied: os inputs aplicados antes do update() deste tick
+        changed = changed_inputs(self.sent, applied)
+        if changed:
+            out = bytearray(_TICK.pack(tick, len(changed)))
+            for pid, direction in changed.items():
+                out += _INPUT.pack(pid, DIRECTION_CODES[direction])
+            self.queue.put(bytes(out))
+
+    def finish(self, game):
+        out = bytearray(_END.pack(END, game.tick, game.state_hash(), len(game.scores)))
+        for pid, score in game.scores.items():
+            out += _SCORE.pack(pid, score)
+        self.queue.put(bytes(out))
+        self.queue.put(None)
+
+    def _run(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                self.file.close()
+                return
+            self.file.write(chunk)
+            if self.queue.empty():
+                self.file.flush()  # Se o servidor cair, o log vai até aqui
+
+
+# ---------- Leitura ----------
+
+class ReplayLog:
+    # Conteúdo de um log: configuração da partida, inputs e resultado.
+    # Um log sem registro final (servidor caiu) é lido até onde foi gravado.
+    def __init__(self, seed, width, height, fruit_count, names, ticks, final=None):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.fruit_count = fruit_count
+        self.names = names        # { pid: nome }, na ordem dos jogadores
+        self.ticks = ticks        # [(tick, { pid: direção })] só com mudanças
+        self.final = final        # (último tick, resumo, { pid: pontuação }) ou None
+
+    @property
+    def last_tick(self):
+        if self.final:
+            return self.final[0]
+        return self.ticks[-1][0] if self.ticks else 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.parse(f.read())
+
+    @classmethod
+    def parse(cls, data):
+        view = memoryview(data)
+        try:
+            magic, version, seed, width, height, fruits, count = _HEADER.unpack_from(view, 0)
+            if magic != MAGIC:
+                raise ReplayError("Arquivo não é um log de partida")
+            if version != VERSION:
+                raise ReplayError(f"Versão de log não suportada: {version}")
+            offset = _HEADER.size
+            names = {}
+            for _ in range(count):
+                pid, size = _PLAYER.unpack_from(view, offset)
+                offset += _PLAYER.size
+                names[pid] = bytes(view[offset:offset + size]).decode("utf-8")
+                offset += size
+        except struct.error as exc:
+            raise ReplayError(f"Cabeçalho incompleto: {exc}") from exc
+
+        ticks = []
+        final = None
+        try:
+            while offset < len(view):
+                (tick,) = struct.unpack_from(">I", view, offset)
+                if tick == END:
+                    _, last, state_hash, count = _END.unpack_from(view, offset)
+                    offset += _END.size
+                    scores = {}
+                    for _ in range(count):
+                        pid, score = _SCORE.unpack_from(view, offset)
+                        offset += _SCORE.size
+                        scores[pid] = score
+                    final = (last, state_hash, scores)
+                    break
+                tick, count = _TICK.unpack_from(view, offset)
+                offset += _TICK.size
+                inputs = {}
+                for _ in range(count):
+                    pid, code = _INPUT.unpack_from(view, offset)
+                    offset += _INPUT.size
+                    inputs[pid] = DIRECTION_NAMES[code]
+                ticks.append((tick, inputs))
+        except struct.error:
+            pass  # Registro cortado no meio: fica o que foi lido inteiro
+        return cls(seed, width, height, fruits, names, ticks, final)
+
+
+# ---------- Reprodução ----------
+
+class Replay:
+    def __init__(self, log, snapshot_every=0):
+        self.log = log
+        self.snapshot_every = snapshot_every
+        self.snapshots = {}  # { tick: GameState e inputs em pickle }
+        self.reset()
+
+    def reset(self):
+        log = self.log
+        self.game = GameState(
+            {pid: None for pid in log.names}, log.names, seed=log.seed,
+            fruit_count=log.fruit_count, width=log.width, height=log.height
+        )
+        self.inputs = {}
+        self.next = 0  # Índice do próximo registro de inputs em log.ticks
+
+    def step(self):
+        # Avança um tick, como o run_tick do servidor
+        game = self.game
+        ticks = self.log.ticks
+        if self.next < len(ticks) and ticks[self.next][0] == game.tick + 1:
+            self.inputs.update(ticks[self.next][1])
+            self.next += 1
+        for pid, direction in self.inputs.items():
+            game.set_input(pid, direction)
+        game.update()
+        if self.snapshot_every and game.tick % self.snapshot_every == 0:
+            self.snapshots[game.tick] = pickle.dumps((game, self.inputs, self.next))
+
+    def done(self):
+        return self.game.tick >= self.log.last_tick or self.game.is_game_over()
+
+    def run(self):
+        while not self.done():
+            self.step()
+        return self.game
+
+    def seek(self, tick):
+        # Vai para o tick pedido, partindo do snapshot mais próximo antes dele
+        start = max((t for t in self.snapshots if t <= tick), default=None)
+        if start is not None and (start > self.game.tick or tick < self.game.tick):
+            self.game, self.inputs, self.next = pickle.loads(self.snapshots[start])
+            self.inputs = dict(self.inputs)
+        elif tick < self.game.tick:
+            self.reset()
+        while self.game.tick < tick and not self.done():
+            self.step()
+        return self.game
+
+    def verify(self):
+        # Compara o fim da reprodução com o gravado; devolve as diferenças
+        final = self.log.final
+        if final is None:
+            return ["log sem registro final (partida interrompida)"]
+        last, state_hash, scores = final
+        game = self.game
+        problems = []
+        if game.tick != last:
+            problems.append(f"terminou no tick {game.tick}, gravado {last}")
+        if game.scores != scores:
+            problems.append(f"pontuações {game.scores}, gravadas {scores}")
+        if game.state_hash() != state_hash:
+            problems.append("resumo do estado final diferente")
+        return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduz partidas gravadas com --record")
+    parser.add_argument("logs", nargs="+", help="Arquivos .snkr")
+    parser.add_argument("--seek", type=int, default=None,
+                        help="Mostra o estado neste tick (depois de reproduzir tudo)")
+    parser.add_argument("--snapshot-every", type=int, default=100,
+                        help="Ticks entre snapshots usados pelo --seek (0 = sem)")
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.logs:
+        log = ReplayLog.load(path)
+        replay = Replay(log, args.snapshot_every)
+        started = time.perf_counter()
+        game = replay.run()
+        elapsed = time.perf_counter() - started
+        problems = replay.verify()
+        failed = failed or bool(problems and log.final)
+        print(f"{path}: {len(log.names)} jogadores, {game.tick} ticks em {elapsed:.3f}s "
+              f"({game.tick / elapsed if elapsed else 0:.0f} ticks/s), "
+              + ("ok" if not problems else "; ".join(problems)))
+        if args.seek is not None:
+            game = replay.seek(args.seek)
+            print(f"  tick {game.tick}: pontuações {game.scores}, "
+                  f"vivos {[pid for pid, alive in game.alive.items() if alive]}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+# Servidor com várias salas (partidas simultâneas) distribuídas entre processos.
+#
+# O front end (asyncio, reaproveitando o AsyncServer) aceita as conexões e
+# mantém a fila de partidas (ver matchmaking.py). Sempre que a fila pode
+# começar uma partida (botão, fila cheia ou prazo), os primeiros da fila
+# formam uma sala nova, que é criada no processo worker com menos salas.
+# Cada worker roda o loop de ticks de todas as suas salas, cada uma com seu
+# próprio GameState, e já devolve as mensagens codificadas em bytes, de
+# modo que simulação e serialização usam todos os núcleos da máquina.
+#
+# Uso: python rooms.py [--workers N]
+import asyncio
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from async_server import AsyncServer
+from game_state import GameState
+import server
+from scheduler import TickScheduler
+from lockstep import LockstepHost
+from replay import Recorder
+from ai import AIController, roster
+from input_buffer import InputBuffer
+import protocol
+import metrics
+
+STATS_INTERVAL = 5.0  # Segundos entre relatórios de estatísticas dos workers
+
+
+# ---------- Lado do worker (processo separado) ----------
+
+class Room:
+    def __init__(self, room_id, player_names, config):
+        self.room_id = room_id
+        self.names = dict(player_names)  # Só as pessoas (quem recebe mensagens)
+        self.keyframe_interval = config["keyframe_interval"]
+        self.view = (config["view_cols"], config["view_rows"])  # (0, 0) = tabuleiro inteiro
+        self.seed = seed = random.getrandbits(32)
+        self.lockstep = LockstepHost(seed) if config["lockstep"] else None
+        if self.lockstep:
+            self.view = (0, 0)  # Cada cliente simula o mundo inteiro
+        bots = roster(config["ai_players"])
+        self.all_names = {**self.names, **bots}
+        self.game = GameState(
+            dict.fromkeys(self.all_names), self.all_names,
+            width=config["width"], height=config["height"], seed=seed, ai_players=bots
+        )
+        self.ai = AIController(bots, config["ai_budget_ms"] / 1000) if bots else None
+        self.recorder = None
+        if config["record_dir"]:
+            self.recorder = Recorder.start(config["record_dir"], self.game, seed,
+                                           prefix=f"sala{room_id}-")
+        self.input_buffer = InputBuffer()  # Curvas numeradas das pessoas da sala
+        self.resync_requests = set()
+        self.final_scores = None  # Placar ajustado, quando a partida acaba
+        self.scheduler = TickScheduler(config["tick_rate"], config["tick_policy"])
+        self.scheduler.start(delay=0.5)  # Mesma pausa inicial do server.py
+        self.ticks = 0
+        self.tick_time_total = 0.0
+        self.tick_time_max = 0.0
+
+    def start_messages(self):
+        state = None if all(self.view) or self.lockstep else self.game.get_state()
+        for pid in self.names:
+            yield pid, {
+                "type": "start",
+                "player_id": pid,
+                "players": self.all_names,
+                "board": (self.game.width, self.game.height),
+                "data": state
+            }
+        if all(self.view):
+            yield from self.view_messages()
+        if self.lockstep:
+            yield None, self.lockstep.start_message(self.game)
+
+    def view_messages(self, acks=None):
+        # Área de interesse: cada jogador recebe só a janela em volta da cabeça
+        # (e o ack dos próprios inputs)
+        sent_at = time.time()
+        for pid in self.names:
+            rect = self.game.view_rect(pid, *self.view)
+            msg = {"type": "view", "data": self.game.get_view(pid, rect), "sent_at": sent_at}
+            if acks and pid in acks:
+                msg["acks"] = {pid: acks[pid]}
+            yield pid, msg
+
+    def step(self):
+        # Executa um tick e devolve as mensagens [(pid ou None, msg)]
+        started = time.perf_counter()
+        game = self.game
+        applied = self.input_buffer.take(game)  # No máximo uma curva por jogador
+        if self.ai:
+            # As decisões da IA viram inputs comuns (ver server.run_tick)
+            applied.update(self.ai.decide(game))
+        for pid, direction in applied.items():
+            game.set_input(pid, direction)
+        game.update()
+        if self.recorder:
+            self.recorder.tick(game.tick, applied)
+        acks = self.input_buffer.take_acks()  # Seqs processadas neste tick
+
+        messages = []
+        if self.lockstep:
+            msg = self.lockstep.tick_message(game, applied)
+            msg["acks"] = acks
+            messages.append((None, msg))
+            for pid in self.resync_requests:
+                messages.append((pid, self.lockstep.sync_message(game)))
+            self.resync_requests.clear()
+        elif all(self.view):
+            self.resync_requests.clear()
+            messages.extend(self.view_messages(self.input_buffer.acks()))
+        elif game.tick % self.keyframe_interval == 0:
+            self.resync_requests.clear()
+            messages.append((None, {
+                "type": "update", "data": game.get_state(), "sent_at": time.time(),
+                "acks": self.input_buffer.acks()
+            }))
+        else:
+            messages.append((None, {
+                "type": "delta", "data": game.get_delta(), "sent_at": time.time(), "acks": acks
+            }))
+            for pid in self.resync_requests:
+                messages.append((pid, {"type": "update", "data": game.get_state(),
+                                       "acks": self.input_buffer.acks()}))
+            self.resync_requests.clear()
+
+        if game.is_game_over():
+            if self.recorder:
+                self.recorder.finish(game)
+            scores = {pid: score - 3 for pid, score in game.scores.items()}
+            self.final_scores = scores
+            messages.append((None, {"type": "game_over", "scores": scores}))
+
+        elapsed = time.perf_counter() - started
+        self.ticks += 1
+        self.tick_time_total += elapsed
+        self.tick_time_max = max(self.tick_time_max, elapsed)
+        return messages
+
+    def result(self):
+        # O que o front end guarda da partida (ver storage.py)
+        return {"scores": self.final_scores, "names": self.all_names,
+                "ticks": self.game.tick, "seed": self.seed}
+
+    def stats(self):
+        stats = self.scheduler.stats.as_dict()
+        stats.update({
+            "ticks": self.ticks,
+            "avg_tick_ms": self.tick_time_total / self.ticks * 1000 if self.ticks else 0.0,
+            "max_tick_ms": self.tick_time_max * 1000,
+        })
+        return stats
+
+
+def room_worker(worker_id, commands, events, config):
+    # Loop principal de um processo worker: recebe comandos e roda os ticks
+    rooms = {}
+    next_stats = time.monotonic() + STATS_INTERVAL
+
+    def emit(room_id, pid, msg):
+        events.put(("send", room_id, pid, protocol.encode_variants(msg)))
+
+    while True:
+        now = time.monotonic()
+        deadline = min((room.scheduler.deadline for room in rooms.values()), default=now + 0.5)
+        pending = []
+        try:
+            pending.append(commands.get(timeout=max(0.0, deadline - now)))
+            while True:
+                pending.append(commands.get_nowait())
+        except queue.Empty:
+            pass
+
+        for cmd in pending:
+            kind, room_id = cmd[0], cmd[1]
+            if kind == "stop":
+                return
+            if kind == "create":
+                room = rooms[room_id] = Room(room_id, cmd[2], config)
+                for pid, msg in room.start_messages():
+                    emit(room_id, pid, msg)
+                continue
+            room = rooms.get(room_id)
+            if room is None:
+                continue
+            if kind == "input":
+                room.input_buffer.push(*cmd[2:])
+            elif kind == "resync":
+                room.resync_requests.add(cmd[2])
+            elif kind == "leave":
+                room.input_buffer.remove(cmd[2])
+
+        for room_id, room in list(rooms.items()):
+            ran = 0
+            for _ in range(room.scheduler.poll()):
+                for pid, msg in room.step():
+                    emit(room_id, pid, msg)
+                ran += 1
+                if room.game.is_game_over():
+                    break
+            room.scheduler.done(ran)
+            if room.game.is_game_over():
+                events.put(("ended", room_id, room.stats(), room.result()))
+                del rooms[room_id]
+
+        now = time.monotonic()
+        if now >= next_stats:
+            next_stats = now + STATS_INTERVAL
+            events.put(("stats", worker_id, {
+                room_id: room.stats() for room_id, room in rooms.items()
+            }))
+
+
+# ---------- Lado do front end ----------
+
+class RoomManager:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.events = multiprocessing.Queue()
+        self.commands = []
+        self.processes = []
+        self.room_worker = {}      # { room_id: índice do worker }
+        self.worker_stats = {}     # { worker: { room_id: stats } }
+        self.next_room_id = 0
+
+    def start(self):
+        # Os workers recebem a configuração explicitamente (no Windows eles
+        # são processos novos e não herdam o que a linha de comando mudou)
+        config = {
+            "width": server.BOARD_WIDTH,
+            "height": server.BOARD_HEIGHT,
+            "tick_rate": server.TICK_RATE,
+            "tick_policy": server.TICK_POLICY,
+            "keyframe_interval": server.KEYFRAME_INTERVAL,
+            "view_cols": server.VIEW_COLS,
+            "view_rows": server.VIEW_ROWS,
+            "lockstep": server.LOCKSTEP,
+            "record_dir": server.RECORD_DIR,
+            "ai_players": server.AI_PLAYERS,
+            "ai_budget_ms": server.AI_BUDGET_MS,
+        }
+        for worker_id in range(self.workers):
+            commands = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=room_worker, args=(worker_id, commands, self.events, config),
+                daemon=True
+            )
+            process.start()
+            self.commands.append(commands)
+            self.processes.append(process)
+
+    def stop(self):
+        for commands in self.commands:
+            commands.put(("stop", None))
+
+    def create_room(self, player_names):
+        # Coloca a sala no worker com menos salas ativas
+        room_id = self.next_room_id
+        self.next_room_id += 1
+        load = [0] * self.workers
+        for worker in self.room_worker.values():
+            load[worker] += 1
+        worker = load.index(min(load))
+        self.room_worker[room_id] = worker
+        self.commands[worker].put(("create", room_id, player_names))
+        return room_id
+
+    def send(self, room_id, *cmd):
+        worker = self.room_worker.get(room_id)
+        if worker is not None:
+            self.commands[worker].put((cmd[0], room_id) + cmd[1:])
+
+    def room_ended(self, room_id):
+        self.room_worker.pop(room_id, None)
+        for rooms in self.worker_stats.values():
+            rooms.pop(room_id, None)
+
+    def stats(self):
+        # Salas por processo e tempo de tick por sala (para dimensionar hosts)
+        rooms_per_worker = [0] * self.workers
+        for worker in self.room_worker.values():
+            rooms_per_worker[worker] += 1
+        return {
+            "rooms_per_process": rooms_per_worker,
+            "tick_ms_per_room": {
+                room_id: stats
+                for rooms in self.worker_stats.values()
+                for room_id, stats in rooms.items()
+            },
+        }
+
+
+class RoomServer(AsyncServer):
+    def __init__(self, host=None, port=None, max_players=None, workers=None):
+        super().__init__(host, port, max_players)
+        self.manager = RoomManager(workers)
+        self.room_of = {}        # { pid: room_id }
+        self.room_members = {}   # { room_id: [pids] }
+        self.room_ranked = {}    # { room_id: [pids com apelido] } (entram no ranking)
+
+    async def matchmaking_loop(self):
+        # Uma sala nova a cada partida que a fila formar; as salas anteriores
+        # continuam rodando nos workers
+        while True:
+            self.start_room(await self.wait_for_match())
+
+    def on_disconnect(self, pid):
+        room_id = self.room_of.pop(pid, None)
+        if room_id is not None:
+            self.manager.send(room_id, "leave", pid)
+
+    def on_message(self, conn, data):
+        pid = conn.pid
+        kind = data.get("type")
+        room_id = self.room_of.get(pid)
+        if kind == "hello":
+            super().on_message(conn, data)
+        elif kind == "start_game" and pid in self.lobby:
+            self.lobby.request_start()
+            self.lobby_update()
+        elif kind == "input":
+            self.queue_input(pid, data.get("direction"), data.get("seq"), data.get("tick", 0))
+        elif kind == "resync" and room_id is not None:
+            self.manager.send(room_id, "resync", pid)
+
+    def queue_input(self, pid, direction, seq=None, tick=0):
+        # A fila de inputs fica com a sala, no worker
+        room_id = self.room_of.get(pid)
+        if room_id is not None:
+            self.manager.send(room_id, "input", pid, direction, seq, tick)
+            metrics.INPUTS.inc()
+
+    def start_room(self, playing):
+        names = server.match_names(playing, self.nicknames)
+        room_id = self.manager.create_room(names)
+        self.room_members[room_id] = playing
+        self.room_ranked[room_id] = [pid for pid in playing if pid in self.nicknames]
+        for pid in playing:
+            self.room_of[pid] = room_id
+        print(f"[*] Sala {room_id} criada com {len(playing)} jogadores")
+
+    def dispatch(self, event):
+        # Roda no event loop: entrega bytes vindos dos workers aos clientes
+        kind = event[0]
+        if kind == "send":
+            _, room_id, target, payloads = event
+            pids = self.room_members.get(room_id, ()) if target is None else (target,)
+            for pid in pids:
+                conn = self.clients.get(pid)
+                if conn:
+                    conn.send_payload(payloads.get(conn.version, payloads[None]))
+        elif kind == "ended":
+            _, room_id, stats, result = event
+            self.record_result(result["scores"], result["names"],
+                               self.room_ranked.pop(room_id, ()), result["ticks"], result["seed"])
+            members = self.room_members.pop(room_id, ())
+            for pid in members:
+                self.room_of.pop(pid, None)
+            self.requeue(members)
+            self.manager.room_ended(room_id)
+            print(f"[*] Sala {room_id} encerrada ({stats['ticks']} ticks, "
+                  f"média {stats['avg_tick_ms']:.2f} ms/tick)")
+        elif kind == "stats":
+            _, worker_id, rooms = event
+            self.manager.worker_stats[worker_id] = rooms
+            stats = self.manager.stats()
+            print(f"[stats] salas por processo: {stats['rooms_per_process']}")
+            for room_id, room in sorted(stats["tick_ms_per_room"].items()):
+                print(f"[stats]   sala {room_id}: média {room['avg_tick_ms']:.2f} ms, "
+                      f"máx {room['max_tick_ms']:.2f} ms ({room['ticks']} ticks, "
+                      f"atraso máx {room['max_lateness_ms']:.2f} ms, "
+                      f"{room['overruns']} overruns)")
+
+    def pump_events(self, loop):
+        # Thread que lê a fila de eventos dos workers e repassa ao event loop
+        while True:
+            event = self.manager.events.get()
+            loop.call_soon_threadsafe(self.dispatch, event)
+
+    async def run(self):
+        print(f"[*] Servidor de salas iniciando com {self.manager.workers} processos...")
+        self.manager.start()
+        server.start_instrumentation()  # Métricas do front end (conexões, bytes)
+        self.open_results()  # Os resultados chegam com o fim de cada sala
+        loop = asyncio.get_running_loop()
+        threading.Thread(target=self.pump_events, args=(loop,), daemon=True).start()
+        listener = await asyncio.start_server(
+            self.handle_client, self.host, self.port, backlog=1024
+        )
+        loop.create_task(self.matchmaking_loop())
+        try:
+            async with listener:
+                await listener.serve_forever()
+        finally:
+            self.manager.stop()
+
+
+def main():
+    parser = server.build_parser("Servidor Snake com várias salas")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Número de processos de simulação (padrão: núcleos da CPU)")
+    args = parser.parse_args()
+    server.configure(args)
+    asyncio.run(RoomServer(workers=args.workers).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Agendador de ticks com passo fixo.
+#
+# Em vez de "trabalha e depois dorme um intervalo" (que acumula o tempo do
+# trabalho em cada tick), cada tick tem um prazo absoluto no relógio
+# monotônico: start + n * intervalo. Se o loop atrasar, a política decide se
+# os ticks perdidos são recuperados ("catch_up") ou descartados ("skip").
+#
+# Uso típico:
+#     scheduler = TickScheduler(rate=20)
+#     scheduler.start(delay=0.5)
+#     while rodando:
+#         ran = 0
+#         for _ in range(scheduler.wait()):
+#             simula_e_envia()
+#             ran += 1
+#             if acabou:
+#                 break
+#         scheduler.done(ran)
+import time
+
+CATCH_UP = "catch_up"  # Roda os ticks atrasados em sequência (até max_catch_up)
+SKIP = "skip"          # Roda só um tick e pula os prazos que já passaram
+
+
+class TickStats:
+    def __init__(self):
+        self.ticks = 0           # Ticks executados
+        self.wakeups = 0         # Vezes em que o loop acordou com tick pendente
+        self.skipped = 0         # Ticks descartados pela política
+        self.overruns = 0        # Wakeups cujo trabalho passou do intervalo
+        self.work_total = 0.0
+        self.work_max = 0.0
+        self.lateness_total = 0.0
+        self.lateness_max = 0.0
+
+    def as_dict(self):
+        wakeups = self.wakeups or 1
+        return {
+            "ticks": self.ticks,
+            "skipped": self.skipped,
+            "overruns": self.overruns,
+            "avg_work_ms": self.work_total / wakeups * 1000,
+            "max_work_ms": self.work_max * 1000,
+            "avg_lateness_ms": self.lateness_total / wakeups * 1000,
+            "max_lateness_ms": self.lateness_max * 1000,
+        }
+
+    def summary(self):
+        s = self.as_dict()
+        return (f"{s['ticks']} ticks, trabalho médio {s['avg_work_ms']:.2f} ms "
+                f"(máx {s['max_work_ms']:.2f}), atraso médio {s['avg_lateness_ms']:.2f} ms "
+                f"(máx {s['max_lateness_ms']:.2f}), {s['overruns']} overruns, "
+                f"{s['skipped']} ticks pulados")
+
+
+class TickScheduler:
+    def __init__(self, rate, policy=CATCH_UP, max_catch_up=5, clock=time.monotonic):
+        if policy not in (CATCH_UP, SKIP):
+            raise ValueError(f"Política de tick desconhecida: {policy!r}")
+        self.rate = rate
+        self.interval = 1.0 / rate
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self.stats = TickStats()
+        self.deadline = None
+        self.lateness = 0.0  # Atraso do último wakeup (para métricas)
+        self._woke_at = None
+        self._due = 0
+
+    def start(self, delay=0.0):
+        # Define o prazo do primeiro tick
+        self.deadline = self.clock() + delay
+
+    def time_left(self):
+        # Segundos até o próximo prazo (negativo se já passou)
+        return self.deadline - self.clock()
+
+    def poll(self):
+        # Não bloqueia: retorna quantos ticks devem rodar agora (0 se nenhum)
+        if self.deadline is None:
+            self.start()
+        now = self.clock()
+        lateness = now - self.deadline
+        if lateness < 0:
+            return 0
+
+        missed = int(lateness // self.interval)  # Prazos inteiros já perdidos
+        if self.policy == CATCH_UP:
+            due = 1 + min(missed, self.max_catch_up)
+        else:
+            due = 1
+        skipped = missed + 1 - due
+
+        self.deadline += (missed + 1) * self.interval
+        self.lateness = lateness
+        self._due = due
+        stats = self.stats
+        stats.skipped += skipped
+        stats.wakeups += 1
+        stats.lateness_total += lateness
+        stats.lateness_max = max(stats.lateness_max, lateness)
+        self._woke_at = now
+        return due
+
+    def wait(self):
+        # Dorme até o próximo prazo e retorna quantos ticks devem rodar
+        while True:
+            remaining = self.time_left() if self.deadline is not None else 0.0
+            if remaining > 0:
+                time.sleep(remaining)
+            due = self.poll()
+            if due:
+                return due
+
+    async def wait_async(self):
+        # Versão para asyncio de wait() (import local: o servidor com threads
+        # não precisa pagar o custo de importar o asyncio no cold start)
+        import asyncio
+        while True:
+            remaining = self.time_left() if self.deadline is not None else 0.0
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            due = self.poll()
+            if due:
+                return due
+
+    def done(self, ran=None):
+        # Marca o fim do trabalho do wakeup atual (mede tempo e overrun).
+        # ran: ticks que rodaram de fato (menos que os devidos se a partida
+        # acabou no meio da recuperação); None = todos os devidos
+        if self._woke_at is None:
+            return
+        work = self.clock() - self._woke_at
+        self._woke_at = None
+        stats = self.stats
+        stats.ticks += self._due if ran is None else ran
+        stats.work_total += work
+        stats.work_max = max(stats.work_max, work)
+        if work > self.interval:
+            stats.overruns += 1
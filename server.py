@@ -1,185 +1,532 @@
 # Importações padrão
+import argparse
+import random
 import socket
 import threading
-import pickle
-import struct
 import time
 from concurrent.futures import ThreadPoolExecutor  # ThreadPoolExecutor real!
 from game_state import GameState
-from settings import WIDTH, HEIGHT, BLOCK_SIZE
+import settings
+from utils import send_data, FrameReader, ClientWriter
+from scheduler import TickScheduler
+from lockstep import LockstepHost
+from replay import Recorder
+from ai import AIController, roster
+from matchmaking import MatchQueue, PUSH_INTERVAL
+from storage import ResultStore, clean_name
+from input_buffer import InputBuffer
+import protocol
+import metrics
 
-# Configurações do servidor
-HOST = 'localhost'
-PORT = 5555
-MAX_PLAYERS = 4
+# Configurações do servidor (padrões em settings.py / variáveis de ambiente,
+# podem ser sobrescritas pela linha de comando, ver parse_args)
+HOST = settings.HOST
+PORT = settings.PORT
+MAX_PLAYERS = settings.MAX_PLAYERS
+BOARD_WIDTH = settings.WIDTH
+BOARD_HEIGHT = settings.HEIGHT
+TICK_RATE = settings.TICK_RATE
+TICK_POLICY = settings.TICK_POLICY
+SEND_QUEUE_SIZE = settings.SEND_QUEUE_SIZE
+SEND_POLICY = settings.SEND_POLICY
+METRICS_PORT = settings.METRICS_PORT
+STATS_INTERVAL = settings.STATS_INTERVAL
+PROFILE = False  # Liga o profiler por amostragem já na partida
+UDP_PORT = settings.UDP_PORT  # Canal UDP dos ticks (só no async_server.py)
+VIEW_COLS = settings.VIEW_COLS  # Janela de cada jogador em células (0 = tudo)
+VIEW_ROWS = settings.VIEW_ROWS
+LOCKSTEP = settings.LOCKSTEP  # Manda só os inputs de cada tick (ver lockstep.py)
+RECORD_DIR = settings.RECORD_DIR  # Grava as partidas para reprodução (ver replay.py)
+AI_PLAYERS = settings.AI_PLAYERS  # Cobras da IA em cada partida (ver ai.py)
+AI_BUDGET_MS = settings.AI_BUDGET_MS  # CPU por tick para todas as cobras da IA
+AUTO_START = settings.AUTO_START  # Fila com N jogadores inicia a partida (ver matchmaking.py)
+START_TIMEOUT = settings.START_TIMEOUT  # Espera máxima do primeiro da fila, em segundos
+RESULTS_DB = settings.RESULTS_DB  # Resultados e ranking em SQLite (ver storage.py)
+ALLOW_PICKLE = settings.ALLOW_PICKLE  # Aceita pickle de clientes sem codec binário
+KEYFRAME_INTERVAL = 20  # A cada N ticks envia o estado completo (snapshot)
+DROPPABLE = ("update", "delta", "view")  # Mensagens que podem ser descartadas na fila
 
 # Dicionários para controlar conexões e dados dos jogadores
-clients = {}          # { pid: conn }
-player_names = {}     # { pid: "Jogador X" }
-inputs = {}           # { pid: "DIREÇÃO" }
-start_game_event = threading.Event()  # Sinaliza início da partida
+clients = {}          # { pid: conn } (jogando ou na fila)
+player_names = {}     # { pid: nome } (só quem está na partida atual)
+nicknames = {}        # { pid: apelido mandado no hello } (quem tem entra no ranking)
+input_buffer = InputBuffer()  # Curvas numeradas de cada jogador (ver input_buffer.py)
+resync_requests = set()  # pids que pediram um snapshot completo
+codec_versions = {}   # { pid: versão binária negociada } (ausente = pickle)
+writers = {}          # { pid: ClientWriter } (fila de envio de cada cliente)
 lobby_event = threading.Event()       # Sinaliza quando o jogo está rolando
 next_pid = 0                          # ID incremental dos jogadores
 
+# Fila de quem espera partida (ver matchmaking.py). Toda mudança nela é feita
+# com lobby_changed travado e acorda quem espera (thread do lobby e main).
+lobby = MatchQueue(MAX_PLAYERS, AUTO_START, START_TIMEOUT)
+lobby_changed = threading.Condition()
+
+# Resultados das partidas (None = não guarda) e a versão do ranking que cada
+# um na fila já recebeu ({ pid: versão })
+results = None
+leaderboard_sent = {}
+
 # Pool de threads com até 8 workers
 executor = ThreadPoolExecutor(max_workers=8)
 
-# Envia dados serializados via socket
-def send_data(conn, data):
-    try:
-        serialized = pickle.dumps(data)
-        conn.sendall(struct.pack(">I", len(serialized)) + serialized)
-    except:
-        pass  # Conexão quebrada, ignora
+# Opções de linha de comando (padrões vêm de settings.py / ambiente)
+def build_parser(description="Servidor Snake Multiplayer"):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--width", type=int, default=settings.WIDTH,
+                        help="Largura do tabuleiro em pixels")
+    parser.add_argument("--height", type=int, default=settings.HEIGHT,
+                        help="Altura do tabuleiro em pixels")
+    parser.add_argument("--tick-rate", type=float, default=settings.TICK_RATE,
+                        help="Ticks por segundo")
+    parser.add_argument("--tick-policy", choices=("catch_up", "skip"),
+                        default=settings.TICK_POLICY)
+    parser.add_argument("--max-players", type=int, default=settings.MAX_PLAYERS)
+    parser.add_argument("--send-queue", type=int, default=settings.SEND_QUEUE_SIZE,
+                        help="Mensagens pendentes por cliente antes de aplicar a política")
+    parser.add_argument("--send-policy", choices=("drop_stale", "disconnect"),
+                        default=settings.SEND_POLICY,
+                        help="Cliente atrasado: descarta updates antigos ou desconecta")
+    parser.add_argument("--metrics-port", type=int, default=settings.METRICS_PORT,
+                        help="Porta local do endpoint HTTP /metrics (0 = desligado)")
+    parser.add_argument("--stats-interval", type=float, default=settings.STATS_INTERVAL,
+                        help="Segundos entre resumos de métricas no terminal (0 = desligado)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Liga o profiler por amostragem desde o início")
+    parser.add_argument("--udp-port", type=int, default=settings.UDP_PORT,
+                        help="Porta UDP para estado e inputs dos ticks (0 = só TCP; async_server.py)")
+    parser.add_argument("--view-cols", type=int, default=settings.VIEW_COLS,
+                        help="Largura em células da área enviada a cada jogador (0 = tabuleiro inteiro)")
+    parser.add_argument("--view-rows", type=int, default=settings.VIEW_ROWS,
+                        help="Altura em células da área enviada a cada jogador (0 = tabuleiro inteiro)")
+    parser.add_argument("--lockstep", action="store_true", default=settings.LOCKSTEP,
+                        help="Envia só os inputs de cada tick; os clientes simulam a partida")
+    parser.add_argument("--record", metavar="DIR", default=settings.RECORD_DIR,
+                        help="Grava cada partida em DIR para reprodução com replay.py")
+    parser.add_argument("--ai", type=int, default=settings.AI_PLAYERS,
+                        help="Cobras controladas pelo servidor em cada partida")
+    parser.add_argument("--ai-budget", type=float, default=settings.AI_BUDGET_MS,
+                        help="Milissegundos de CPU por tick para a IA (além disso ela simplifica)")
+    parser.add_argument("--auto-start", type=int, default=settings.AUTO_START,
+                        help="Inicia a partida quando a fila chega a N jogadores (0 = só pelo botão)")
+    parser.add_argument("--start-timeout", type=float, default=settings.START_TIMEOUT,
+                        help="Inicia a partida quando o primeiro da fila espera S segundos (0 = sem prazo)")
+    parser.add_argument("--results", metavar="DB", default=settings.RESULTS_DB,
+                        help="Guarda os resultados em DB (SQLite) e manda o ranking a quem está na fila")
+    parser.add_argument("--allow-pickle", action="store_true", default=settings.ALLOW_PICKLE,
+                        help="Aceita mensagens em pickle de clientes antigos (executa código vindo da rede)")
+    return parser
 
-# Recebe dados serializados via socket
-def recv_data(conn):
-    try:
-        raw_msglen = conn.recv(4)
-        if not raw_msglen:
-            return None
-        msglen = struct.unpack(">I", raw_msglen)[0]
-        data = b""
-        while len(data) < msglen:
-            packet = conn.recv(msglen - len(data))
-            if not packet:
-                return None
-            data += packet
-        return pickle.loads(data)
-    except:
+def parse_args(argv=None):
+    return build_parser().parse_args(argv)
+
+# Aplica as opções às configurações globais do servidor
+def configure(args):
+    global HOST, PORT, MAX_PLAYERS, BOARD_WIDTH, BOARD_HEIGHT, TICK_RATE, TICK_POLICY
+    global SEND_QUEUE_SIZE, SEND_POLICY, METRICS_PORT, STATS_INTERVAL, PROFILE, UDP_PORT
+    global VIEW_COLS, VIEW_ROWS, LOCKSTEP, RECORD_DIR, AI_PLAYERS, AI_BUDGET_MS
+    global AUTO_START, START_TIMEOUT, RESULTS_DB, ALLOW_PICKLE, lobby, executor
+    HOST, PORT = args.host, args.port
+    MAX_PLAYERS = args.max_players
+    BOARD_WIDTH, BOARD_HEIGHT = args.width, args.height
+    TICK_RATE, TICK_POLICY = args.tick_rate, args.tick_policy
+    SEND_QUEUE_SIZE, SEND_POLICY = args.send_queue, args.send_policy
+    METRICS_PORT, STATS_INTERVAL, PROFILE = args.metrics_port, args.stats_interval, args.profile
+    UDP_PORT = args.udp_port
+    VIEW_COLS, VIEW_ROWS = args.view_cols, args.view_rows
+    LOCKSTEP = args.lockstep
+    RECORD_DIR = args.record
+    AI_PLAYERS, AI_BUDGET_MS = args.ai, args.ai_budget
+    AUTO_START, START_TIMEOUT = args.auto_start, args.start_timeout
+    RESULTS_DB = args.results
+    ALLOW_PICKLE = args.allow_pickle
+    lobby = new_lobby()
+    # Uma thread por conexão: o pool precisa comportar todas (ver max_connections)
+    executor = ThreadPoolExecutor(max_workers=max(8, max_connections()))
+
+# Fila de espera com a configuração atual (o async_server.py e o rooms.py
+# também criam a sua por aqui)
+def new_lobby(room_size=None):
+    return MatchQueue(room_size or MAX_PLAYERS, AUTO_START, START_TIMEOUT)
+
+# Abre o banco de resultados, se pedido (o async_server.py e o rooms.py
+# também). on_update roda na thread do banco quando o ranking muda.
+def open_results(on_update=None):
+    if not RESULTS_DB:
         return None
+    store = ResultStore(RESULTS_DB, on_update)
+    print(f"[*] Resultados em {RESULTS_DB} ({len(store.leaderboard())} no ranking)")
+    return store
+
+# Se a conexão pode mandar pickle: só com --allow-pickle e enquanto ela não
+# negociou o codec binário (version = versão negociada ou None). pickle.loads
+# executa código, então um frame pickle recusado encerra a conexão.
+def accepts_pickle(version):
+    return ALLOW_PICKLE and version is None
+
+# Nomes dos jogadores de uma partida: o apelido de quem mandou um no hello,
+# "Jogador 1, 2, 3..." para os outros
+def match_names(playing, nicknames):
+    return {pid: nicknames.get(pid) or f"Jogador {i + 1}" for i, pid in enumerate(playing)}
+
+# Conexões aceitas ao mesmo tempo: uma partida cheia jogando e outra na fila
+def max_connections():
+    return 2 * MAX_PLAYERS
+
+# Liga o endpoint de métricas, o resumo periódico e o profiler (se pedidos)
+def start_instrumentation():
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+        print(f"[*] Métricas em http://127.0.0.1:{METRICS_PORT}/metrics")
+    if STATS_INTERVAL:
+        metrics.start_dump(STATS_INTERVAL)
+    if PROFILE:
+        metrics.PROFILER.start()
 
-# Envia mensagem para todos os jogadores conectados
+# Profundidade atual da fila de envio de cada cliente
+metrics.REGISTRY.register(metrics.Gauge(
+    "snake_send_queue_depth", "Mensagens na fila de envio do cliente",
+    lambda: {(("client", pid),): writer.depth() for pid, writer in list(writers.items())}
+))
+
+# Envia uma mensagem a um jogador no formato que ele negociou
+def send_to(pid, conn, msg):
+    payload = protocol.encode(msg, codec_versions.get(pid))
+    writer = writers.get(pid)
+    if writer:
+        writer.send(payload, msg["type"] in DROPPABLE)
+
+# Envia mensagem para todos os jogadores da partida. A mensagem é codificada
+# uma vez por formato e os mesmos bytes vão para a fila de cada cliente; o
+# envio em si acontece na thread do ClientWriter, fora do loop de ticks.
 def broadcast(msg):
-    for conn in clients.values():
-        send_data(conn, msg)
+    droppable = msg["type"] in DROPPABLE
+    encoded = {}
+    encode_time = 0.0
+    for pid in list(player_names):
+        writer = writers.get(pid)
+        if writer is None:
+            continue
+        version = codec_versions.get(pid)
+        if version not in encoded:
+            started = time.perf_counter()
+            encoded[version] = protocol.encode(msg, version)
+            encode_time += time.perf_counter() - started
+        writer.send(encoded[version], droppable)
+    if encoded:
+        metrics.SERIALIZE_TIME.observe(encode_time)
+
+# Área de interesse ligada: cada jogador recebe só a janela em volta da cabeça.
+# No lockstep cada cliente simula o mundo inteiro, então ela não se aplica.
+def views_enabled():
+    return VIEW_COLS > 0 and VIEW_ROWS > 0 and not LOCKSTEP
+
+# Mensagem "view" de um jogador: o estado filtrado pela sua janela. O tamanho
+# depende do que cabe na janela, não do tamanho do mundo. acks: { pid: seq }
+# dos inputs processados (a view leva só o do próprio jogador)
+def view_message(game, pid, sent_at, acks=None):
+    rect = game.view_rect(pid, VIEW_COLS, VIEW_ROWS)
+    msg = {"type": "view", "data": game.get_view(pid, rect), "sent_at": sent_at}
+    if acks and pid in acks:
+        msg["acks"] = {pid: acks[pid]}
+    return msg
+
+# Envia a cada jogador a sua janela (uma codificação por cliente)
+def send_views(game, acks=None):
+    sent_at = time.time()
+    encode_time = 0.0
+    for pid in list(player_names):
+        writer = writers.get(pid)
+        if writer is None:
+            continue
+        msg = view_message(game, pid, sent_at, acks)
+        started = time.perf_counter()
+        payload = protocol.encode(msg, codec_versions.get(pid))
+        encode_time += time.perf_counter() - started
+        writer.send(payload, True)
+    metrics.SERIALIZE_TIME.observe(encode_time)
+
+# Estatísticas das filas de envio ({ pid: profundidade, descartes... })
+def send_stats():
+    return {pid: writer.stats() for pid, writer in list(writers.items())}
 
 # Função que lida com cada jogador individualmente (usada com thread pool)
 def handle_client(pid, conn):
+    meter = lambda n: metrics.BYTES_IN.inc(n, client=pid)
+    reader = FrameReader(conn, meter=meter)
     try:
         while True:
-            data = recv_data(conn)
+            data = reader.recv_message(accepts_pickle(codec_versions.get(pid)))
             if data is None:
                 print(f"[x] {player_names.get(pid, 'Jogador')} desconectou.")
                 break
 
-            if data.get("type") == "start_game" and not start_game_event.is_set():
-                print(f"[SERVER] {player_names.get(pid, 'Jogador')} iniciou a partida")
-                start_game_event.set()
+            if data.get("type") == "hello":
+                # Negocia o protocolo binário; sem versão em comum segue em pickle
+                # (e só é atendido com --allow-pickle)
+                version = protocol.negotiate(data.get("versions"))
+                if version is not None:
+                    codec_versions[pid] = version
+                    send_to(pid, conn, {"type": "hello", "versions": [version]})
+                name = clean_name(data.get("name"))
+                if name:
+                    nicknames[pid] = name
 
-            elif data.get("type") == "input" and lobby_event.is_set():
-                inputs[pid] = data.get("direction")
+            elif data.get("type") == "start_game" and pid in lobby:
+                # Com uma partida em andamento, a próxima começa logo que ela acabar
+                print(f"[SERVER] Jogador {pid} pediu o início da partida")
+                lobby_update(lobby.request_start)
+
+            elif data.get("type") == "input" and lobby_event.is_set() and pid in player_names:
+                # Entra na fila do jogador; o tick consome uma curva por vez
+                input_buffer.push(pid, data.get("direction"), data.get("seq"), data.get("tick", 0))
+                metrics.INPUTS.inc()
+
+            elif data.get("type") == "resync" and lobby_event.is_set() and pid in player_names:
+                resync_requests.add(pid)
     finally:
         # Remove jogador ao desconectar
-        if pid in clients:
-            del clients[pid]
-        if pid in player_names:
-            del player_names[pid]
+        clients.pop(pid, None)
+        player_names.pop(pid, None)
+        input_buffer.remove(pid)
+        nicknames.pop(pid, None)
+        leaderboard_sent.pop(pid, None)
+        codec_versions.pop(pid, None)
+        writer = writers.pop(pid, None)
+        if writer:
+            writer.close()
         conn.close()
+        # Séries por cliente somem junto com ele (os totais ficam no resumo)
+        metrics.DISCONNECTS.inc()
+        metrics.BYTES_IN.remove(client=pid)
+        metrics.BYTES_OUT.remove(client=pid)
+        # Depois de sair de clients: o main não coloca de volta na fila quem já saiu
+        lobby_update(lobby.leave, pid)
+
+# Executa um tick da simulação e envia o resultado aos jogadores.
+# lockstep: LockstepHost da partida (None = envia o estado)
+# recorder: Recorder que grava a partida (None = não grava)
+# ai: AIController das cobras da IA (None = sem IA). As decisões entram
+# em applied como inputs comuns, então lockstep e gravação as reproduzem.
+def run_tick(game, lockstep=None, recorder=None, ai=None):
+    applied = input_buffer.take(game)  # No máximo uma curva por jogador
+    if ai:
+        applied.update(ai.decide(game))
+    for pid, direction in applied.items():
+        game.set_input(pid, direction)
+
+    with metrics.UPDATE_TIME.time():
+        game.update()
+    if recorder:
+        recorder.tick(game.tick, applied)
+    # Seqs processadas neste tick (delta/tick); o snapshot leva todas
+    acks = input_buffer.take_acks()
+
+    # Snapshot completo periodicamente; nos outros ticks só o delta.
+    # sent_at permite ao cliente medir a latência servidor → cliente.
+    with metrics.BROADCAST_TIME.time():
+        if lockstep:
+            # Só os inputs; quem dessincronizou recebe o GameState inteiro
+            msg = lockstep.tick_message(game, applied)
+            msg["acks"] = acks
+            broadcast(msg)
+            for pid in list(resync_requests):
+                resync_requests.discard(pid)
+                conn = clients.get(pid)
+                if conn:
+                    send_to(pid, conn, lockstep.sync_message(game))
+        elif views_enabled():
+            resync_requests.clear()  # Toda view já é um estado completo
+            send_views(game, input_buffer.acks())
+        elif game.tick % KEYFRAME_INTERVAL == 0:
+            resync_requests.clear()
+            broadcast({"type": "update", "data": game.get_state(), "sent_at": time.time(),
+                       "acks": input_buffer.acks()})
+        else:
+            broadcast({"type": "delta", "data": game.get_delta(), "sent_at": time.time(),
+                       "acks": acks})
+            for pid in list(resync_requests):
+                resync_requests.discard(pid)
+                conn = clients.get(pid)
+                if conn:
+                    send_to(pid, conn, {"type": "update", "data": game.get_state(),
+                                        "acks": input_buffer.acks()})
 
 # Função principal de execução do jogo (por rodada)
 def game_loop():
-    game = GameState(clients, player_names)
+    # Seed explícita: o lockstep e a gravação reproduzem a partida a partir dela
+    seed = random.getrandbits(32)
+    lockstep = LockstepHost(seed) if LOCKSTEP else None
+    bots = roster(AI_PLAYERS)
+    names = {**player_names, **bots}
+    ranked = [pid for pid in player_names if pid in nicknames]  # Só quem se identificou
+    game = GameState(dict.fromkeys(names), names, width=BOARD_WIDTH, height=BOARD_HEIGHT,
+                     seed=seed, ai_players=bots)
+    ai = AIController(bots, AI_BUDGET_MS / 1000) if bots else None
+    recorder = Recorder.start(RECORD_DIR, game, seed) if RECORD_DIR else None
 
-    # Inicia o jogo para todos os clientes conectados
-    for pid, conn in clients.items():
-        send_data(conn, {
+    # Inicia o jogo para todos os clientes conectados (com o snapshot inicial;
+    # com área de interesse, cada um recebe logo em seguida só a sua janela, e
+    # no lockstep cada um monta o estado inicial a partir da seed)
+    state = None if views_enabled() or lockstep else game.get_state()
+    for pid in list(player_names):
+        send_to(pid, clients.get(pid), {
             "type": "start",
             "player_id": pid,
-            "players": player_names
+            "players": names,
+            "board": (game.width, game.height),
+            "data": state
         })
+    if views_enabled():
+        send_views(game)
+    if lockstep:
+        broadcast(lockstep.start_message(game))
 
-    time.sleep(0.5)
+    # Prazos absolutos: o tempo de simulação/envio não estica o período do tick
+    scheduler = TickScheduler(TICK_RATE, TICK_POLICY)
+    scheduler.start(delay=0.5)
 
     # Loop do jogo em tempo real (enquanto alguém ainda estiver vivo)
     while not game.is_game_over():
-        for pid, direction in inputs.items():
-            game.set_input(pid, direction)
+        due = scheduler.wait()
+        metrics.TICK_LATENESS.observe(scheduler.lateness)
+        ran = 0
+        for _ in range(due):
+            run_tick(game, lockstep, recorder, ai)
+            ran += 1
+            if game.is_game_over():
+                break
+        scheduler.done(ran)
 
-        game.update()
-        state = game.get_state()
-        broadcast({"type": "update", "data": state})
-        time.sleep(0.15)
+    print(f"[*] Ticks: {scheduler.stats.summary()}")
+    if recorder:
+        recorder.finish(game)
+        print(f"[*] Partida gravada em {recorder.path}")
+    for pid, stats in sorted(send_stats().items()):
+        print(f"[*] Envio para {names.get(pid, pid)}: fila máx {stats['max_depth']}, "
+              f"{stats['sent']} enviadas, {stats['dropped']} descartadas"
+              + (" (desconectado)" if stats["closed"] else ""))
 
     # Quando o jogo termina, envia placar ajustado (desconta os 3 blocos iniciais)
     final_scores = game.get_state()["scores"]
     adjusted_scores = {pid: score - 3 for pid, score in final_scores.items()}
     broadcast({"type": "game_over", "scores": adjusted_scores})
+    if results:
+        # Só enfileira: a gravação fica com a thread do banco
+        results.record(adjusted_scores, names, ranked, game.tick, seed)
     time.sleep(1)
 
-# Thread em segundo plano para manter o lobby atualizando
+# Aplica uma mudança à fila e acorda quem espera por ela
+def lobby_update(change, *args):
+    with lobby_changed:
+        change(*args)
+        lobby_changed.notify_all()
+
+# Versões da fila e do ranking: o lobby manda mensagens quando uma delas muda
+def lobby_versions():
+    return lobby.version, results.version if results else 0
+
+# O banco publicou um ranking novo (roda na thread do banco)
+def results_updated():
+    with lobby_changed:
+        lobby_changed.notify_all()
+
+# Thread do lobby: manda a posição na fila a quem espera, só quando a fila muda
+# (entrou, saiu ou começou uma partida), e o ranking a quem ainda não viu a
+# versão atual. Sem mudanças, fica dormindo.
 def lobby_loop():
+    seen = None
     while True:
-        if not lobby_event.is_set():
-            disconnected = []
-            for pid, conn in list(clients.items()):
-                try:
-                    send_data(conn, {
-                        "type": "lobby",
-                        "connected": len(clients),
-                        "max": MAX_PLAYERS
-                    })
-                except:
-                    disconnected.append(pid)
-
-            for pid in disconnected:
-                if pid in clients:
-                    del clients[pid]
-                if pid in player_names:
-                    del player_names[pid]
-        time.sleep(1)
+        with lobby_changed:
+            lobby_changed.wait_for(lambda: lobby_versions() != seen)
+            seen = lobby_versions()
+            messages = lobby.lobby_messages()
+            if results:
+                messages += results.pending(list(lobby.waiting), leaderboard_sent)
+        for pid, msg in messages:
+            send_to(pid, clients.get(pid), msg)
+        time.sleep(PUSH_INTERVAL)  # Junta as mudanças seguintes num envio só
+
+# Dorme até a fila poder começar uma partida (evento ou prazo da fila) e
+# devolve os pids de quem vai jogar
+def wait_for_match():
+    with lobby_changed:
+        while not lobby.due():
+            lobby_changed.wait(lobby.time_left())
+        return lobby.pop_match()
+
+# Thread que aceita conexões: quem chega vai para o fim da fila, mesmo com
+# uma partida em andamento
+def accept_loop(server):
+    global next_pid
+    while True:
+        conn, addr = server.accept()
+
+        if len(clients) >= max_connections():
+            metrics.DROPS.inc(reason="full")
+            send_data(conn, {"type": "full"})
+            conn.close()
+            continue
+
+        pid = next_pid
+        next_pid += 1
+        clients[pid] = conn
+        writers[pid] = ClientWriter(
+            conn, SEND_QUEUE_SIZE, SEND_POLICY,
+            on_sent=lambda n, pid=pid: metrics.BYTES_OUT.inc(n, client=pid),
+            on_drop=lambda reason: metrics.DROPS.inc(reason=reason)
+        )
+        metrics.CONNECTIONS.inc()
+        print(f"[+] Conexão de {addr}")
+
+        # Entra na fila antes da thread do cliente existir: se ele cair logo,
+        # a saída da fila vem depois da entrada
+        lobby_update(lobby.join, pid)
+        # Envia o cliente para uma thread do pool
+        executor.submit(handle_client, pid, conn)
 
 # Função principal do servidor
 def main():
-    global next_pid
+    global results
     print("[*] Servidor iniciando...")
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server.bind((HOST, PORT))
     server.listen()
 
-    # Inicia a thread do lobby
+    start_instrumentation()
+    results = open_results(results_updated)
+
+    # Threads do lobby e das conexões (as duas dormem até ter o que fazer)
     threading.Thread(target=lobby_loop, daemon=True).start()
+    threading.Thread(target=accept_loop, args=(server,), daemon=True).start()
 
     # Loop principal do servidor
     while True:
         # Reseta variáveis de controle entre partidas
-        inputs.clear()
-        lobby_event.clear()
-        start_game_event.clear()
-
-        # Aceita conexões até que um jogador inicie a partida
-        while not start_game_event.is_set():
-            server.settimeout(0.5)
-            try:
-                conn, addr = server.accept()
-
-                if len(clients) >= MAX_PLAYERS:
-                    send_data(conn, {"type": "full"})
-                    conn.close()
-                    continue
-
-                pid = next_pid
-                next_pid += 1
-                clients[pid] = conn
-                player_names[pid] = f"Jogador TEMP"
-                print(f"[+] Conexão de {addr}")
-
-                # Envia o cliente para uma thread do pool
-                executor.submit(handle_client, pid, conn)
-
-            except socket.timeout:
-                continue
-
-        # Renomeia os jogadores conectados (Jogador 1, 2, 3, ...)
-        sorted_pids = list(clients.keys())
-        player_names.clear()
-        for i, pid in enumerate(sorted_pids):
-            player_names[pid] = f"Jogador {i + 1}"
-
-        print(f"[*] Iniciando partida com {len(clients)} jogadores")
+        input_buffer.clear()
+        resync_requests.clear()
+
+        # Espera a fila formar uma partida e nomeia os jogadores (apelido ou Jogador 1, 2, 3, ...)
+        playing = wait_for_match()
+        player_names.update(match_names(playing, nicknames))
+
+        print(f"[*] Iniciando partida com {len(player_names)} jogadores "
+              f"({len(lobby)} na fila)")
         lobby_event.set()
         game_loop()
+        lobby_event.clear()
+
+        # Quem jogou e continua conectado volta para o fim da fila
+        with lobby_changed:
+            for pid in list(player_names):
+                if pid in clients:
+                    lobby.join(pid)
+            player_names.clear()
+            lobby_changed.notify_all()
         print("[*] Partida encerrada. Retornando ao lobby...")
 
 if __name__ == "__main__":
+    configure(parse_args())
     main()
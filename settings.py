@@ -1,10 +1,60 @@
-import pygame
+# Configurações globais (só dados: nada de pygame aqui, para que o servidor
+# e o GameState possam ser importados sem inicializar SDL nem fontes).
+# Os valores do servidor podem ser sobrescritos por variáveis de ambiente.
+import os
 
-# Tamanho da tela
-WIDTH = 1000
-HEIGHT = 800
+# Tamanho da tela / tabuleiro (em pixels)
+WIDTH = int(os.environ.get("SNAKE_WIDTH", 1000))
+HEIGHT = int(os.environ.get("SNAKE_HEIGHT", 800))
 BLOCK_SIZE = 20
 FPS = 10
+# Modo suave do cliente: interpola entre ticks e prevê a curva local
+SMOOTH_RENDER = os.environ.get("SNAKE_SMOOTH", "0") == "1"
+SMOOTH_FPS = int(os.environ.get("SNAKE_SMOOTH_FPS", 60))  # Taxa de atualização da tela
+FRUIT_COUNT = int(os.environ.get("SNAKE_FRUITS", 1))  # Frutas simultâneas no tabuleiro
+
+# Servidor
+HOST = os.environ.get("SNAKE_HOST", "localhost")
+PORT = int(os.environ.get("SNAKE_PORT", 5555))
+MAX_PLAYERS = int(os.environ.get("SNAKE_MAX_PLAYERS", 4))
+# Ticks por segundo (padrão ~6,7 Hz = 150 ms) e política para ticks atrasados
+TICK_RATE = float(os.environ.get("SNAKE_TICK_RATE", 20 / 3))
+TICK_POLICY = os.environ.get("SNAKE_TICK_POLICY", "catch_up")  # ou "skip"
+# Fila de envio por cliente (mensagens) e o que fazer quando ela enche
+SEND_QUEUE_SIZE = int(os.environ.get("SNAKE_SEND_QUEUE", 64))
+SEND_POLICY = os.environ.get("SNAKE_SEND_POLICY", "drop_stale")  # ou "disconnect"
+# Instrumentação: porta do endpoint HTTP /metrics (0 = desligado) e intervalo
+# do resumo impresso no terminal (0 = desligado), ver metrics.py
+METRICS_PORT = int(os.environ.get("SNAKE_METRICS_PORT", 0))
+STATS_INTERVAL = float(os.environ.get("SNAKE_STATS_INTERVAL", 0))
+# Canal UDP para os ticks (0 = desligado no servidor; o cliente pede com SNAKE_UDP=1)
+UDP_PORT = int(os.environ.get("SNAKE_UDP_PORT", 0))
+USE_UDP = os.environ.get("SNAKE_UDP", "0") == "1"
+# Área de interesse: cada jogador recebe só uma janela de VIEW_COLS x VIEW_ROWS
+# células em volta da cabeça (0 = tabuleiro inteiro). Para arenas grandes.
+VIEW_COLS = int(os.environ.get("SNAKE_VIEW_COLS", 0))
+VIEW_ROWS = int(os.environ.get("SNAKE_VIEW_ROWS", 0))
+# Lockstep: o servidor manda só os inputs e cada cliente simula a partida
+LOCKSTEP = os.environ.get("SNAKE_LOCKSTEP", "0") == "1"
+# Pasta onde cada partida é gravada para reprodução (vazio = não grava, ver replay.py)
+RECORD_DIR = os.environ.get("SNAKE_RECORD_DIR", "")
+# Cobras controladas pelo servidor em cada partida e quanto tempo de CPU
+# (ms por tick, somando todas) elas podem usar antes de simplificar (ver ai.py)
+AI_PLAYERS = int(os.environ.get("SNAKE_AI", 0))
+AI_BUDGET_MS = float(os.environ.get("SNAKE_AI_BUDGET_MS", 5))
+# Início automático das partidas (ver matchmaking.py): quando a fila chega a
+# AUTO_START jogadores ou quando o primeiro da fila espera START_TIMEOUT
+# segundos (0 = desligado; o botão "Iniciar Jogo" vale sempre)
+AUTO_START = int(os.environ.get("SNAKE_AUTO_START", 0))
+START_TIMEOUT = float(os.environ.get("SNAKE_START_TIMEOUT", 0))
+# Banco SQLite com o resultado das partidas e o ranking (vazio = não guarda,
+# ver storage.py) e o apelido com que o cliente entra no ranking (vazio =
+# "Jogador N", fora do ranking)
+RESULTS_DB = os.environ.get("SNAKE_RESULTS_DB", "")
+PLAYER_NAME = os.environ.get("SNAKE_NAME", "")
+# Aceita mensagens em pickle de clientes que não negociaram o codec binário.
+# pickle.loads executa código vindo da rede: só ligue com clientes confiáveis
+ALLOW_PICKLE = os.environ.get("SNAKE_ALLOW_PICKLE", "0") == "1"
 
 # Cores
 WHITE = (255, 255, 255)
@@ -13,6 +63,6 @@ RED   = (255, 0, 0)
 BLACK = (0, 0, 0)
 GRAY  = (50, 50, 50)
 
-# Fonte
-pygame.font.init()
-FONT = pygame.font.SysFont("arial", 30)
+# Fonte (carregada sob demanda no cliente, ver assets.py)
+FONT_NAME = "arial"
+FONT_SIZE = 30
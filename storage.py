@@ -0,0 +1,221 @@
+# Histórico de partidas e ranking dos jogadores em SQLite.
+#
+# Com --results ARQUIVO o servidor guarda o resultado de cada partida:
+# - matches: uma linha por partida (fim, ticks, seed, jogadores);
+# - results: uma linha por jogador em cada partida (nome, pontos, colocação);
+# - players: totais por nome (partidas, vitórias, pontos, recorde), só de
+#   quem se identificou (SNAKE_NAME no cliente); cobras da IA e jogadores
+#   sem nome ficam só no histórico.
+#
+# Quem termina a partida só chama record(), que enfileira uma tupla e volta;
+# uma thread própria grava as partidas em lotes, uma transação por lote, e
+# o tick nunca espera pelo disco. Depois de cada lote a mesma thread relê o
+# topo do ranking (índice em players, sem percorrer o histórico) e publica
+# a lista pronta: leaderboard() só lê essa lista em memória, então o lobby
+# pode mandá-la a cada um que entra sem tocar no banco.
+#
+# Para medir com milhões de partidas sintéticas: benchmarks/bench_storage.py
+import queue
+import sqlite3
+import threading
+import time
+
+BATCH_SIZE = 2000      # Partidas por transação, no máximo
+TOP_SIZE = 100         # Linhas do ranking mantidas em memória
+LEADERBOARD_SIZE = 10  # Linhas enviadas ao lobby
+NAME_MAX = 20          # Caracteres do apelido
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    ended_at REAL NOT NULL,
+    ticks INTEGER NOT NULL,
+    seed INTEGER NOT NULL,
+    players INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    match_id INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    place INTEGER NOT NULL,
+    ranked INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    matches INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    total_score INTEGER NOT NULL,
+    best_score INTEGER NOT NULL,
+    last_played REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS players_rank ON players(wins DESC, best_score DESC);
+"""
+
+# Soma os totais de um lote aos que já estão no banco
+UPSERT_PLAYER = """
+INSERT INTO players(name, matches, wins, total_score, best_score, last_played)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(name) DO UPDATE SET
+    matches = matches + excluded.matches,
+    wins = wins + excluded.wins,
+    total_score = total_score + excluded.total_score,
+    best_score = max(best_score, excluded.best_score),
+    last_played = max(last_played, excluded.last_played)
+"""
+
+# Usa o índice players_rank: lê só as primeiras linhas
+TOP_QUERY = """
+SELECT name, wins, best_score, matches FROM players
+ORDER BY wins DESC, best_score DESC LIMIT ?
+"""
+
+
+def clean_name(name):
+    # Apelido mandado no hello: texto de uma linha, sem espaços sobrando e com
+    # no máximo NAME_MAX caracteres ("" = sem apelido)
+    if not isinstance(name, str):
+        return ""
+    return " ".join(name.split())[:NAME_MAX]
+
+
+def match_rows(scores, names, ranked):
+    # [(nome, pontos, colocação, identificado)] de uma partida, do 1º ao último.
+    # Empates dividem a colocação
+    rows = []
+    place = previous = None
+    for i, (pid, score) in enumerate(sorted(scores.items(), key=lambda item: -item[1]), 1):
+        if score != previous:
+            place, previous = i, score
+        rows.append((names.get(pid, f"Jogador {pid}"), score, place, pid in ranked))
+    return rows
+
+
+class ResultStore:
+    def __init__(self, path, on_update=None):
+        self.path = path
+        self.on_update = on_update  # Chamada (na thread do banco) quando o ranking muda
+        self.top = ()               # Topo do ranking: ((nome, vitórias, recorde, partidas), ...)
+        self.version = 0            # Muda a cada publicação de self.top
+        self.written = 0            # Partidas gravadas desde que o store abriu
+        self.queue = queue.SimpleQueue()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.ready.wait()  # Esquema criado e ranking carregado
+
+    def record(self, scores, names, ranked=(), ticks=0, seed=0, ended_at=None):
+        # Enfileira o resultado de uma partida e volta na hora (colocações e
+        # totais ficam para a thread do banco).
+        # scores: { pid: pontos }, names: { pid: nome },
+        # ranked: pids cujo nome identifica a pessoa (entram no ranking)
+        self.queue.put((ended_at or time.time(), ticks, seed,
+                        dict(scores), dict(names), frozenset(ranked)))
+
+    def leaderboard(self, n=LEADERBOARD_SIZE):
+        # As n primeiras linhas do ranking (da memória, sem consultar o banco)
+        return self.top[:n]
+
+    def leaderboard_message(self, n=LEADERBOARD_SIZE):
+        return {"type": "leaderboard", "top": [list(row) for row in self.top[:n]]}
+
+    def pending(self, pids, sent):
+        # [(pid, mensagem)] com o ranking para quem ainda não recebeu a versão
+        # atual; sent: { pid: versão enviada }, atualizado aqui
+        version = self.version
+        out = []
+        msg = None
+        for pid in pids:
+            if sent.get(pid) != version:
+                sent[pid] = version
+                msg = msg or self.leaderboard_message()
+                out.append((pid, msg))
+        return out
+
+    def flush(self, timeout=None):
+        # Espera tudo o que já foi enfileirado estar gravado (testes e benchmarks)
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    # ---------- Thread do banco ----------
+
+    def _run(self):
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")   # Leitores de fora não travam a escrita
+        db.execute("PRAGMA synchronous=NORMAL")  # Sem fsync por transação (WAL continua íntegro)
+        db.executescript(SCHEMA)
+        self.next_id = db.execute("SELECT coalesce(max(id), 0) + 1 FROM matches").fetchone()[0]
+        self._publish(db, notify=False)
+        self.ready.set()
+
+        while True:
+            batch, waiters, stop = [], [], False
+            item = self.queue.get()
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._write(db, batch)
+                    self._publish(db)
+                except sqlite3.Error as exc:
+                    print(f"[!] Resultados de {len(batch)} partidas não gravados: {exc}")
+            for done in waiters:
+                done.set()
+            if stop:
+                db.close()
+                return
+
+    def _write(self, db, batch):
+        # Um lote numa transação. Os ids das partidas saem daqui (só esta
+        # thread escreve), então tudo vai em executemany, sem uma ida ao
+        # banco por partida.
+        matches, results, totals = [], [], {}
+        match_id = self.next_id
+        for ended_at, ticks, seed, scores, names, ranked in batch:
+            rows = match_rows(scores, names, ranked)
+            matches.append((match_id, ended_at, ticks, seed, len(rows)))
+            # Vitória: o maior placar sozinho, numa partida com mais de um jogador
+            decided = len(rows) > 1 and rows[1][2] > 1
+            for name, score, place, is_ranked in rows:
+                results.append((match_id, name, score, place, is_ranked))
+                if not is_ranked:
+                    continue
+                win = place == 1 and decided
+                total = totals.get(name)
+                if total is None:
+                    totals[name] = [1, win, score, score, ended_at]
+                else:
+                    total[0] += 1
+                    total[1] += win
+                    total[2] += score
+                    total[3] = max(total[3], score)
+                    total[4] = max(total[4], ended_at)
+            match_id += 1
+        with db:
+            db.executemany("INSERT INTO matches VALUES (?, ?, ?, ?, ?)", matches)
+            db.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?)", results)
+            db.executemany(UPSERT_PLAYER, [(name, *total) for name, total in totals.items()])
+        self.next_id = match_id
+        self.written += len(batch)
+
+    def _publish(self, db, notify=True):
+        # Relê o topo do ranking e troca a lista publicada de uma vez
+        self.top = tuple(db.execute(TOP_QUERY, (TOP_SIZE,)).fetchall())
+        self.version += 1
+        if notify and self.on_update:
+            self.on_update()
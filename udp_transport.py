@@ -0,0 +1,320 @@
+# Transporte UDP opcional para os ticks (estado e inputs).
+#
+# No TCP um segmento perdido segura todos os updates seguintes até ser
+# retransmitido (head-of-line blocking), mesmo que só o estado mais novo
+# importe. Com o canal UDP, o estado de cada tick e os inputs viajam como
+# datagramas numerados; lobby, start, game_over e o pedido do canal
+# continuam no TCP, que é confiável.
+#
+# Servidor → cliente (STATE): época da partida, tick, último input recebido
+# (ack) e os payloads do protocolo (update/delta) desde o último tick que o
+# cliente confirmou. Enquanto o cliente está até MAX_REDUNDANT_TICKS atrás,
+# os deltas que faltam vão todos juntos (perder um datagrama não quebra a
+# sequência); mais atrás que isso, vai um snapshot completo.
+#
+# Cliente → servidor (INPUT): token do canal, época, último tick aplicado
+# (ack) e os últimos inputs ainda não confirmados, repetidos em todo datagrama.
+#
+# Datagramas de partidas anteriores (outra época) ou mais velhos que o
+# último aplicado são descartados.
+#
+# NetworkSimulator descarta e atrasa pacotes para testar perda/latência
+# localmente (ver benchmarks/bench_transport.py).
+import asyncio
+import heapq
+import itertools
+import random
+import socket
+import struct
+import threading
+import time
+import protocol
+
+STATE = 1
+INPUT = 2
+
+_STATE = struct.Struct(">BIIIB")   # tipo, época, tick, último input recebido, nº de payloads
+_INPUT = struct.Struct(">BIIIB")   # tipo, token, época, último tick aplicado, nº de inputs
+_LENGTH = struct.Struct(">H")      # tamanho de cada payload
+_INPUT_ITEM = struct.Struct(">IB") # seq do input, direção
+
+MAX_REDUNDANT_TICKS = 8    # Deltas repetidos por datagrama antes de mandar snapshot
+MAX_DATAGRAM = 1200        # Acima disso os deltas acumulados viram um snapshot
+INPUT_REDUNDANCY = 4       # Inputs não confirmados repetidos em cada datagrama
+
+
+class DatagramError(ValueError):
+    pass
+
+
+def pack_state(epoch, tick, input_ack, payloads):
+    out = bytearray(_STATE.pack(STATE, epoch, tick, input_ack, len(payloads)))
+    for payload in payloads:
+        out += _LENGTH.pack(len(payload))
+        out += payload
+    return bytes(out)
+
+
+def unpack_state(data):
+    # Retorna (época, tick, input_ack, [payloads])
+    try:
+        kind, epoch, tick, input_ack, count = _STATE.unpack_from(data, 0)
+        if kind != STATE:
+            raise DatagramError(f"Tipo de datagrama inesperado: {kind}")
+        offset = _STATE.size
+        payloads = []
+        for _ in range(count):
+            (size,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            payloads.append(data[offset:offset + size])
+            offset += size
+    except struct.error as exc:
+        raise DatagramError(str(exc)) from exc
+    return epoch, tick, input_ack, payloads
+
+
+def pack_input(token, epoch, ack, inputs):
+    # inputs: [(seq, "DIREÇÃO")]
+    out = bytearray(_INPUT.pack(INPUT, token, epoch, ack, len(inputs)))
+    for seq, direction in inputs:
+        out += _INPUT_ITEM.pack(seq, protocol.DIRECTION_CODES[direction])
+    return bytes(out)
+
+
+def unpack_input(data):
+    # Retorna (token, época, ack, [(seq, "DIREÇÃO")])
+    try:
+        kind, token, epoch, ack, count = _INPUT.unpack_from(data, 0)
+        if kind != INPUT:
+            raise DatagramError(f"Tipo de datagrama inesperado: {kind}")
+        inputs = []
+        offset = _INPUT.size
+        for _ in range(count):
+            seq, code = _INPUT_ITEM.unpack_from(data, offset)
+            offset += _INPUT_ITEM.size
+            inputs.append((seq, protocol.DIRECTION_NAMES[code]))
+    except (struct.error, KeyError) as exc:
+        raise DatagramError(str(exc)) from exc
+    return token, epoch, ack, inputs
+
+
+class UdpEndpoint(asyncio.DatagramProtocol):
+    # Repassa cada datagrama recebido ao callback (servidor ou bot)
+    def __init__(self, on_datagram):
+        self.on_datagram = on_datagram
+
+    def datagram_received(self, data, addr):
+        self.on_datagram(data, addr)
+
+
+# ---------- Lado do servidor ----------
+
+class TickHistory:
+    # Payloads dos últimos ticks, codificados uma vez por formato e
+    # compartilhados entre os clientes UDP
+    def __init__(self, size=MAX_REDUNDANT_TICKS):
+        self.size = size
+        self.ticks = {}   # { tick: (é snapshot, msg, { versão: payload }) }
+
+    def clear(self):
+        self.ticks.clear()
+
+    def add(self, tick, msg, keyframe):
+        self.ticks[tick] = (keyframe, msg, {})
+        self.ticks.pop(tick - self.size, None)
+
+    def encoded(self, tick, version):
+        # Codifica sob demanda, uma vez por formato
+        _, msg, variants = self.ticks[tick]
+        if version not in variants:
+            variants[version] = protocol.encode(msg, version)
+        return variants[version]
+
+    def payloads(self, acked, tick, version):
+        # Payloads para levar o cliente do tick `acked` ao `tick`, ou None se
+        # faltar algum (o chamador manda um snapshot)
+        if tick - acked > self.size:
+            return None
+        payloads = []
+        for t in range(acked + 1, tick + 1):
+            entry = self.ticks.get(t)
+            if entry is None:
+                return None
+            if entry[0]:
+                payloads = []  # Um snapshot dispensa os deltas anteriores
+            payloads.append(self.encoded(t, version))
+        return payloads
+
+
+# ---------- Lado do cliente ----------
+
+class InputWindow:
+    # Inputs enviados e ainda não confirmados pelo servidor
+    def __init__(self, redundancy=INPUT_REDUNDANCY):
+        self.redundancy = redundancy
+        self.next_seq = 1
+        self.pending = []  # [(seq, direção)]
+
+    def add(self, direction):
+        # Devolve a seq do input (o servidor a confirma nos "acks" do estado)
+        seq = self.next_seq
+        self.pending.append((seq, direction))
+        self.next_seq += 1
+        del self.pending[:-self.redundancy]
+        return seq
+
+    def acked(self, seq):
+        self.pending = [item for item in self.pending if item[0] > seq]
+
+
+class StateReceiver:
+    # Decide quais payloads de um datagrama STATE aplicar (descarta os velhos)
+    def __init__(self):
+        self.epoch = None
+        self.tick = 0     # Último tick aplicado (é o ack mandado ao servidor)
+
+    def reset(self, epoch):
+        self.epoch = epoch
+        self.tick = 0
+
+    def accept(self, epoch, tick):
+        # True se o datagrama é desta partida e mais novo que o último aplicado
+        return epoch == self.epoch and tick > self.tick
+
+
+class UdpChannel:
+    # Canal UDP do client.py: socket bloqueante e uma thread de leitura.
+    # on_messages(msgs) recebe os updates/deltas novos de cada datagrama e
+    # deve atualizar receiver.tick com o tick aplicado (é o ack enviado).
+    def __init__(self, host, on_messages, keepalive=0.25):
+        self.host = host
+        self.on_messages = on_messages
+        self.keepalive = keepalive
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addr = None
+        self.token = 0
+        self.receiver = StateReceiver()
+        self.window = InputWindow()
+        self.lock = threading.Lock()
+
+    def open(self, port, token, epoch):
+        # Chamado a cada mensagem "udp" do servidor (uma por partida)
+        # Endereço já resolvido: é com ele que o recvfrom confere a origem
+        addr = (socket.gethostbyname(self.host), port)
+        with self.lock:
+            first = self.addr is None
+            self.addr = addr
+            self.token = token
+            self.receiver.reset(epoch)
+        if first:
+            threading.Thread(target=self._recv_loop, daemon=True).start()
+            threading.Thread(target=self._keepalive_loop, daemon=True).start()
+        self.send()
+
+    def send_input(self, direction):
+        with self.lock:
+            seq = self.window.add(direction)
+        self.send()
+        return seq
+
+    def send(self):
+        with self.lock:
+            if self.addr is None:
+                return
+            datagram = pack_input(self.token, self.receiver.epoch or 0,
+                                  self.receiver.tick, self.window.pending)
+        try:
+            self.sock.sendto(datagram, self.addr)
+        except OSError:
+            pass
+
+    def close(self):
+        self.sock.close()
+
+    def _keepalive_loop(self):
+        # Liga o endereço no servidor e mantém o ack em dia mesmo sem inputs
+        while True:
+            time.sleep(self.keepalive)
+            self.send()
+
+    def _recv_loop(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(65535)
+                if addr != self.addr:
+                    continue  # Só o servidor manda estado por aqui
+                epoch, tick, input_ack, payloads = unpack_state(data)
+            except DatagramError:
+                continue
+            except OSError:
+                return  # Socket fechado
+            with self.lock:
+                if not self.receiver.accept(epoch, tick):
+                    continue
+                self.window.acked(input_ack)
+                last = self.receiver.tick
+            # Payload inválido descarta o datagrama em vez de derrubar a
+            # thread; pickle nunca (o canal não tem autenticação)
+            try:
+                msgs = [protocol.decode(payload, allow_pickle=False) for payload in payloads]
+                msgs = [msg for msg in msgs if msg["data"]["tick"] > last]
+            except (protocol.CodecError, struct.error, KeyError, IndexError, TypeError):
+                continue
+            self.on_messages(msgs)
+            self.send()
+
+
+# ---------- Simulador de perda e latência ----------
+
+class NetworkSimulator:
+    # Descarta pacotes com probabilidade `loss` e entrega os demais depois de
+    # `latency` (+ até `jitter`) segundos. call_later(atraso, fn, *args) agenda
+    # a entrega; sem ele, uma thread própria faz o agendamento.
+    def __init__(self, loss=0.0, latency=0.0, jitter=0.0, seed=None, call_later=None):
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.call_later = call_later or self._thread_call_later
+        self.sent = 0
+        self.dropped = 0
+        self._queue = []
+        self._order = itertools.count()  # Desempate estável na fila de entregas
+        self._cond = None
+
+    @property
+    def active(self):
+        return self.loss > 0 or self.latency > 0 or self.jitter > 0
+
+    def deliver(self, fn, *args):
+        # Chama fn(*args) como se o pacote tivesse atravessado a rede
+        self.sent += 1
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay <= 0:
+            fn(*args)
+        else:
+            self.call_later(delay, fn, *args)
+
+    def _thread_call_later(self, delay, fn, *args):
+        if self._cond is None:
+            self._cond = threading.Condition()
+            threading.Thread(target=self._run, daemon=True).start()
+        with self._cond:
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._order), fn, args))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                due, _, fn, args = self._queue[0]
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                heapq.heappop(self._queue)
+            fn(*args)
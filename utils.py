@@ -1,14 +1,20 @@
-# Importa a biblioteca pickle para serializar/deserializar objetos Python
-import pickle
-
 # Importa a biblioteca struct para empacotar/desempacotar dados binários
 import struct
+import socket
+import threading
+from collections import deque
+
+# Codec das mensagens (binário compacto ou pickle, ver protocol.py)
+import protocol
+
+_HEADER = struct.Struct(">I")
 
 # Função para enviar dados de forma segura com cabeçalho de tamanho
-def send_data(conn, data):
+# version: versão do protocolo binário negociada (None = pickle)
+def send_data(conn, data, version=None):
     try:
-        # Serializa o objeto Python (dict, lista, etc.) em bytes
-        serialized = pickle.dumps(data)
+        # Serializa a mensagem em bytes (binário ou pickle)
+        serialized = protocol.encode(data, version)
 
         # struct.pack(">I", len(serialized)) cria um cabeçalho de 4 bytes
         # representando o tamanho da mensagem (big-endian, inteiro sem sinal)
@@ -21,31 +27,216 @@ def send_data(conn, data):
         # Se ocorrer qualquer erro (como desconexão), ignora
         pass
 # Função para receber dados enviados com cabeçalho de tamanho
-def recv_data(conn):
+# allow_pickle: aceita payloads em pickle (fallback para clientes antigos)
+# meter: chamado com o número de bytes de cada mensagem recebida (métricas)
+# Para ler muitas mensagens da mesma conexão, prefira FrameReader (menos
+# syscalls e nenhuma cópia extra); esta função serve a leituras avulsas.
+def recv_data(conn, allow_pickle=True, meter=None):
     try:
-        # Primeiro, tenta ler os 4 bytes iniciais do cabeçalho
-        raw_msglen = conn.recv(4)
-
-        # Se não receber nada, a conexão foi encerrada ou inválida
-        if not raw_msglen:
+        # Lê exatamente os 4 bytes do cabeçalho (recv pode devolver menos)
+        header = _recv_exact(conn, _HEADER.size)
+        if header is None:
             return None
 
         # Interpreta os 4 bytes como um inteiro (tamanho da mensagem)
-        msglen = struct.unpack(">I", raw_msglen)[0]
+        msglen = _HEADER.unpack(header)[0]
 
-        # Prepara buffer para armazenar os dados recebidos
-        data = b""
+        # Buffer alocado uma vez no tamanho final e preenchido no lugar,
+        # sem a cópia a cada pedaço de `data += packet`
+        data = _recv_exact(conn, msglen)
+        if data is None:
+            return None
 
-        # Continua recebendo até alcançar o tamanho total da mensagem
-        while len(data) < msglen:
-            packet = conn.recv(msglen - len(data))  # Recebe o restante
-            if not packet:
-                return None  # Se não receber, algo deu errado
-            data += packet  # Adiciona ao buffer
+        if meter:
+            meter(_HEADER.size + msglen)
 
-        # Desserializa os dados de volta para objeto Python original
-        return pickle.loads(data)
+        # Desserializa os dados de volta (detecta binário ou pickle)
+        return protocol.decode(data, allow_pickle)
 
     except:
         # Se falhar em qualquer etapa, retorna None
-        return None
\ No newline at end of file
+        return None
+
+# Recebe exatamente `size` bytes em um bytearray (None se a conexão fechar)
+def _recv_exact(conn, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        n = conn.recv_into(view[received:])
+        if not n:
+            return None
+        received += n
+    return data
+
+# Leitor de mensagens de uma conexão: um recv_into enche um bytearray
+# reaproveitado com tudo o que já chegou, e as mensagens completas são
+# entregues como memoryview (fatias do buffer, sem cópia). Com vários
+# updates chegando juntos, um único syscall atende todos eles.
+class FrameReader:
+    def __init__(self, conn, size=65536, meter=None):
+        self.conn = conn
+        self.meter = meter          # meter(bytes) por mensagem, como em recv_data
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0              # Início dos bytes ainda não consumidos
+        self.end = 0                # Fim dos bytes recebidos
+
+    # Devolve o payload da próxima mensagem (memoryview válida só até a
+    # próxima leitura) ou None se a conexão fechar
+    def read_frame(self):
+        if not self._fill(_HEADER.size):
+            return None
+        (size,) = _HEADER.unpack_from(self.buffer, self.start)
+        if not self._fill(_HEADER.size + size):
+            return None
+        begin = self.start + _HEADER.size
+        self.start = begin + size
+        if self.meter:
+            self.meter(_HEADER.size + size)
+        return self.view[begin:self.start]
+
+    # Lê e decodifica a próxima mensagem (None se fechar ou vier inválida)
+    def recv_message(self, allow_pickle=True):
+        try:
+            payload = self.read_frame()
+            if payload is None:
+                return None
+            return protocol.decode(payload, allow_pickle)
+        except Exception:
+            return None
+
+    def _fill(self, needed):
+        # Garante `needed` bytes disponíveis a partir de self.start
+        if self.end - self.start >= needed:
+            return True
+        self._make_room(needed)
+        while self.end - self.start < needed:
+            n = self.conn.recv_into(self.view[self.end:])
+            if not n:
+                return False
+            self.end += n
+        return True
+
+    def _make_room(self, needed):
+        pending = self.end - self.start
+        if pending == 0:
+            self.start = self.end = 0
+        if self.start + needed <= len(self.buffer):
+            return
+        # Move só a mensagem incompleta para o começo do buffer (ou para um
+        # buffer maior). Memoryviews já entregues continuam apontando para o
+        # buffer, então ele é trocado em vez de redimensionado.
+        partial = bytes(self.view[self.start:self.end])
+        if needed > len(self.buffer):
+            self.buffer = bytearray(max(needed, 2 * len(self.buffer)))
+            self.view = memoryview(self.buffer)
+        self.view[:pending] = partial
+        self.start, self.end = 0, pending
+
+# Políticas para quando a fila de envio de um cliente enche
+DROP_STALE = "drop_stale"   # Descarta o update/delta mais antigo em favor do novo
+DISCONNECT = "disconnect"   # Desconecta o cliente que ficou para trás
+
+MAX_BATCH = 64 * 1024       # Bytes agrupados por sendall no ClientWriter
+
+# Envia em uma thread própria os payloads já codificados de um cliente, para
+# que um cliente lento não segure o loop de ticks (o broadcast só enfileira).
+# A fila é limitada; quando enche, a política decide o que fazer.
+# on_sent(bytes) e on_drop(motivo) são ganchos opcionais para métricas.
+class ClientWriter:
+    def __init__(self, conn, max_queue=64, policy=DROP_STALE, on_sent=None, on_drop=None):
+        if policy not in (DROP_STALE, DISCONNECT):
+            raise ValueError(f"Política de envio desconhecida: {policy!r}")
+        self.conn = conn
+        self.max_queue = max_queue
+        self.policy = policy
+        self.on_sent = on_sent
+        self.on_drop = on_drop
+        self.queue = deque()          # [(payload, descartável)]
+        self.cond = threading.Condition()
+        self.closed = False
+        self.sent = 0                 # Mensagens enviadas
+        self.dropped = 0              # Mensagens descartadas pela política
+        self.max_depth = 0            # Maior tamanho que a fila já teve
+        threading.Thread(target=self._run, daemon=True).start()
+
+    # Enfileira um payload (bytes compartilhados entre clientes, sem cabeçalho).
+    # droppable: pode ser descartado se a fila encher (update/delta)
+    def send(self, payload, droppable=False):
+        with self.cond:
+            if self.closed:
+                return False
+            if len(self.queue) >= self.max_queue:
+                stale = None
+                if self.policy == DROP_STALE:
+                    stale = next((i for i, item in enumerate(self.queue) if item[1]), None)
+                if stale is None:
+                    # Nada que possa ser descartado (ou política disconnect)
+                    if self.on_drop:
+                        self.on_drop("slow_client")
+                    self._close()
+                    return False
+                del self.queue[stale]
+                self.dropped += 1
+                if self.on_drop:
+                    self.on_drop("stale")
+            self.queue.append((payload, droppable))
+            self.max_depth = max(self.max_depth, len(self.queue))
+            self.cond.notify()
+            return True
+
+    def depth(self):
+        return len(self.queue)
+
+    def stats(self):
+        return {
+            "depth": len(self.queue),
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "closed": self.closed,
+        }
+
+    def close(self):
+        with self.cond:
+            self._close()
+
+    def _close(self):
+        # Chamado com self.cond travado. O shutdown acorda o recv bloqueado
+        # do handle_client, que então faz a limpeza normal da desconexão.
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self.cond.notify()
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _run(self):
+        batch = bytearray()
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                # Junta tudo o que está na fila (até MAX_BATCH bytes) em um
+                # único sendall: vários frames pequenos, um syscall
+                batch.clear()
+                count = 0
+                while self.queue and (not batch or len(batch) < MAX_BATCH):
+                    payload, _ = self.queue.popleft()
+                    batch += _HEADER.pack(len(payload))
+                    batch += payload
+                    count += 1
+            try:
+                self.conn.sendall(batch)
+                self.sent += count
+                if self.on_sent:
+                    self.on_sent(len(batch))
+            except OSError:
+                self.close()
+                return